@@ -1,81 +1,326 @@
 """
 Preferences Manager para ScreenPaint.
 Maneja la carga, guardado y validación de preferencias del usuario.
-Usa formato CSV para atajos, orden de botones y visibilidad.
+
+Todas las preferencias viven en un único almacén (`PreferencesStore`):
+- Se cargan una sola vez y quedan en memoria.
+- Se guardan como JSON en el directorio de configuración de la plataforma,
+  con escritura atómica (archivo temporal + rename) en un hilo de fondo.
+- Emiten `changed(set)` con las claves modificadas para que la barra y el
+  overlay reaccionen sin volver a leer archivos.
+Los CSV antiguos (preferences.csv, button_order.csv, tool_visibility.csv) se
+migran automáticamente la primera vez.
 """
 
+import copy
 import csv
+import json
 import os
-from PyQt6.QtCore import Qt
+import tempfile
+import threading
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QStandardPaths
 
-class PreferencesManager:
-    def __init__(self, preferences_file='preferences.csv', 
-                 button_order_file='button_order.csv',
-                 visibility_file='tool_visibility.csv'):
-        self.preferences_file = preferences_file
-        self.button_order_file = button_order_file
-        self.visibility_file = visibility_file
-        self.default_shortcuts = self._get_default_shortcuts()
-        self.default_button_order = self._get_default_button_order()
-        self.default_visibility = self._get_default_visibility()
-    
-    # ===== ATAJOS DE TECLADO =====
-    
-    def _get_default_shortcuts(self):
-        """Atajos por defecto para cada herramienta"""
-        return {
-            'pen': (Qt.Key.Key_Alt, 'Alt'),
-            'hand': (Qt.Key.Key_Shift, 'Shift'),
-            'point': (Qt.Key.Key_P, 'P'),
-            'segment': (Qt.Key.Key_L, 'L'),
-            'circle_center_point': (Qt.Key.Key_C, 'C'),
-            'rectangle': (Qt.Key.Key_R, 'R'),
-            'eraser': (Qt.Key.Key_E, 'E'),
-            'paint': (Qt.Key.Key_B, 'B'),
-            'text': (Qt.Key.Key_T, 'T'),
-            'rectangle_filled': (Qt.Key.Key_F, 'F'),
-            'circle_filled': (Qt.Key.Key_D, 'D'),
-            'minimize': (Qt.Key.Key_M, 'M'),
-        }
-    
-    def load_shortcuts(self):
-        """Carga atajos desde CSV y combina con los por defecto"""
-        shortcuts = self.default_shortcuts.copy()
-        
-        if not os.path.exists(self.preferences_file):
-            self.save_shortcuts(shortcuts)
-            return shortcuts
-        
+PREFERENCES_FILENAME = 'preferences.json'
+PREFERENCES_VERSION = 1
+
+_LEGACY_SHORTCUTS_FILE = 'preferences.csv'
+_LEGACY_BUTTON_ORDER_FILE = 'button_order.csv'
+_LEGACY_VISIBILITY_FILE = 'tool_visibility.csv'
+
+
+def _default_shortcuts():
+    """Atajos por defecto para cada herramienta"""
+    return {
+        'pen': (Qt.Key.Key_Alt, 'Alt'),
+        'hand': (Qt.Key.Key_Shift, 'Shift'),
+        'point': (Qt.Key.Key_P, 'P'),
+        'segment': (Qt.Key.Key_L, 'L'),
+        'circle_center_point': (Qt.Key.Key_C, 'C'),
+        'rectangle': (Qt.Key.Key_R, 'R'),
+        'eraser': (Qt.Key.Key_E, 'E'),
+        'paint': (Qt.Key.Key_B, 'B'),
+        'text': (Qt.Key.Key_T, 'T'),
+        'rectangle_filled': (Qt.Key.Key_F, 'F'),
+        'circle_filled': (Qt.Key.Key_D, 'D'),
+        'minimize': (Qt.Key.Key_M, 'M'),
+    }
+
+
+def _default_button_order():
+    """Orden por defecto de los botones"""
+    return [
+        'grip', 'pen', 'line', 'shapes', 'camera', 'clipboard',
+        'hand', 'paint', 'text', 'undo', 'redo', 'eraser',
+        'clear', 'file', 'preferences', 'close'
+    ]
+
+
+def _default_visibility():
+    """Visibilidad por defecto para todas las herramientas"""
+    return {button_id: True for button_id in _default_button_order()}
+
+
+def _default_preferences():
+    return {
+        'shortcuts': _default_shortcuts(),
+        'button_order': _default_button_order(),
+        'tool_visibility': _default_visibility(),
+        'capture_annotations': 'off',   # 'on' | 'off' | 'only'
+        'capture_monitor': 'primary',   # 'primary' | 'cursor' | 'all' | índice mss (1..N)
+        'clipboard_save_copy': False,   # Guardar también en disco al copiar al portapapeles
+        # Ver tools/image_encoders.py: 'png' | 'png_fast' | 'jpeg' | 'webp'
+        'screenshot_encoder': {'format': 'png', 'png_level': 3, 'quality': 90},
+        # Captura por intervalos: segundos entre capturas, % mínimo de cambio, montar vídeo
+        'interval_capture': {'seconds': 5, 'threshold': 0.5, 'make_video': False},
+        'recent_captures': [],          # Rutas absolutas, la más reciente primero (galería)
+        # Grabación (ver ScreenRecorder en capture_screen.py)
+        'recording': {
+            'drop_policy': 'drop_newest',   # Con la cola llena se pierde: 'drop_newest' | 'drop_oldest'
+            'queue_budget_mb': 256,         # Memoria máxima de la cola de fotogramas
+            'min_fps': 5,                   # Ritmo mínimo del control adaptativo
+            'max_fps': 30,                  # Ritmo máximo del control adaptativo
+            'static_hold': 2.0,             # Segundos estáticos sin codificar copias (0: vídeo CFR)
+            'preconvert': True,             # Convertir a yuv420p antes de ffmpeg
+            'output_height': 0,             # Altura del vídeo (0: la de la pantalla)
+            'capture_process': False,       # Capturar en un proceso aparte (sin competir por el GIL)
+            'auto_zoom': False,             # Zoom que sigue al cursor (tools/auto_zoom.py)
+            'zoom': 2.0,                    # Zoom con actividad
+            'zoom_idle': 1.0,               # Zoom en reposo
+            'zoom_smooth': 0.35,            # Segundos del suavizado del encuadre
+            'zoom_linger': 1.5,             # Segundos de zoom tras la última actividad
+            'zoom_keep_raw': False,         # Guardar también la captura completa
+            'show_cursor': True,            # Dibujar el cursor en el vídeo (tools/cursor_overlay.py)
+            'click_ripples': True,          # Ondas en los clics
+            'cursor_size': 24,              # Alto del cursor en píxeles lógicos
+        },
+        # Zonas privadas en capturas y grabaciones (ver tools/redaction.py): 'pixelate' | 'blur',
+        # tamaño del bloque en píxeles y regiones fijas [x, y, ancho, alto] en píxeles físicos
+        'redaction': {'mode': 'pixelate', 'block': 16, 'regions': []},
+    }
+
+
+class _AtomicWriter:
+    """Hilo de fondo que escribe la última instantánea pendiente de forma atómica."""
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._run, name="PreferencesWriter", daemon=True)
+        self._thread.start()
+
+    def schedule(self, data):
+        with self._lock:
+            self._pending = data
+            self._idle.clear()
+        self._wake.set()
+
+    def flush(self, timeout=2.0):
+        """Espera a que se escriban los cambios pendientes (p. ej. al salir)."""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                data, self._pending = self._pending, None
+            if data is not None:
+                try:
+                    self._write(data)
+                except Exception as e:
+                    print(f"Error saving preferences: {e}")
+            with self._lock:
+                if self._pending is None:
+                    self._idle.set()
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.preferences-', suffix='.tmp', dir=directory)
         try:
-            with open(self.preferences_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    tool = row.get('tool')
-                    if tool:
-                        try:
-                            key_code = int(row['key_code'])
-                            key_name = row['key_name']
-                            shortcuts[tool] = (key_code, key_name)
-                        except (ValueError, KeyError):
-                            continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class PreferencesStore(QObject):
+    """Almacén único de preferencias, cacheado en memoria."""
+
+    changed = pyqtSignal(set)   # claves modificadas
+
+    def __init__(self, path=None, legacy_dirs=None):
+        super().__init__()
+        if path is None:
+            config_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppConfigLocation)
+            path = os.path.join(config_dir, PREFERENCES_FILENAME)
+        self.path = path
+        self._data = _default_preferences()
+        self._writer = _AtomicWriter(path)
+
+        if os.path.exists(path):
+            self._load()
+        else:
+            if self._migrate_legacy(legacy_dirs or _legacy_dirs()):
+                self._writer.schedule(self._serialize())
+
+    # ===== LECTURA / ESCRITURA =====
+
+    def get(self, key):
+        """Copia del valor en caché (modificarla no altera el almacén)"""
+        return copy.deepcopy(self._data.get(key))
+
+    def update(self, values):
+        """Actualiza varias claves, guarda en segundo plano y emite `changed`"""
+        changed = {key for key, value in values.items() if self._data.get(key) != value}
+        if not changed:
+            return changed
+        for key in changed:
+            self._data[key] = copy.deepcopy(values[key])
+        self._writer.schedule(self._serialize())
+        self.changed.emit(changed)
+        return changed
+
+    def set(self, key, value):
+        return self.update({key: value})
+
+    def flush(self, timeout=2.0):
+        return self._writer.flush(timeout)
+
+    def _serialize(self):
+        data = copy.deepcopy(self._data)
+        data['shortcuts'] = {tool: [int(code), name] for tool, (code, name) in data['shortcuts'].items()}
+        data['version'] = PREFERENCES_VERSION
+        return data
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
         except Exception as e:
             print(f"Error loading preferences: {e}")
-            
-        return shortcuts
-    
+            return
+
+        for key, value in stored.items():
+            if key == 'version':
+                continue
+            if key == 'shortcuts':
+                shortcuts = self._data['shortcuts']
+                for tool, entry in value.items():
+                    try:
+                        shortcuts[tool] = (int(entry[0]), entry[1])
+                    except (ValueError, IndexError, TypeError):
+                        continue
+            elif key == 'button_order':
+                self._data['button_order'] = _merge_button_order(value)
+            elif key in ('tool_visibility', 'screenshot_encoder', 'interval_capture', 'recording',
+                         'redaction'):
+                self._data[key].update(value)
+            else:
+                self._data[key] = value
+
+    # ===== MIGRACIÓN DE CSV =====
+
+    def _migrate_legacy(self, directories):
+        """Importa los CSV antiguos si existen. Devuelve True si se migró algo."""
+        migrated = False
+        for directory in directories:
+            shortcuts_file = os.path.join(directory, _LEGACY_SHORTCUTS_FILE)
+            order_file = os.path.join(directory, _LEGACY_BUTTON_ORDER_FILE)
+            visibility_file = os.path.join(directory, _LEGACY_VISIBILITY_FILE)
+            if not any(os.path.exists(f) for f in (shortcuts_file, order_file, visibility_file)):
+                continue
+            try:
+                if os.path.exists(shortcuts_file):
+                    with open(shortcuts_file, 'r', encoding='utf-8') as f:
+                        for row in csv.DictReader(f):
+                            tool = row.get('tool')
+                            if tool:
+                                try:
+                                    self._data['shortcuts'][tool] = (int(row['key_code']), row['key_name'])
+                                except (ValueError, KeyError):
+                                    continue
+                if os.path.exists(order_file):
+                    with open(order_file, 'r', encoding='utf-8') as f:
+                        rows = sorted(csv.DictReader(f), key=lambda r: int(r['position']))
+                    self._data['button_order'] = _merge_button_order([r['button_id'] for r in rows])
+                if os.path.exists(visibility_file):
+                    with open(visibility_file, 'r', encoding='utf-8') as f:
+                        for row in csv.DictReader(f):
+                            button_id = row.get('button_id')
+                            if button_id:
+                                self._data['tool_visibility'][button_id] = row['visible'].lower() == 'true'
+                migrated = True
+            except Exception as e:
+                print(f"Error migrating legacy preferences: {e}")
+            break
+        return migrated
+
+
+def _legacy_dirs():
+    """Directorios donde pueden estar los CSV antiguos (cwd y raíz del proyecto)"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    dirs = [os.getcwd()]
+    if os.path.normcase(project_root) != os.path.normcase(dirs[0]):
+        dirs.append(project_root)
+    return dirs
+
+
+def _merge_button_order(button_order):
+    """Agrega los botones nuevos del orden por defecto que no existan, detrás de su
+    vecino anterior en ese orden (al final si tampoco está)"""
+    button_order = list(button_order)
+    previous = None
+    for btn in _default_button_order():
+        if btn not in button_order:
+            index = button_order.index(previous) + 1 if previous in button_order else len(button_order)
+            button_order.insert(index, btn)
+        previous = btn
+    return button_order
+
+
+_store = None
+
+
+def get_preferences_store():
+    """Almacén de preferencias compartido por toda la aplicación"""
+    global _store
+    if _store is None:
+        _store = PreferencesStore()
+    return _store
+
+
+class PreferencesManager:
+    """Fachada sobre el almacén compartido (API histórica de carga/guardado)."""
+
+    def __init__(self, store=None):
+        self.store = store or get_preferences_store()
+        self.default_shortcuts = _default_shortcuts()
+        self.default_button_order = _default_button_order()
+        self.default_visibility = _default_visibility()
+
+    # ===== ATAJOS DE TECLADO =====
+
+    def load_shortcuts(self):
+        """Atajos actuales (desde la caché)"""
+        return self.store.get('shortcuts')
+
     def save_shortcuts(self, shortcuts):
-        """Guarda atajos en CSV"""
-        try:
-            with open(self.preferences_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['tool', 'key_code', 'key_name'])
-                for tool, (key_code, key_name) in shortcuts.items():
-                    writer.writerow([tool, key_code, key_name])
-            return True
-        except Exception as e:
-            print(f"Error saving preferences: {e}")
-            return False
-    
+        """Guarda atajos (escritura en segundo plano)"""
+        self.store.set('shortcuts', dict(shortcuts))
+        return True
+
     def validate_shortcuts(self, shortcuts):
         """
         Valida que no haya atajos duplicados.
@@ -87,111 +332,40 @@ class PreferencesManager:
                 return False, f"El atajo '{key_name}' ya está asignado a '{used_keys[key_code]}'"
             used_keys[key_code] = tool
         return True, ""
-    
+
     # ===== ORDEN DE BOTONES =====
-    
-    def _get_default_button_order(self):
-        """Orden por defecto de los botones"""
-        return [
-            'grip', 'pen', 'line', 'shapes', 'camera',
-            'hand', 'paint', 'text', 'undo', 'redo', 'eraser',
-            'clear', 'preferences', 'close'
-        ]
-    
+
     def load_button_order(self):
-        """Carga el orden de botones desde CSV"""
-        if not os.path.exists(self.button_order_file):
-            self.save_button_order(self.default_button_order)
-            return self.default_button_order.copy()
-        
-        button_order = []
-        try:
-            with open(self.button_order_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                rows = sorted(reader, key=lambda r: int(r['position']))
-                button_order = [row['button_id'] for row in rows]
-        except Exception as e:
-            print(f"Error loading button order: {e}")
-            return self.default_button_order.copy()
-            
-        # Agrega botones nuevos del default que no existan
-        existing_set = set(button_order)
-        for btn in self.default_button_order:
-            if btn not in existing_set:
-                button_order.append(btn)
-        
-        return button_order
-    
+        """Orden de botones actual (desde la caché)"""
+        return self.store.get('button_order')
+
     def save_button_order(self, button_order):
-        """Guarda el orden de botones en CSV"""
-        try:
-            with open(self.button_order_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['position', 'button_id'])
-                for i, button_id in enumerate(button_order):
-                    writer.writerow([i, button_id])
-            return True
-        except Exception as e:
-            print(f"Error saving button order: {e}")
-            return False
-    
+        """Guarda el orden de botones"""
+        self.store.set('button_order', list(button_order))
+        return True
+
     # ===== VISIBILIDAD DE HERRAMIENTAS =====
-    
-    def _get_default_visibility(self):
-        """Visibilidad por defecto para todas las herramientas"""
-        return {
-            'grip': True,
-            'pen': True,
-            'line': True,
-            'shapes': True,
-            'camera': True,
-            'hand': True,
-            'paint': True,
-            'text': True,
-            'undo': True,
-            'redo': True,
-            'eraser': True,
-            'clear': True,
-            'preferences': True,
-            'close': True,
-        }
-    
+
     def load_tool_visibility(self):
-        """Carga visibilidad desde CSV y combina con los por defecto"""
-        visibility = self.default_visibility.copy()
-        
-        if not os.path.exists(self.visibility_file):
-            self.save_tool_visibility(visibility)
-            return visibility
-        
-        try:
-            with open(self.visibility_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    button_id = row.get('button_id')
-                    if button_id:
-                        visible = row['visible'].lower() == 'true'
-                        visibility[button_id] = visible
-        except Exception as e:
-            print(f"Error loading tool visibility: {e}")
-            
-        return visibility
-    
+        """Visibilidad actual (desde la caché)"""
+        return self.store.get('tool_visibility')
+
     def save_tool_visibility(self, visibility):
-        """Guarda la visibilidad de herramientas en CSV"""
-        try:
-            with open(self.visibility_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['button_id', 'visible'])
-                for button_id, visible in visibility.items():
-                    writer.writerow([button_id, str(visible).lower()])
-            return True
-        except Exception as e:
-            print(f"Error saving tool visibility: {e}")
-            return False
-    
+        """Guarda la visibilidad de herramientas"""
+        self.store.set('tool_visibility', dict(visibility))
+        return True
+
+    def save_all(self, shortcuts, button_order, visibility):
+        """Guarda todo de una vez (una sola escritura y una sola notificación)"""
+        self.store.update({
+            'shortcuts': dict(shortcuts),
+            'button_order': list(button_order),
+            'tool_visibility': dict(visibility),
+        })
+        return True
+
     # ===== UTILIDADES =====
-    
+
     def get_tool_name_display(self, tool):
         """Nombre de visualización para la herramienta"""
         tool_names = {
@@ -209,7 +383,7 @@ class PreferencesManager:
             'minimize': 'Minimizar Menú',
         }
         return tool_names.get(tool, tool)
-    
+
     def get_button_name_display(self, button_id):
         """Nombre de visualización para el botón"""
         button_names = {
@@ -218,6 +392,7 @@ class PreferencesManager:
             'line': 'Líneas',
             'shapes': 'Figuras',
             'camera': 'Cámara',
+            'clipboard': 'Copiar Captura al Portapapeles',
             'hand': 'Mano (Mover Objetos)',
             'paint': 'Balde de Pintura',
             'text': 'Texto',
@@ -225,6 +400,7 @@ class PreferencesManager:
             'redo': 'Rehacer',
             'eraser': 'Borrador',
             'clear': 'Limpiar Todo',
+            'file': 'Archivo (Guardar/Abrir Pizarra)',
             'preferences': 'Preferencias',
             'close': 'Cerrar',
         }
@@ -1,7 +1,7 @@
 import math
 import copy
 from PyQt6.QtCore import Qt, QPoint, QRect, QPointF
-from PyQt6.QtGui import QPainter, QPen, QColor, QFont, QPolygon, QPainterPath, QPainterPathStroker
+from PyQt6.QtGui import QPainter, QPen, QBrush, QColor, QFont, QPolygon, QPainterPath, QPainterPathStroker
 
 # --- Funciones auxiliares ---
 def calculate_intersection(line1, line2):
@@ -341,11 +341,13 @@ class CircleObject(DrawingObject):
         pass
 
 class RectangleObject(DrawingObject):
-    def __init__(self, p1_obj, p2_obj, p3_obj, p4_obj, color=Qt.GlobalColor.yellow, width=3, filled=False):
+    def __init__(self, p1_obj, p2_obj, p3_obj, p4_obj, color=Qt.GlobalColor.yellow, width=3, filled=False,
+                 redact=False):
         self.points = [p1_obj, p2_obj, p3_obj, p4_obj]
         self.color = color
         self.width = width
         self.filled = filled
+        self.redact = redact    # Zona privada: se pixela en capturas y grabaciones (tools.redaction)
         self.rotation = 0
         
         p0_pos = p1_obj.pos()
@@ -359,6 +361,9 @@ class RectangleObject(DrawingObject):
         )
     
     def draw(self, painter, overlay_rect=None):
+        if self.redact:
+            self._draw_redaction(painter)
+            return
         pen_width = 1 if self.filled else self.width
         painter.setPen(QPen(self.color, pen_width, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
         
@@ -372,6 +377,18 @@ class RectangleObject(DrawingObject):
         pts = [p.pos() for p in self.points]
         painter.drawPolygon(pts)
 
+    def _draw_redaction(self, painter):
+        # Trazo discontinuo por dentro: el pixelado lo cubre y no queda en la imagen
+        painter.setPen(QPen(self.color, 2, Qt.PenStyle.DashLine))
+        painter.setBrush(QBrush(QColor(self.color), Qt.BrushStyle.BDiagPattern))
+        painter.drawRect(self.bounding_rect().adjusted(1, 1, -1, -1))
+
+    def bounding_rect(self):
+        """Rectángulo alineado que contiene las cuatro esquinas (también rotado)"""
+        xs = [p.pos().x() for p in self.points]
+        ys = [p.pos().y() for p in self.points]
+        return QRect(QPoint(min(xs), min(ys)), QPoint(max(xs), max(ys)))
+
     def contains(self, point, tolerance=None):
         threshold = tolerance if tolerance is not None else 10
         pos = point
@@ -379,7 +396,7 @@ class RectangleObject(DrawingObject):
         
         pts = [p.pos() for p in self.points]
         
-        if self.filled:
+        if self.filled or self.redact:
             poly = QPolygon(pts)
             if poly.containsPoint(point, Qt.FillRule.OddEvenFill):
                 return True
@@ -457,14 +474,33 @@ class RectangleObject(DrawingObject):
             self.points[i].y = int(new_y)
 
 class FreehandObject(DrawingObject):
-    def __init__(self, color=Qt.GlobalColor.black, width=3):
-        self.path = QPainterPath()
+    def __init__(self, color=Qt.GlobalColor.black, width=3, path_source=None):
+        # path_source: origen perezoso del trazo (p. ej. un archivo de escena
+        # mapeado en memoria). El QPainterPath se construye al primer acceso.
+        self._path = None if path_source is not None else QPainterPath()
+        self.path_source = path_source
         self.color = color
         self.width = width
 
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = self.path_source.build_path()
+            self.path_source = None
+        return self._path
+
+    @path.setter
+    def path(self, value):
+        self._path = value
+        self.path_source = None
+
     def __deepcopy__(self, memo):
-        new_obj = FreehandObject(self.color, self.width)
-        new_obj.path = QPainterPath(self.path)
+        if self._path is None:
+            # Trazo aún sin materializar: se comparte el origen (inmutable)
+            new_obj = FreehandObject(self.color, self.width, path_source=self.path_source)
+        else:
+            new_obj = FreehandObject(self.color, self.width)
+            new_obj.path = QPainterPath(self._path)
         memo[id(self)] = new_obj
         return new_obj
 
@@ -0,0 +1,658 @@
+"""
+Formato de archivo de escena (pizarra) para ScreenPaint.
+
+Dos variantes del mismo modelo de registros:
+- Binario (.spscene): cabecera + registros empaquetados con `struct`. Los
+  trazos libres guardan sus coordenadas como arreglos float64 contiguos y se
+  leen de forma perezosa desde un `mmap` del archivo.
+- JSON (.json): una línea JSON por registro (JSON Lines), legible y apta para
+  lectura en streaming.
+
+Cada objeto recibe un índice de registro; las dependencias (puntos de líneas,
+esquinas de rectángulos, `parents` de intersecciones, `reference_line`,
+`radius_param` de compás) se escriben antes que el objeto que las usa y se
+referencian por índice, de modo que la identidad compartida se conserva al
+cargar. Los objetos auxiliares que no están en la lista de la escena se
+guardan igualmente pero no se devuelven en ella.
+
+Para serializar fuera del hilo de la UI (guardado, diario), `snapshot_scene`
+copia antes la escena en ese hilo: los trazos comparten su QPainterPath (los
+terminados nunca se modifican en sitio, move() lo reemplaza) y el resto se
+copia entero, así que los cambios posteriores no se mezclan con la copia.
+"""
+
+import copy
+import json
+import mmap
+import os
+import struct
+import weakref
+from array import array
+
+from PyQt6.QtCore import QPoint, QPointF
+from PyQt6.QtGui import QColor, QPainterPath
+
+from core.geometric_elements import (PointObject, LineObject, CircleObject,
+                                     RectangleObject, FreehandObject, TextObject)
+
+SCENE_EXTENSION = '.spscene'
+SCENE_VERSION = 1
+
+_MAGIC = b'SPSC'
+_HEADER = struct.Struct('<4sHHII')      # magic, versión, flags, nº registros, siguiente id de punto
+_RECORD = struct.Struct('<BiI')         # tipo, orden z (-1 = auxiliar), tamaño del payload
+_POINT = struct.Struct('<iiiIiii')      # x, y, id, color, size, parent_a, parent_b
+_LINE = struct.Struct('<BiiiId')        # tipo, p1, p2, reference_line, color, width
+_CIRCLE = struct.Struct('<BiIdBdii')    # tipo, centro, color, width, filled, radio, pA, pB
+_RECT = struct.Struct('<iiiiIdBddddd')  # 4 esquinas, color, width, flags, rotación, semiejes, centro
+_TEXT = struct.Struct('<iiiiiII')       # esquina1, esquina2, font_size, color, longitud utf-8
+_STROKE = struct.Struct('<IdI')         # color, width, nº de elementos del path
+
+_KIND_POINT, _KIND_LINE, _KIND_CIRCLE, _KIND_RECT, _KIND_FREEHAND, _KIND_TEXT = range(1, 7)
+_KIND_NAMES = {
+    _KIND_POINT: 'point', _KIND_LINE: 'line', _KIND_CIRCLE: 'circle',
+    _KIND_RECT: 'rectangle', _KIND_FREEHAND: 'freehand', _KIND_TEXT: 'text',
+}
+_KIND_BY_NAME = {name: kind for kind, name in _KIND_NAMES.items()}
+
+_LINE_TYPES = ('segment', 'ray', 'line', 'hline', 'vline', 'parallel', 'perpendicular')
+_CIRCLE_TYPES = ('radius_num', 'center_point', 'compass')
+
+_RECT_FILLED = 0x01
+_RECT_REDACT = 0x02    # Zona privada (tools.redaction)
+
+_NO_REF = -1
+
+# Archivos actualmente mapeados, para poder desligarlos antes de sobrescribirlos
+_open_mappings = weakref.WeakValueDictionary()
+
+# Trazos ya empaquetados: id(QPainterPath) -> (weakref, nº de elementos, bytes).
+# Los paths de trazos terminados no cambian (move() los reemplaza) y una copia de
+# snapshot_scene comparte el del original: también aprovecha el empaquetado.
+# (QPainterPath no es hashable: la clave es su id, comprobada con la weakref.)
+_packed_strokes = {}
+
+
+def _forget_packed(key, ref):
+    entry = _packed_strokes.get(key)
+    if entry is not None and entry[0] is ref:
+        _packed_strokes.pop(key, None)
+
+
+# --- Utilidades ---
+
+def _color_to_int(color):
+    return QColor(color).rgba()
+
+
+def _int_to_color(value):
+    return QColor.fromRgba(value)
+
+
+def _number(value):
+    """Devuelve int si el valor es entero (los grosores suelen serlo)."""
+    return int(value) if float(value).is_integer() else value
+
+
+def _is_json(filename):
+    return filename.lower().endswith('.json')
+
+
+class _SceneMapping:
+    """Mapeo en memoria de un archivo de escena compartido por los trazos perezosos."""
+
+    def __init__(self, filename):
+        self.filename = os.path.abspath(filename)
+        self._file = open(filename, 'rb')
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _open_mappings[self.filename] = self
+
+    def detach(self):
+        """Copia el contenido a memoria y libera el archivo (p. ej. antes de sobrescribirlo)."""
+        if isinstance(self.buffer, mmap.mmap):
+            mapped = self.buffer
+            self.buffer = bytes(mapped)
+            mapped.close()
+            self._file.close()
+        _open_mappings.pop(self.filename, None)
+
+    def __del__(self):
+        try:
+            if isinstance(self.buffer, mmap.mmap):
+                self.buffer.close()
+                self._file.close()
+        except Exception:
+            pass
+
+
+class _StrokeSource:
+    """Trazo empaquetado (tipos de elemento + coordenadas) pendiente de materializar."""
+
+    def __init__(self, mapping, offset, count):
+        self.mapping = mapping   # objeto con atributo `buffer` (mmap o bytes)
+        self.offset = offset
+        self.count = count
+
+    def packed(self):
+        """Bytes de tipos y coordenadas tal como se guardan en el archivo."""
+        end = self.offset + self.count + self.count * 16
+        return bytes(memoryview(self.mapping.buffer)[self.offset:end])
+
+    def arrays(self):
+        view = memoryview(self.mapping.buffer)
+        types = array('B')
+        types.frombytes(view[self.offset:self.offset + self.count])
+        coords = array('d')
+        start = self.offset + self.count
+        coords.frombytes(view[start:start + self.count * 16])
+        return types, coords
+
+    def build_path(self):
+        types, coords = self.arrays()
+        return _path_from_arrays(types, coords)
+
+
+class _BytesBuffer:
+    def __init__(self, data):
+        self.buffer = data
+
+
+def _path_to_arrays(path):
+    count = path.elementCount()
+    types = array('B', bytes(count))
+    coords = array('d', bytes(count * 16))
+    for i in range(count):
+        e = path.elementAt(i)
+        types[i] = e.type.value
+        coords[2 * i] = e.x
+        coords[2 * i + 1] = e.y
+    return types, coords
+
+
+def _pack_stroke(obj):
+    """Devuelve (nº de elementos, bytes) del trazo, reutilizando el empaquetado previo."""
+    if obj.path_source is not None:
+        return obj.path_source.count, obj.path_source.packed()
+    path = obj.path
+    key = id(path)
+    cached = _packed_strokes.get(key)
+    if cached is not None and cached[0]() is path:
+        return cached[1], cached[2]
+    types, coords = _path_to_arrays(path)
+    packed = types.tobytes() + coords.tobytes()
+    ref = weakref.ref(path, lambda ref, key=key: _forget_packed(key, ref))
+    _packed_strokes[key] = (ref, len(types), packed)
+    return len(types), packed
+
+
+def _path_from_arrays(types, coords):
+    path = QPainterPath()
+    move_to = QPainterPath.ElementType.MoveToElement.value
+    line_to = QPainterPath.ElementType.LineToElement.value
+    curve_to = QPainterPath.ElementType.CurveToElement.value
+    i, count = 0, len(types)
+    while i < count:
+        t = types[i]
+        x, y = coords[2 * i], coords[2 * i + 1]
+        if t == move_to:
+            path.moveTo(x, y)
+        elif t == line_to:
+            path.lineTo(x, y)
+        elif t == curve_to and i + 2 < count:
+            path.cubicTo(x, y, coords[2 * i + 2], coords[2 * i + 3], coords[2 * i + 4], coords[2 * i + 5])
+            i += 3
+            continue
+        i += 1
+    return path
+
+
+# --- Orden de dependencias ---
+
+def _dependencies(obj):
+    if isinstance(obj, PointObject):
+        return list(obj.parents) if obj.parents else []
+    if isinstance(obj, LineObject):
+        deps = [obj.p1_obj]
+        if obj.p2_obj is not None:
+            deps.append(obj.p2_obj)
+        if obj.reference_line is not None:
+            deps.append(obj.reference_line)
+        return deps
+    if isinstance(obj, CircleObject):
+        deps = [obj.center_obj]
+        if isinstance(obj.radius_param, PointObject):
+            deps.append(obj.radius_param)
+        elif isinstance(obj.radius_param, tuple):
+            deps.extend(obj.radius_param)
+        return deps
+    if isinstance(obj, RectangleObject):
+        return list(obj.points)
+    return []
+
+
+def _ordered_records(objects):
+    """Lista de (objeto, z) con cada dependencia antes de quien la usa."""
+    z_order = {id(obj): z for z, obj in enumerate(objects)}
+    ordered, seen, visiting = [], set(), set()
+
+    for root in objects:
+        stack = [(root, False)]
+        while stack:
+            obj, expanded = stack.pop()
+            if id(obj) in seen:
+                continue
+            if expanded:
+                seen.add(id(obj))
+                ordered.append((obj, z_order.get(id(obj), -1)))
+                continue
+            if id(obj) in visiting:
+                continue  # Ciclo: no debería ocurrir, pero evita un bucle infinito
+            visiting.add(id(obj))
+            stack.append((obj, True))
+            for dep in reversed(_dependencies(obj)):
+                if id(dep) not in seen:
+                    stack.append((dep, False))
+    return ordered
+
+
+def connected(objects, seeds):
+    """Objetos unidos a `seeds` por referencias (en cualquier sentido), ellos incluidos.
+
+    Es lo que puede cambiar al modificar uno: mover un punto mueve sus líneas,
+    las intersecciones que dependen de ellas y las otras esquinas del
+    rectángulo. Sólo cuentan los objetos de `objects` y sus dependencias.
+    """
+    seeds = list(seeds)
+    if all(type(obj) in (FreehandObject, TextObject) for obj in seeds):
+        # Nada depende de ellos ni ellos de nada: sin recorrer la escena
+        return [obj for obj in seeds if obj in objects]
+    neighbours, nodes = {}, {}
+    for root in objects:
+        if type(root) is FreehandObject:
+            continue
+        stack = [root]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in nodes:
+                continue
+            nodes[id(obj)] = obj
+            for dep in _dependencies(obj):
+                neighbours.setdefault(id(obj), []).append(dep)
+                neighbours.setdefault(id(dep), []).append(obj)
+                stack.append(dep)
+    found, stack = {}, [obj for obj in seeds if id(obj) in nodes or obj in objects]
+    while stack:
+        obj = stack.pop()
+        if id(obj) not in found:
+            found[id(obj)] = obj
+            stack.extend(neighbours.get(id(obj), ()))
+    return list(found.values())
+
+
+# --- Escritura binaria ---
+
+def _encode_record(obj, index_of):
+    ref = lambda o: index_of[id(o)] if o is not None else _NO_REF
+
+    if isinstance(obj, PointObject):
+        pa, pb = (ref(obj.parents[0]), ref(obj.parents[1])) if obj.parents else (_NO_REF, _NO_REF)
+        return _KIND_POINT, _POINT.pack(obj.x, obj.y, obj.id, _color_to_int(obj.color), obj.size, pa, pb)
+
+    if isinstance(obj, LineObject):
+        return _KIND_LINE, _LINE.pack(_LINE_TYPES.index(obj.type), ref(obj.p1_obj), ref(obj.p2_obj),
+                                      ref(obj.reference_line), _color_to_int(obj.color), obj.width)
+
+    if isinstance(obj, CircleObject):
+        radius, pa, pb = 0.0, _NO_REF, _NO_REF
+        if obj.type == 'radius_num':
+            radius = float(obj.radius_param)
+        elif isinstance(obj.radius_param, PointObject):
+            pa = ref(obj.radius_param)
+        elif isinstance(obj.radius_param, tuple):
+            pa, pb = ref(obj.radius_param[0]), ref(obj.radius_param[1])
+        return _KIND_CIRCLE, _CIRCLE.pack(_CIRCLE_TYPES.index(obj.type), ref(obj.center_obj),
+                                          _color_to_int(obj.color), obj.width, int(obj.filled),
+                                          radius, pa, pb)
+
+    if isinstance(obj, RectangleObject):
+        flags = (_RECT_FILLED if obj.filled else 0) | (_RECT_REDACT if obj.redact else 0)
+        c = obj.original_center
+        return _KIND_RECT, _RECT.pack(*[ref(p) for p in obj.points], _color_to_int(obj.color), obj.width,
+                                      flags, obj.rotation, obj.original_half_width,
+                                      obj.original_half_height, c.x(), c.y())
+
+    if isinstance(obj, FreehandObject):
+        count, packed = _pack_stroke(obj)
+        return _KIND_FREEHAND, _STROKE.pack(_color_to_int(obj.color), obj.width, count) + packed
+
+    if isinstance(obj, TextObject):
+        text = obj.text.encode('utf-8')
+        c1, c2 = obj.rect_corner1, obj.rect_corner2
+        return _KIND_TEXT, _TEXT.pack(c1.x(), c1.y(), c2.x(), c2.y(), obj.font_size,
+                                      _color_to_int(obj.color), len(text)) + text
+
+    raise TypeError(f"Tipo de objeto no soportado: {type(obj).__name__}")
+
+
+def _write_binary(f, objects, next_point_id):
+    records = _ordered_records(objects)
+    index_of = {}
+    f.write(_HEADER.pack(_MAGIC, SCENE_VERSION, 0, len(records), next_point_id))
+    for i, (obj, z) in enumerate(records):
+        kind, payload = _encode_record(obj, index_of)
+        index_of[id(obj)] = i
+        f.write(_RECORD.pack(kind, z, len(payload)))
+        f.write(payload)
+    return [obj for obj, _ in records]
+
+
+def dumps_scene(objects, next_point_id=1):
+    """Serializa la escena al formato binario y devuelve los bytes."""
+    return dump_records(objects, next_point_id)[0]
+
+
+def dump_records(objects, next_point_id=1):
+    """Como dumps_scene; devuelve además los objetos en el orden de sus registros
+    (dependencias incluidas)."""
+    import io
+    buf = io.BytesIO()
+    records = _write_binary(buf, objects, next_point_id)
+    return buf.getvalue(), records
+
+
+# --- Escritura JSON ---
+
+def _json_record(obj, index_of):
+    ref = lambda o: index_of[id(o)] if o is not None else None
+
+    if isinstance(obj, PointObject):
+        return {'kind': 'point', 'x': obj.x, 'y': obj.y, 'id': obj.id, 'color': _color_to_int(obj.color),
+                'size': obj.size, 'parents': [ref(p) for p in obj.parents] if obj.parents else None}
+    if isinstance(obj, LineObject):
+        return {'kind': 'line', 'type': obj.type, 'p1': ref(obj.p1_obj), 'p2': ref(obj.p2_obj),
+                'reference_line': ref(obj.reference_line), 'color': _color_to_int(obj.color),
+                'width': obj.width}
+    if isinstance(obj, CircleObject):
+        if obj.type == 'radius_num':
+            radius = float(obj.radius_param)
+        elif isinstance(obj.radius_param, tuple):
+            radius = [ref(p) for p in obj.radius_param]
+        else:
+            radius = ref(obj.radius_param)
+        return {'kind': 'circle', 'type': obj.type, 'center': ref(obj.center_obj), 'radius': radius,
+                'color': _color_to_int(obj.color), 'width': obj.width, 'filled': obj.filled}
+    if isinstance(obj, RectangleObject):
+        c = obj.original_center
+        return {'kind': 'rectangle', 'points': [ref(p) for p in obj.points],
+                'color': _color_to_int(obj.color), 'width': obj.width, 'filled': obj.filled,
+                'rotation': obj.rotation, 'half_size': [obj.original_half_width, obj.original_half_height],
+                'center': [c.x(), c.y()], 'redact': obj.redact}
+    if isinstance(obj, FreehandObject):
+        if obj.path_source is not None:
+            types, coords = obj.path_source.arrays()
+        else:
+            types, coords = _path_to_arrays(obj.path)
+        return {'kind': 'freehand', 'color': _color_to_int(obj.color), 'width': obj.width,
+                'types': list(types), 'coords': list(coords)}
+    if isinstance(obj, TextObject):
+        c1, c2 = obj.rect_corner1, obj.rect_corner2
+        return {'kind': 'text', 'rect': [c1.x(), c1.y(), c2.x(), c2.y()], 'text': obj.text,
+                'font_size': obj.font_size, 'color': _color_to_int(obj.color)}
+    raise TypeError(f"Tipo de objeto no soportado: {type(obj).__name__}")
+
+
+def _write_json(f, objects, next_point_id):
+    records = _ordered_records(objects)
+    index_of = {}
+    header = {'format': 'screenpaint-scene', 'version': SCENE_VERSION,
+              'records': len(records), 'next_point_id': next_point_id}
+    f.write(json.dumps(header) + '\n')
+    for i, (obj, z) in enumerate(records):
+        rec = _json_record(obj, index_of)
+        rec['z'] = z
+        index_of[id(obj)] = i
+        f.write(json.dumps(rec, separators=(',', ':')) + '\n')
+
+
+def snapshot_scene(objects, memo=None):
+    """Copia de `objects` que otro hilo puede serializar mientras la UI sigue editando.
+
+    Se llama en el hilo de la UI. Los trazos libres se copian sin su path
+    (compartido) y el resto con deepcopy, conservando la identidad compartida.
+    Con `memo` (un dict vacío), queda en él id(original) -> copia.
+    """
+    new_stroke = FreehandObject.__new__
+    memo = {} if memo is None else memo
+    others = []
+    for obj in objects:
+        if type(obj) is FreehandObject:
+            twin = new_stroke(FreehandObject)
+            twin.__dict__.update(obj.__dict__)
+            memo[id(obj)] = twin
+        else:
+            others.append(obj)
+    copy.deepcopy(others, memo)     # Deja cada copia en memo, con sus dependencias compartidas
+    return [memo[id(obj)] for obj in objects]
+
+
+def release_file(filename):
+    """Desliga los trazos perezosos mapeados desde `filename` antes de sobrescribirlo.
+
+    Con el guardado en otro hilo, llamarla antes en el hilo de la UI: los trazos
+    pueden estar leyendo el mapeo.
+    """
+    mapping = _open_mappings.get(os.path.abspath(filename))
+    if mapping is not None:
+        mapping.detach()
+
+
+def save_scene(objects, filename, next_point_id=1):
+    """Guarda la escena. El formato se elige por extensión (.json o binario)."""
+    release_file(filename)
+
+    tmp = filename + '.tmp'
+    if _is_json(filename):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            _write_json(f, objects, next_point_id)
+    else:
+        with open(tmp, 'wb') as f:
+            _write_binary(f, objects, next_point_id)
+    os.replace(tmp, filename)
+
+
+# --- Lectura ---
+
+def _build_object(kind, fields, table):
+    """Crea el objeto a partir de campos ya decodificados (referencias como índices)."""
+    get = lambda i: table[i] if i is not None and i != _NO_REF else None
+
+    if kind == _KIND_POINT:
+        x, y, id_num, color, size, parents = fields
+        parents = tuple(get(p) for p in parents) if parents else None
+        obj = PointObject(x, y, id_num, size=size, parents=parents)
+        obj.color = _int_to_color(color)
+        return obj
+
+    if kind == _KIND_LINE:
+        line_type, p1, p2, ref_line, color, width = fields
+        return LineObject(get(p1), get(p2), line_type, _int_to_color(color), _number(width),
+                          reference_line=get(ref_line))
+
+    if kind == _KIND_CIRCLE:
+        circle_type, center, radius, color, width, filled = fields
+        if circle_type == 'compass':
+            radius = (get(radius[0]), get(radius[1]))
+        elif circle_type == 'center_point':
+            radius = get(radius)
+        return CircleObject(get(center), radius, circle_type, _int_to_color(color), _number(width),
+                            filled=bool(filled))
+
+    if kind == _KIND_RECT:
+        points, color, width, filled, rotation, half_size, center, redact = fields
+        obj = RectangleObject(*[get(p) for p in points], color=_int_to_color(color),
+                              width=_number(width), filled=bool(filled), redact=bool(redact))
+        obj.rotation = _number(rotation)
+        obj.original_half_width, obj.original_half_height = half_size
+        obj.original_center = QPointF(*center)
+        return obj
+
+    if kind == _KIND_FREEHAND:
+        color, width, source = fields
+        return FreehandObject(_int_to_color(color), _number(width), path_source=source)
+
+    if kind == _KIND_TEXT:
+        rect, text, font_size, color = fields
+        return TextObject(QPoint(rect[0], rect[1]), QPoint(rect[2], rect[3]), text, font_size,
+                          _int_to_color(color))
+
+    raise ValueError(f"Tipo de registro desconocido: {kind}")
+
+
+def _decode_binary(mapping, offset):
+    buf = mapping.buffer
+    if len(buf) < _HEADER.size:
+        raise ValueError("Archivo de escena truncado")
+    magic, version, _flags, count, next_id = _HEADER.unpack_from(buf, offset)
+    if magic != _MAGIC:
+        raise ValueError("No es un archivo de escena de ScreenPaint")
+    if version > SCENE_VERSION:
+        raise ValueError(f"Versión de escena no soportada: {version}")
+    yield next_id
+
+    pos = offset + _HEADER.size
+    for _ in range(count):
+        kind, z, size = _RECORD.unpack_from(buf, pos)
+        pos += _RECORD.size
+        if kind == _KIND_FREEHAND:      # Casi todos los registros de una pizarra grande
+            color, width, n = _STROKE.unpack_from(buf, pos)
+            fields = (color, width, _StrokeSource(mapping, pos + _STROKE.size, n))
+        elif kind == _KIND_POINT:
+            x, y, id_num, color, psize, pa, pb = _POINT.unpack_from(buf, pos)
+            fields = (x, y, id_num, color, psize, (pa, pb) if pa != _NO_REF else None)
+        elif kind == _KIND_LINE:
+            t, p1, p2, ref_line, color, width = _LINE.unpack_from(buf, pos)
+            fields = (_LINE_TYPES[t], p1, p2, ref_line, color, width)
+        elif kind == _KIND_CIRCLE:
+            t, center, color, width, filled, radius, pa, pb = _CIRCLE.unpack_from(buf, pos)
+            circle_type = _CIRCLE_TYPES[t]
+            if circle_type == 'compass':
+                radius = (pa, pb)
+            elif circle_type == 'center_point':
+                radius = pa
+            fields = (circle_type, center, radius, color, width, filled)
+        elif kind == _KIND_RECT:
+            values = _RECT.unpack_from(buf, pos)
+            fields = (values[0:4], values[4], values[5], values[6] & _RECT_FILLED,
+                      values[7], values[8:10], values[10:12], values[6] & _RECT_REDACT)
+        elif kind == _KIND_TEXT:
+            c1x, c1y, c2x, c2y, font_size, color, n = _TEXT.unpack_from(buf, pos)
+            start = pos + _TEXT.size
+            text = bytes(memoryview(buf)[start:start + n]).decode('utf-8')
+            fields = ((c1x, c1y, c2x, c2y), text, font_size, color)
+        else:
+            raise ValueError(f"Tipo de registro desconocido: {kind}")
+        pos += size
+        yield kind, z, fields
+
+
+def _decode_json(f):
+    header = json.loads(f.readline())
+    if header.get('format') != 'screenpaint-scene':
+        raise ValueError("No es un archivo de escena de ScreenPaint")
+    if header.get('version', 0) > SCENE_VERSION:
+        raise ValueError(f"Versión de escena no soportada: {header.get('version')}")
+    yield header.get('next_point_id', 1)
+
+    for line in f:
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        kind = _KIND_BY_NAME[rec['kind']]
+        if kind == _KIND_POINT:
+            fields = (rec['x'], rec['y'], rec['id'], rec['color'], rec['size'], rec['parents'])
+        elif kind == _KIND_LINE:
+            fields = (rec['type'], rec['p1'], rec['p2'], rec['reference_line'], rec['color'], rec['width'])
+        elif kind == _KIND_CIRCLE:
+            fields = (rec['type'], rec['center'], rec['radius'], rec['color'], rec['width'], rec['filled'])
+        elif kind == _KIND_RECT:
+            fields = (rec['points'], rec['color'], rec['width'], rec['filled'], rec['rotation'],
+                      rec['half_size'], rec['center'], rec.get('redact', False))
+        elif kind == _KIND_FREEHAND:
+            types = array('B', rec['types'])
+            coords = array('d', rec['coords'])
+            source = _StrokeSource(_BytesBuffer(types.tobytes() + coords.tobytes()), 0, len(types))
+            fields = (rec['color'], rec['width'], source)
+        else:
+            fields = (rec['rect'], rec['text'], rec['font_size'], rec['color'])
+        yield kind, rec.get('z', -1), fields
+
+
+def _iter_decoded(records, resolve=None):
+    """Construye los objetos en orden de archivo; primero el siguiente id, luego (z, objeto).
+
+    Los trazos libres van por un camino corto: sin __init__ y con un QColor por
+    color distinto (se reemplazan, no se modifican en sitio). Su path sigue sin
+    leerse hasta el primer acceso. `resolve(i, objeto)` elige el objeto que
+    ocupa el registro i para las referencias siguientes (ver loads_records).
+    """
+    yield next(records)
+    table = []
+    new_stroke = FreehandObject.__new__
+    colors = {}
+    for kind, z, fields in records:
+        if kind == _KIND_FREEHAND:
+            color, width, source = fields
+            qcolor = colors.get(color)
+            if qcolor is None:
+                qcolor = colors[color] = _int_to_color(color)
+            obj = new_stroke(FreehandObject)
+            obj.__dict__.update(_path=None, path_source=source, color=qcolor,
+                                width=_number(width))
+        else:
+            obj = _build_object(kind, fields, table)
+        if resolve is not None:
+            obj = resolve(len(table), obj)
+        table.append(obj)
+        yield z, obj
+
+
+def iter_scene(filename):
+    """
+    Lee la escena en streaming. El primer valor es el siguiente id de punto;
+    después, tuplas (z, objeto) en orden de archivo (z = -1 para auxiliares).
+    """
+    if _is_json(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            yield from _iter_decoded(_decode_json(f))
+    else:
+        yield from _iter_decoded(_decode_binary(_SceneMapping(filename), 0))
+
+
+def _collect(items):
+    next_id = next(items)
+    scene = [(z, obj) for z, obj in items if z >= 0]
+    scene.sort(key=lambda item: item[0])
+    return [obj for _, obj in scene], next_id
+
+
+def load_scene(filename):
+    """Carga la escena. Devuelve (objetos, siguiente id de punto)."""
+    return _collect(iter_scene(filename))
+
+
+def loads_scene(data):
+    """Decodifica bytes en formato binario. Devuelve (objetos, siguiente id de punto)."""
+    return _collect(_iter_decoded(_decode_binary(_BytesBuffer(bytes(data)), 0)))
+
+
+def loads_records(data, resolve):
+    """Decodifica bytes binarios registro a registro (dependencias incluidas).
+
+    `resolve(i, objeto)` devuelve el objeto que representa al registro i: el
+    recién decodificado u otro ya existente actualizado con él, que es al que
+    apuntarán las referencias de los registros siguientes. Devuelve
+    ([(z, objeto)], siguiente id de punto).
+    """
+    items = _iter_decoded(_decode_binary(_BytesBuffer(bytes(data)), 0), resolve)
+    next_id = next(items)
+    return list(items), next_id
@@ -0,0 +1,376 @@
+"""
+Diario de la escena para autoguardado y recuperación tras un cierre inesperado.
+
+Los cambios se registran como mutaciones pequeñas. Cada objeto del diario se
+identifica por una clave: el id() del objeto vivo en la UI, que no se reutiliza
+mientras el diario conserve la lista del último registro.
+- FRAME_ADD: objetos añadidos al final de la escena (con sus dependencias).
+- FRAME_UPDATE: objetos cambiados en sitio (movidos, recoloreados, girados,
+  texto editado) y los unidos a ellos por referencias.
+- FRAME_REMOVE: claves que salen de la escena.
+- FRAME_SCENE: la escena completa; al empezar y cuando se reemplaza entera
+  (deshacer, rehacer, abrir una pizarra).
+
+El hilo de la UI sólo copia los objetos afectados (`scene_file.snapshot_scene`,
+sin E/S) y deduce altas y bajas comparando la lista de objetos con la del
+último registro. Un hilo de fondo serializa cada mutación con
+`core.scene_file`, la añade al archivo de diario y hace `fsync` por lotes.
+También la aplica a su propia réplica de la escena, de la que sale la
+compactación: un único FRAME_SCENE que reemplaza el archivo de forma atómica
+(archivo temporal + `os.replace`), sin volver a copiar la escena en la UI.
+
+Formato del diario: fotogramas `<tipo:u8><longitud:u32><carga>`. La carga de
+FRAME_REMOVE es un arreglo de claves u64; la del resto, `<n:u32>`, n claves u64
+(una por registro, en orden) y un bloque de `scene_file.dump_records`. Al
+reproducir, un registro cuya clave ya existe actualiza ese objeto en sitio:
+las referencias entre fotogramas conservan la identidad compartida. Un
+fotograma final incompleto (cierre a mitad de escritura) se ignora.
+
+El directorio del diario lleva un bloqueo exclusivo (`session.lock`): una
+segunda instancia no lo abre ni lo recupera mientras la primera lo usa. La
+cola hacia el hilo de fondo está acotada; si se llena (disco lento), se
+descartan mutaciones y el siguiente registro es la escena completa.
+"""
+
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from core import scene_file
+
+FRAME_SCENE = 1
+FRAME_ADD = 2
+FRAME_UPDATE = 3
+FRAME_REMOVE = 4
+
+_FRAME = struct.Struct('<BI')
+_COUNT = struct.Struct('<I')
+
+JOURNAL_FILENAME = 'session.journal'
+LOCK_FILENAME = 'session.lock'
+
+
+def _keyed_payload(keys, blob):
+    return _COUNT.pack(len(keys)) + array('Q', keys).tobytes() + blob
+
+
+class _Replica:
+    """Escena reconstruida a partir de los fotogramas (hilo de fondo y recuperación)."""
+
+    def __init__(self):
+        self.objects = {}       # clave -> objeto
+        self.key_of = {}        # id(objeto) -> clave
+        self.scene = []         # claves de la escena, en orden
+        self.next_point_id = 1
+
+    def apply(self, kind, payload):
+        if kind == FRAME_REMOVE:
+            gone = set(array('Q', bytes(payload)))
+            self.scene = [key for key in self.scene if key not in gone]
+            return
+        (count,) = _COUNT.unpack_from(payload, 0)
+        start = _COUNT.size + 8 * count
+        keys = array('Q', bytes(payload[_COUNT.size:start]))
+        if kind == FRAME_SCENE:
+            self.objects, self.key_of = {}, {}
+        records, next_point_id = scene_file.loads_records(payload[start:], lambda i, obj: self._resolve(keys[i], obj))
+        members = sorted((z, self.key_of[id(obj)]) for z, obj in records if z >= 0)
+        if kind == FRAME_SCENE:
+            self.scene = [key for _, key in members]
+        elif kind == FRAME_ADD:
+            self.scene.extend(key for _, key in members)
+        self.next_point_id = max(self.next_point_id, next_point_id)
+
+    def _resolve(self, key, obj):
+        existing = self.objects.get(key)
+        if existing is not None and type(existing) is type(obj):
+            # Mismo objeto: se actualiza en sitio y quien lo referencia lo ve
+            existing.__dict__.clear()
+            existing.__dict__.update(obj.__dict__)
+            return existing
+        if existing is not None:
+            self.key_of.pop(id(existing), None)
+        self.objects[key] = obj
+        self.key_of[id(obj)] = key
+        return obj
+
+    def scene_objects(self):
+        return [self.objects[key] for key in self.scene]
+
+    def dump(self):
+        """Carga de un FRAME_SCENE con la escena; olvida los objetos que ya no alcanza."""
+        blob, ordered = scene_file.dump_records(self.scene_objects(), self.next_point_id)
+        keys = [self.key_of[id(obj)] for obj in ordered]
+        self.objects = dict(zip(keys, ordered))
+        self.key_of = {id(obj): key for key, obj in self.objects.items()}
+        return _keyed_payload(keys, blob)
+
+
+class SceneJournal:
+    """Escritor en segundo plano del diario de la escena."""
+
+    def __init__(self, directory, fsync_interval=1.0, compact_interval=60.0,
+                 compact_bytes=8 * 1024 * 1024, max_pending=256):
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL_FILENAME)
+        self.fsync_interval = fsync_interval
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._file = None
+        self._lock = None
+        self._members = []      # Lista de objetos del último registro (UI)
+        self._resync = False    # Se perdió una mutación: el siguiente registro es completo
+
+        # Réplica de la escena vista por el hilo de fondo (para compactar)
+        self._replica = _Replica()
+
+    # ===== API DEL HILO DE UI (no bloqueante) =====
+
+    def acquire(self):
+        """Toma el bloqueo exclusivo del directorio. False si otra instancia lo tiene."""
+        if self._lock:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock = open(os.path.join(self.directory, LOCK_FILENAME), 'a+b')
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._lock = lock
+        return True
+
+    def start(self, objects=(), next_point_id=1):
+        """Inicia un diario nuevo partiendo de la escena dada. False si no tiene el bloqueo."""
+        if not self.acquire():
+            print("Journal disabled: another instance holds the session journal")
+            return False
+        self._thread = threading.Thread(target=self._run, name="SceneJournal", daemon=True)
+        self._thread.start()
+        self._record_full(objects, next_point_id)
+        return True
+
+    def record_scene(self, objects, next_point_id):
+        """Registra la escena completa (p. ej. tras reemplazarla entera)."""
+        if self._thread:
+            self._record_full(objects, next_point_id)
+
+    def record_changes(self, objects, changed, next_point_id):
+        """Registra lo que cambió desde el último registro.
+
+        Altas y bajas salen de comparar `objects` con la lista anterior (la
+        escena sólo crece por el final, pierde objetos o se reemplaza);
+        `changed` son los objetos modificados en sitio. Si se reemplazó entera
+        o las altas no están al final, se registra la escena completa.
+        """
+        if not self._thread:
+            return
+        if self._resync:
+            self._record_full(objects, next_point_id)
+            return
+        members = self._members
+        if len(objects) >= len(members) and objects[:len(members)] == members:
+            removed, added = (), objects[len(members):]
+        else:
+            # Los objetos se comparan por identidad: los conjuntos se calculan en C
+            current, previous = set(objects), set(members)
+            removed = previous - current
+            new = current - previous
+            added = objects[len(objects) - len(new):] if new else []
+            if len(removed) == len(previous) or set(added) != new:
+                self._record_full(objects, next_point_id)
+                return
+
+        if removed:
+            self._enqueue((FRAME_REMOVE, [id(obj) for obj in removed], None, next_point_id))
+        if added:
+            self._put(FRAME_ADD, added, next_point_id)
+        added_ids = set(map(id, added))
+        updated = [obj for obj in scene_file.connected(objects, changed) if id(obj) not in added_ids]
+        if updated:
+            self._put(FRAME_UPDATE, updated, next_point_id)
+        self._members = list(objects)
+
+    def record_add(self, obj, next_point_id):
+        """Registra un objeto recién añadido al final de la escena (p. ej. un trazo)."""
+        if not self._thread:
+            return
+        if self._resync:
+            self._record_full(self._members + [obj], next_point_id)
+        else:
+            self._put(FRAME_ADD, [obj], next_point_id)
+            self._members.append(obj)
+
+    def close(self, discard=True):
+        """Vacía la cola y detiene el hilo. Con discard=True borra el diario (cierre limpio)."""
+        if self._writer_alive():
+            try:
+                self._queue.put(None, timeout=5)
+                self._thread.join(timeout=5)
+            except queue.Full:
+                print("Journal error: writer did not drain its queue before closing")
+            self._thread = None
+            if discard:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+        if self._lock:
+            self._lock.close()  # Cerrar el archivo libera el bloqueo
+            self._lock = None
+
+    def _record_full(self, objects, next_point_id):
+        self._resync = False
+        self._put(FRAME_SCENE, objects, next_point_id)
+        self._members = list(objects)
+
+    def _put(self, kind, objects, next_point_id):
+        if not self._writer_alive():
+            return
+        if self._queue.full() or (self._resync and kind != FRAME_SCENE):
+            # Sin copiar nada: la escena completa del siguiente registro lo cubre
+            self._resync = True
+            return
+        # La copia fija el estado actual; memo enlaza cada copia con su objeto vivo (la clave)
+        memo = {}
+        self._enqueue((kind, scene_file.snapshot_scene(objects, memo), memo, next_point_id))
+
+    def _enqueue(self, frame):
+        if not self._writer_alive():
+            return
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self._resync = True
+
+    def _writer_alive(self):
+        if self._thread and not self._thread.is_alive():
+            print("Journal error: writer thread stopped; autosave disabled")
+            self._thread = None
+        return self._thread is not None
+
+    # ===== RECUPERACIÓN =====
+
+    @staticmethod
+    def has_session(directory):
+        path = os.path.join(directory, JOURNAL_FILENAME)
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    @staticmethod
+    def load_session(directory):
+        """Reproduce el diario. Devuelve (objetos, siguiente id de punto)."""
+        path = os.path.join(directory, JOURNAL_FILENAME)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        replica = _Replica()
+        view = memoryview(data)
+        pos = 0
+        while pos + _FRAME.size <= len(data):
+            kind, size = _FRAME.unpack_from(data, pos)
+            start = pos + _FRAME.size
+            if start + size > len(data):
+                break  # Fotograma truncado por el cierre inesperado
+            try:
+                replica.apply(kind, view[start:start + size])
+            except Exception as e:
+                print(f"Journal frame error: {e}")
+                break
+            pos = start + size
+        return replica.scene_objects(), replica.next_point_id
+
+    # ===== HILO DE FONDO =====
+
+    def _run(self):
+        # El primer fotograma (escena inicial) reemplaza cualquier diario anterior
+        self._file = open(self.path, 'wb')
+        last_fsync = time.monotonic()
+        last_compact = time.monotonic()
+        frames_since_compact = 0
+        dirty = False
+        running = True
+
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+
+            # Una escena completa hace innecesario todo lo anterior del lote
+            for i in range(len(batch) - 1, -1, -1):
+                if batch[i][0] == FRAME_SCENE:
+                    batch = batch[i:]
+                    break
+
+            try:
+                for frame in batch:
+                    self._write_frame(*frame)
+                    frames_since_compact += 1
+                if batch:
+                    self._file.flush()
+                    dirty = True
+
+                # fsync por lotes: como mucho uno por intervalo
+                now = time.monotonic()
+                if dirty and (now - last_fsync >= self.fsync_interval or not running):
+                    os.fsync(self._file.fileno())
+                    last_fsync = now
+                    dirty = False
+
+                if frames_since_compact > 1 and running and (
+                        self._file.tell() >= self.compact_bytes or
+                        now - last_compact >= self.compact_interval):
+                    self._compact()
+                    frames_since_compact = 0
+                    last_compact = now
+            except Exception as e:
+                print(f"Journal error: {e}")
+
+        self._file.close()
+        self._file = None
+
+    def _write_frame(self, kind, objects, memo, next_point_id):
+        if kind == FRAME_REMOVE:
+            payload = array('Q', objects).tobytes()
+        else:
+            live_id = {id(twin): key for key, twin in memo.items()}
+            blob, ordered = scene_file.dump_records(objects, next_point_id)
+            payload = _keyed_payload([live_id[id(obj)] for obj in ordered], blob)
+        self._replica.apply(kind, payload)
+        self._file.write(_FRAME.pack(kind, len(payload)))
+        self._file.write(payload)
+
+    def _compact(self):
+        """Reescribe el diario como un único fotograma con la escena de la réplica."""
+        payload = self._replica.dump()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_FRAME.pack(FRAME_SCENE, len(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'ab')
@@ -1,25 +1,31 @@
 import sys
 import math
 import copy
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QInputDialog, QColorDialog, QFileDialog, QTextEdit
-from PyQt6.QtCore import Qt, QPoint, pyqtSignal, QRect, QPointF, QSizeF
-from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QFont, QCursor, QPainterPath
+from PyQt6.QtCore import Qt, QPoint, pyqtSignal, QRect, QPointF, QSizeF, QTimer
+from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QImage, QFont, QCursor, QPainterPath
 
 # Imports actualizados a nuevas ubicaciones
 from core.geometric_elements import (PointObject, LineObject, CircleObject,
                                      RectangleObject, FreehandObject, TextObject,
                                      calculate_intersection)
-from tools.capture_screen import take_screenshot
+from core import scene_file
 from config.preferences_manager import PreferencesManager
 from ui.preferences_dialog import PreferencesDialog
 from ui.text_options_widget import TextOptionsWidget
 from ui.circular_color_menu import CircularColorMenu
 
+# Herramientas que crean un RectangleObject (normal, relleno o zona privada)
+_RECT_TOOLS = ('rectangle', 'rectangle_filled', 'rectangle_redact')
+
 
 class TransparentOverlay(QWidget):
     interacted = pyqtSignal()
     crop_selected = pyqtSignal(QRect)
     minimize_requested = pyqtSignal()
+    scene_saved = pyqtSignal(str)               # Escena guardada en segundo plano (ruta)
+    _scene_save_done = pyqtSignal(str, str)     # Ruta y error ('' si se guardó), desde el hilo de guardado
 
     def __init__(self):
         super().__init__()
@@ -87,6 +93,20 @@ class TransparentOverlay(QWidget):
         self.preferences_manager = PreferencesManager()
         self.keyboard_shortcuts = self.preferences_manager.load_shortcuts()
         self.key_to_tool = {key_code: tool for tool, (key_code, _) in self.keyboard_shortcuts.items()}
+        self.preferences_manager.store.changed.connect(self._on_preferences_changed)
+
+        # Autoguardado: el diario escribe en segundo plano; aquí sólo se encola
+        self.journal = None
+        self._autosave_changed = set()  # Objetos modificados en sitio desde el último registro
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(1000)
+        self._autosave_timer.timeout.connect(self._record_scene)
+
+        # Guardado de escenas en un hilo: la UI sólo copia la escena (snapshot_scene)
+        self._scene_saver = None
+        self._scene_saves = 0
+        self._scene_save_done.connect(self._on_scene_save_done)
 
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -161,6 +181,12 @@ class TransparentOverlay(QWidget):
         self.currentTool = 'rectangle_filled'
         self.pending_p1 = None
         self._reset_tool_state()
+
+    def set_tool_rectangle_redact(self):
+        """Zona privada: rectángulo que capturas y grabaciones pixelan"""
+        self.currentTool = 'rectangle_redact'
+        self.pending_p1 = None
+        self._reset_tool_state()
         
     def set_tool_circle_radius(self):
         self.currentTool = 'circle_radius'
@@ -211,6 +237,7 @@ class TransparentOverlay(QWidget):
             self.save_state()
             self.selected_object.color = color
             self._propagate_color_change(self.selected_object)
+            self._schedule_autosave(self.selected_object)
             self.update()
 
     def _on_advanced_color_requested(self):
@@ -256,6 +283,7 @@ class TransparentOverlay(QWidget):
         state_objects, state_image = self.undo_stack.pop()
         self.objects = state_objects
         self.image = state_image
+        self._schedule_autosave()
         self.update()
 
     def redo(self):
@@ -265,6 +293,7 @@ class TransparentOverlay(QWidget):
         state_objects, state_image = self.redo_stack.pop()
         self.objects = state_objects
         self.image = state_image
+        self._schedule_autosave()
         self.update()
 
     def clear_canvas(self):
@@ -274,6 +303,98 @@ class TransparentOverlay(QWidget):
         self.pointIdCounter = 1
         self.pending_p1 = None
         self._reset_tool_state()
+        self._schedule_autosave()
+        self.update()
+
+    # ===== AUTOGUARDADO =====
+
+    def attach_journal(self, journal):
+        """Conecta el diario de autoguardado y registra la escena actual como base"""
+        if journal.start(self.objects, self.pointIdCounter):
+            self.journal = journal
+
+    def restore_objects(self, objects, next_point_id):
+        """Restaura una escena recuperada (p. ej. tras un cierre inesperado)"""
+        self.objects = objects
+        self.pointIdCounter = max(next_point_id, self.pointIdCounter)
+        self.update()
+
+    def _schedule_autosave(self, *changed):
+        """Programa el registro de los cambios (agrupa ráfagas).
+
+        `changed` son los objetos modificados en sitio; altas y bajas las deduce el diario.
+        """
+        if self.journal:
+            self._autosave_changed.update(obj for obj in changed if obj is not None)
+            self._autosave_timer.start()
+
+    def _record_scene(self):
+        if self.journal:
+            changed, self._autosave_changed = self._autosave_changed, set()
+            self.journal.record_changes(self.objects, changed, self.pointIdCounter)
+
+    # ===== ARCHIVOS DE ESCENA =====
+
+    def save_scene(self):
+        """Guarda la pizarra actual en un archivo de escena"""
+        if self.active_editor:
+            self._commit_text_editor()
+        fname, _ = QFileDialog.getSaveFileName(
+            self, "Guardar Pizarra", "",
+            f"Pizarra ScreenPaint (*{scene_file.SCENE_EXTENSION});;JSON (*.json)")
+        if not fname:
+            return
+        if not fname.lower().endswith((scene_file.SCENE_EXTENSION, '.json')):
+            fname += scene_file.SCENE_EXTENSION
+        try:
+            snapshot = scene_file.snapshot_scene(self.objects)
+            scene_file.release_file(fname)
+        except Exception as e:
+            print(f"Error saving scene: {e}")
+            return
+        if self._scene_saver is None:
+            # Un solo hilo: los guardados se escriben en orden
+            self._scene_saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SceneSave")
+        if self._scene_saves == 0:
+            QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        self._scene_saves += 1
+        self._scene_saver.submit(self._write_scene, snapshot, fname, self.pointIdCounter)
+
+    def _write_scene(self, snapshot, fname, next_point_id):
+        try:
+            scene_file.save_scene(snapshot, fname, next_point_id)
+            self._scene_save_done.emit(fname, '')
+        except Exception as e:
+            self._scene_save_done.emit(fname, str(e))
+
+    def _on_scene_save_done(self, fname, error):
+        self._scene_saves -= 1
+        if self._scene_saves == 0:
+            QApplication.restoreOverrideCursor()
+        if error:
+            print(f"Error saving scene: {error}")
+        else:
+            self.scene_saved.emit(fname)
+
+    def load_scene(self):
+        """Carga una pizarra desde archivo (reemplaza la escena actual, con deshacer)"""
+        fname, _ = QFileDialog.getOpenFileName(
+            self, "Abrir Pizarra", "",
+            f"Pizarra ScreenPaint (*{scene_file.SCENE_EXTENSION} *.json)")
+        if not fname:
+            return
+        try:
+            objects, next_point_id = scene_file.load_scene(fname)
+        except Exception as e:
+            print(f"Error loading scene: {e}")
+            return
+        self.save_state()
+        self.objects = objects
+        self.pointIdCounter = max(next_point_id, self.pointIdCounter)
+        self.pending_p1 = None
+        self.selected_object = None
+        self._reset_tool_state()
+        self._schedule_autosave()
         self.update()
 
     # ===== EVENTOS DE RESIZE Y PAINT =====
@@ -300,26 +421,14 @@ class TransparentOverlay(QWidget):
         if not self.image.isNull():
             painter.drawPixmap(0, 0, self.image)
         
-        for obj in self.objects:
-            if isinstance(obj, PointObject):
-                obj.draw(painter)
-            elif isinstance(obj, LineObject):
-                obj.draw(painter, self.rect())
-            elif isinstance(obj, CircleObject):
-                obj.draw(painter)
-            elif isinstance(obj, RectangleObject):
-                obj.draw(painter)
-            elif isinstance(obj, FreehandObject):
-                obj.draw(painter)
-            elif isinstance(obj, TextObject):
-                obj.draw(painter)
+        self._draw_objects(painter)
         
         if self.current_freehand_obj:
             self.current_freehand_obj.draw(painter)
         
         if self.currentTool in ['segment', 'ray', 'line'] and self.pending_p1:
             self._draw_line_preview(painter)
-        elif self.currentTool in ['rectangle', 'rectangle_filled'] and self.pending_p1:
+        elif self.currentTool in _RECT_TOOLS and self.pending_p1:
             self._draw_rect_preview(painter)
         elif self.currentTool in ['circle_center_point', 'circle_filled', 'circle_compass']:
             self._draw_circle_preview(painter)
@@ -352,6 +461,56 @@ class TransparentOverlay(QWidget):
             rect = QRect(self.pending_p1.pos(), mouse_pos).normalized()
             painter.drawRect(rect)
 
+    def _draw_objects(self, painter, redactions=True):
+        for obj in self.objects:
+            if not redactions and getattr(obj, 'redact', False):
+                continue
+            if isinstance(obj, PointObject):
+                obj.draw(painter)
+            elif isinstance(obj, LineObject):
+                obj.draw(painter, self.rect())
+            elif isinstance(obj, CircleObject):
+                obj.draw(painter)
+            elif isinstance(obj, RectangleObject):
+                obj.draw(painter)
+            elif isinstance(obj, FreehandObject):
+                obj.draw(painter)
+            elif isinstance(obj, TextObject):
+                obj.draw(painter)
+
+    def render_annotations(self, region=None, scale=1.0):
+        """Dibuja los objetos (sin previews ni fondo) en una QImage premultiplicada.
+
+        `region` está en coordenadas del overlay; `scale` convierte a píxeles
+        físicos para que la imagen coincida con la captura de pantalla.
+        """
+        region = QRect(region) if region is not None else self.rect()
+        image = QImage(max(1, round(region.width() * scale)), max(1, round(region.height() * scale)),
+                       QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.scale(scale, scale)
+        painter.translate(-region.topLeft())
+        # Las zonas privadas no se dibujan: en la captura se pixelan (tools.redaction)
+        self._draw_objects(painter, redactions=False)
+        if self.current_freehand_obj:
+            self.current_freehand_obj.draw(painter)
+        painter.end()
+        return image
+
+    def redaction_rects(self):
+        """Zonas privadas del overlay: [(x, y, ancho, alto)] en píxeles físicos del escritorio."""
+        dpr = self.devicePixelRatioF()
+        origin = self.geometry().topLeft()
+        rects = []
+        for obj in self.objects:
+            if isinstance(obj, RectangleObject) and obj.redact:
+                r = obj.bounding_rect().translated(origin)
+                rects.append((math.floor(r.x() * dpr), math.floor(r.y() * dpr),
+                              math.ceil((r.width() + 1) * dpr), math.ceil((r.height() + 1) * dpr)))
+        return rects
+
     # ===== PREVIEWS =====
 
     def _draw_pp_preview(self, painter):
@@ -379,7 +538,8 @@ class TransparentOverlay(QWidget):
         p4 = PointObject(x1, y3, 0, size=0)
         
         filled = (self.currentTool == 'rectangle_filled')
-        temp_rect = RectangleObject(p1, p2, p3, p4, self.brushColor, self.brushSize, filled=filled)
+        temp_rect = RectangleObject(p1, p2, p3, p4, self.brushColor, self.brushSize, filled=filled,
+                                    redact=(self.currentTool == 'rectangle_redact'))
         temp_rect.draw(painter, self.rect())
 
     def _draw_circle_preview(self, painter):
@@ -501,6 +661,7 @@ class TransparentOverlay(QWidget):
                     self.selected_object = hit_obj
                     hit_obj.color = self.brushColor
                     self._propagate_color_change(hit_obj)
+                    self._schedule_autosave(hit_obj)
                     self.update()
                 return
             
@@ -523,6 +684,7 @@ class TransparentOverlay(QWidget):
                     circle = CircleObject(center, radius, 'radius_num', color=self.brushColor, width=self.brushSize)
                     self.objects.append(circle)
                     self.update()
+                self._schedule_autosave()
                 
                 self.interacted.emit()
                 return
@@ -656,7 +818,7 @@ class TransparentOverlay(QWidget):
                     self.update()
                 return
 
-            if self.currentTool in ['rectangle', 'rectangle_filled']:
+            if self.currentTool in _RECT_TOOLS:
                 self.press_pos = pos
                 hit_p = self._get_point_at(pos)
                 
@@ -675,7 +837,8 @@ class TransparentOverlay(QWidget):
                     else:
                         rect_save = should_save
                         
-                    self._create_rectangle(self.pending_p1, hit_p, filled=(self.currentTool == 'rectangle_filled'), save_history=rect_save)
+                    self._create_rectangle(self.pending_p1, hit_p, filled=(self.currentTool == 'rectangle_filled'),
+                                           redact=(self.currentTool == 'rectangle_redact'), save_history=rect_save)
                 return
             
             if self.currentTool == 'text':
@@ -780,7 +943,7 @@ class TransparentOverlay(QWidget):
                     self._create_line_object(self.pending_p1, hit_p, save_history=line_save)
                     self.pending_p1 = None
 
-            if self.currentTool in ['rectangle', 'rectangle_filled'] and self.pending_p1 and self.press_pos:
+            if self.currentTool in _RECT_TOOLS and self.pending_p1 and self.press_pos:
                 drag_threshold = 5
                 dist = (pos - self.press_pos).manhattanLength()
                 
@@ -794,7 +957,8 @@ class TransparentOverlay(QWidget):
                     else:
                         rect_save = should_save
                     
-                    self._create_rectangle(self.pending_p1, hit_p, filled=(self.currentTool == 'rectangle_filled'), save_history=rect_save)
+                    self._create_rectangle(self.pending_p1, hit_p, filled=(self.currentTool == 'rectangle_filled'),
+                                           redact=(self.currentTool == 'rectangle_redact'), save_history=rect_save)
             
             if self.currentTool in ['circle_center_point', 'circle_filled'] and self.pending_p1 and self.press_pos:
                 drag_threshold = 5
@@ -829,13 +993,18 @@ class TransparentOverlay(QWidget):
                         self.crop_selected.emit(rect)
                         self.update()
                 
+            dragged = self.draggingObject
             self.drawing = False
             self.draggingObject = None
 
             if self.currentTool == 'pen' and self.current_freehand_obj:
                 self.objects.append(self.current_freehand_obj)
+                if self.journal:
+                    self.journal.record_add(self.current_freehand_obj, self.pointIdCounter)
                 self.current_freehand_obj = None
                 self.update()
+            elif self.currentTool != 'pen':
+                self._schedule_autosave(dragged)
             
             if self.currentTool == 'eraser':
                 self.update()
@@ -966,6 +1135,7 @@ class TransparentOverlay(QWidget):
 
         self.active_editor.deleteLater()
         self.active_editor = None
+        self._schedule_autosave(self.editing_text_obj)
         self.editing_text_obj = None
         self.text_options.hide()
         self.update()
@@ -1147,7 +1317,7 @@ class TransparentOverlay(QWidget):
                         if isinstance(other_p, PointObject):
                             other_p.color = source_obj.color
 
-    def _create_rectangle(self, p1_obj, p3_obj, filled=False, save_history=True):
+    def _create_rectangle(self, p1_obj, p3_obj, filled=False, redact=False, save_history=True):
         x1, y1 = p1_obj.pos().x(), p1_obj.pos().y()
         x3, y3 = p3_obj.pos().x(), p3_obj.pos().y()
         
@@ -1155,7 +1325,8 @@ class TransparentOverlay(QWidget):
         p4_obj = self._create_point(QPoint(x1, y3), save_history=False)
         
         if save_history: self.save_state()
-        new_rect = RectangleObject(p1_obj, p2_obj, p3_obj, p4_obj, color=self.brushColor, width=self.brushSize, filled=filled)
+        new_rect = RectangleObject(p1_obj, p2_obj, p3_obj, p4_obj, color=self.brushColor, width=self.brushSize,
+                                   filled=filled, redact=redact)
         self.objects.append(new_rect)
         self.pending_p1 = None
         self.update()
@@ -1257,6 +1428,7 @@ class TransparentOverlay(QWidget):
         self.pasting_preview = False
         self.paste_object = None
         self.setCursor(Qt.CursorShape.ArrowCursor)
+        self._schedule_autosave()
         self.update()
     
     def _delete_selected_object(self):
@@ -1276,6 +1448,7 @@ class TransparentOverlay(QWidget):
             self.objects.remove(obj_to_delete)
             self.selected_object = None
             self.draggingObject = None
+            self._schedule_autosave()
             self.update()
             return
         else:
@@ -1283,6 +1456,7 @@ class TransparentOverlay(QWidget):
         self._erase_objects_at(erase_pos)
         self.selected_object = None
         self.draggingObject = None
+        self._schedule_autosave()
         self.update()
     
     def _rotate_selected_rectangle(self, angle_increment):
@@ -1292,6 +1466,7 @@ class TransparentOverlay(QWidget):
         self.save_state()
         new_angle = (obj_to_rotate.rotation + angle_increment) % 360
         obj_to_rotate.rotate(new_angle)
+        self._schedule_autosave(obj_to_rotate)
         self.update()
     
     def _activate_tool_shortcut(self, tool_name):
@@ -1316,11 +1491,14 @@ class TransparentOverlay(QWidget):
     
     def _show_preferences(self):
         dialog = PreferencesDialog(self.keyboard_shortcuts, self)
-        if dialog.exec() == PreferencesDialog.DialogCode.Accepted:
-            self.keyboard_shortcuts = dialog.get_shortcuts()
-            self.key_to_tool = {key_code: tool for tool, (key_code, _) in self.keyboard_shortcuts.items()}
+        dialog.exec()
         self.setFocus()
         self.activateWindow()
+
+    def _on_preferences_changed(self, keys):
+        if 'shortcuts' in keys:
+            self.keyboard_shortcuts = self.preferences_manager.load_shortcuts()
+            self.key_to_tool = {key_code: tool for tool, (key_code, _) in self.keyboard_shortcuts.items()}
     
     def _deep_copy_object(self, obj):
         if isinstance(obj, PointObject):
@@ -1348,7 +1526,7 @@ class TransparentOverlay(QWidget):
             new_points = [PointObject(p.x, p.y, self.pointIdCounter + i, color=p.color, size=p.size) for i, p in enumerate(obj.points)]
             if len(new_points) == 4:
                 return RectangleObject(new_points[0], new_points[1], new_points[2], new_points[3], 
-                color=obj.color, width=obj.width, filled=obj.filled)
+                color=obj.color, width=obj.width, filled=obj.filled, redact=obj.redact)
         elif isinstance(obj, FreehandObject):
             return copy.deepcopy(obj)
         return None
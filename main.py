@@ -1,49 +1,179 @@
 import sys
-import time
-from PyQt6.QtWidgets import QApplication, QFileDialog
-from PyQt6.QtCore import Qt
+from contextlib import nullcontext
 
-# Imports actualizados a nuevas ubicaciones
-from ui.globalkeyfilter import GlobalKeyFilter
-from ui.float_menu import FloatingMenu, Toolbar
-from core.transparent_overlay import TransparentOverlay
-from tools.recording_overlay import ScreenRecordingOverlay
-from tools.capture_screen import take_screenshot
+# El perfilador se crea antes de cualquier otro import para medirlos todos
+from tools import startup_profiler
+_PROFILE_STARTUP, _PROFILE_JSON = startup_profiler.requested(sys.argv)
+profiler = None
+if _PROFILE_STARTUP:
+    profiler = startup_profiler.StartupProfiler(_PROFILE_JSON)
+    profiler.install_import_hook()
 
 
 def main():
-    app = QApplication(sys.argv)
-    app.setQuitOnLastWindowClosed(False)
+    # La interfaz se importa aquí y no al cargar el módulo: el proceso de captura
+    # (tools.capture_process, 'spawn') reimporta este archivo como __mp_main__ y
+    # así no carga PyQt ni las ventanas
+    from PyQt6.QtWidgets import QApplication, QFileDialog, QInputDialog, QMessageBox
+    from PyQt6.QtCore import Qt, QStandardPaths
+
+    # Imports actualizados a nuevas ubicaciones
+    from ui.globalkeyfilter import GlobalKeyFilter
+    from ui.float_menu import FloatingMenu, Toolbar
+    from ui.capture_gallery import record_capture
+    from core.transparent_overlay import TransparentOverlay
+    from core.scene_journal import SceneJournal
+    from config.preferences_manager import get_preferences_store
+    from tools.recording_overlay import ScreenRecordingOverlay
+    from tools.screenshot_service import ScreenshotService
+
+    section = profiler.section if profiler else (lambda name: nullcontext())
+
+    with section("QApplication"):
+        app = QApplication(sys.argv)
+        app.setQuitOnLastWindowClosed(False)
+        app.setApplicationName("ScreenPaint")
 
     # Instanciar ventanas
-    menu = FloatingMenu()
-    toolbar = Toolbar()
-    overlay = TransparentOverlay()
+    with section("FloatingMenu"):
+        menu = FloatingMenu()
+    with section("Toolbar"):
+        toolbar = Toolbar()
+    with section("TransparentOverlay"):
+        overlay = TransparentOverlay()
     # Overlay de grabación: marco de pantalla completa con panel de control
-    recording_overlay = ScreenRecordingOverlay()
+    with section("ScreenRecordingOverlay"):
+        recording_overlay = ScreenRecordingOverlay()
 
     # ===== CAPTURA DE PANTALLA =====
 
-    def handle_full_screenshot():
-        overlay.hide()
-        toolbar.hide()
-        time.sleep(0.3)
-        take_screenshot()
-        overlay.showFullScreen()
-        toolbar.show()
+    # Captura asíncrona: sin esperas en el hilo de la UI; las ventanas se
+    # restauran en cuanto hay imagen y el archivo se escribe en segundo plano
+    screenshots = ScreenshotService()
+
+    def on_screenshot_restored():
         toolbar.raise_()
         menu.raise_()
 
+    screenshots.restored.connect(on_screenshot_restored)
+    screenshots.saved.connect(lambda path: print(f"Screenshot saved: {path}"))
+    screenshots.saved.connect(record_capture)
+    screenshots.error_occurred.connect(lambda msg: print(f"Screenshot error: {msg}"))
+    app.aboutToQuit.connect(screenshots.shutdown)
+
+    screenshots.copied.connect(lambda: print("Screenshot copied to clipboard"))
+
+    # Zonas privadas: rectángulos «Zona Privada» del overlay y regiones fijas de las
+    # preferencias; capturas y grabaciones las pixelan antes de codificar
+    def redaction_rects():
+        regions = get_preferences_store().get('redaction')['regions']
+        return overlay.redaction_rects() + [tuple(r) for r in regions]
+
+    screenshots.redaction_source = redaction_rects
+    recording_overlay.set_redaction_source(redaction_rects)
+
+    # Sin ciclo de ocultar/mostrar: overlay y barra se excluyen de la imagen y
+    # las anotaciones se componen en memoria según la preferencia
+    def take_capture(rect=None, to_clipboard=False):
+        prefs = get_preferences_store()
+        if to_clipboard:
+            screenshots.capture_to_clipboard(overlay, prefs.get('capture_annotations'), rect=rect,
+                                             exclude=(overlay, toolbar, menu),
+                                             monitor=prefs.get('capture_monitor'),
+                                             save_copy=prefs.get('clipboard_save_copy'),
+                                             encoder=prefs.get('screenshot_encoder'))
+            return
+        screenshots.capture_annotated(overlay, prefs.get('capture_annotations'), rect=rect,
+                                      exclude=(overlay, toolbar, menu),
+                                      encoder=prefs.get('screenshot_encoder'),
+                                      monitor=prefs.get('capture_monitor'))
+
+    # El recorte se selecciona en el overlay; se recuerda a dónde va:
+    # 'file', 'clipboard' o 'record' (grabar sólo esa región)
+    crop_target = {'target': 'file'}
+
+    def handle_full_screenshot():
+        take_capture()
+
+    def handle_full_clipboard():
+        take_capture(to_clipboard=True)
+
+    def start_crop(target):
+        crop_target['target'] = target
+        overlay.set_tool_capture_crop()
+
     def handle_crop_screenshot(rect):
-        overlay.hide()
-        toolbar.hide()
         overlay.set_tool_pen()
-        time.sleep(0.3)
-        take_screenshot(rect=rect)
-        overlay.showFullScreen()
-        toolbar.show()
-        toolbar.raise_()
-        menu.raise_()
+        rect = rect.translated(overlay.geometry().topLeft())
+        if crop_target['target'] == 'record':
+            recording_overlay.show_overlay(rect)
+            return
+        take_capture(rect, to_clipboard=crop_target['target'] == 'clipboard')
+
+    # ===== CAPTURA POR INTERVALOS =====
+
+    interval_state = {'capture': None}
+
+    def on_interval_finished(summary):
+        interval_state['capture'] = None
+        toolbar.set_interval_capture_active(False)
+        text = (f"Capturas: {summary['captured']}\n"
+                f"Guardadas: {summary['saved']}\n"
+                f"Omitidas (sin cambios): {summary['skipped']}\n"
+                f"Carpeta: {summary['output_dir']}")
+        if summary['video']:
+            text += f"\nVídeo: {summary['video']}"
+        print(f"Interval capture finished: {summary}")
+        QMessageBox.information(None, "Captura por Intervalos", text)
+
+    def toggle_interval_capture():
+        running = interval_state['capture']
+        if running is not None:
+            running.stop()
+            return
+        prefs = get_preferences_store()
+        settings = prefs.get('interval_capture')
+        seconds, ok = QInputDialog.getDouble(None, "Captura por Intervalos", "Segundos entre capturas:",
+                                             settings['seconds'], 0.5, 3600, 1)
+        if not ok:
+            return
+        settings['seconds'] = seconds
+        prefs.set('interval_capture', settings)
+
+        from tools.capture_service import get_capture_service
+        from tools.interval_capture import IntervalCapture
+        try:
+            region = get_capture_service().region(monitor=prefs.get('capture_monitor'))
+        except Exception as e:
+            print(f"Interval capture error: {e}")
+            return
+        capture = IntervalCapture(region, seconds, settings['threshold'],
+                                  encoder=prefs.get('screenshot_encoder'),
+                                  make_video=settings['make_video'], redaction_source=redaction_rects)
+        capture.error_occurred.connect(lambda msg: print(f"Interval capture error: {msg}"))
+        capture.finished_summary.connect(on_interval_finished)
+        interval_state['capture'] = capture
+        toolbar.set_interval_capture_active(True)
+        capture.start()
+
+    def stop_interval_capture():
+        capture = interval_state['capture']
+        if capture is not None:
+            capture.stop()
+            capture.wait()
+
+    # ===== GALERÍA =====
+
+    gallery_state = {'gallery': None}
+
+    def show_gallery():
+        gallery = gallery_state['gallery']
+        if gallery is None:
+            from ui.capture_gallery import CaptureGallery
+            gallery = CaptureGallery()
+            app.aboutToQuit.connect(gallery.cache.shutdown)
+            gallery_state['gallery'] = gallery
+        gallery.show_gallery()
 
     # ===== VISIBILIDAD DEL TOOLBAR =====
 
@@ -125,11 +255,14 @@ def main():
     toolbar.tool_text.connect(overlay.set_tool_text)
     toolbar.tool_rectangle.connect(overlay.set_tool_rectangle)
     toolbar.tool_rectangle_filled.connect(overlay.set_tool_rectangle_filled)
+    toolbar.tool_rectangle_redact.connect(overlay.set_tool_rectangle_redact)
     toolbar.tool_undo.connect(overlay.undo)
     toolbar.tool_redo.connect(overlay.redo)
+    toolbar.tool_save_scene.connect(overlay.save_scene)
+    overlay.scene_saved.connect(lambda path: print(f"Scene saved: {path}"))
+    toolbar.tool_load_scene.connect(overlay.load_scene)
 
     toolbar.preferences_clicked.connect(overlay._show_preferences)
-    toolbar.preferences_clicked.connect(lambda: toolbar.update_from_preferences())
 
     def on_toggle_audio(checked):
         recording_overlay.audio_enabled = checked
@@ -137,7 +270,13 @@ def main():
     toolbar.tool_toggle_audio.connect(on_toggle_audio)
 
     toolbar.tool_capture_full.connect(handle_full_screenshot)
-    toolbar.tool_capture_crop.connect(overlay.set_tool_capture_crop)
+    toolbar.tool_capture_crop.connect(lambda: start_crop('file'))
+    toolbar.tool_clipboard_full.connect(handle_full_clipboard)
+    toolbar.tool_clipboard_crop.connect(lambda: start_crop('clipboard'))
+    toolbar.tool_interval_capture.connect(toggle_interval_capture)
+    toolbar.tool_gallery.connect(show_gallery)
+    recording_overlay.snapshot_saved.connect(record_capture)
+    app.aboutToQuit.connect(stop_interval_capture)
 
     def on_toggle_recording():
         if recording_overlay.isVisible():
@@ -145,8 +284,15 @@ def main():
         else:
             recording_overlay.show_overlay()
 
+    def on_record_crop():
+        # Con el panel abierto, la misma herramienta lo cierra; si no, se elige la región
+        if recording_overlay.isVisible():
+            recording_overlay.close_overlay()
+        else:
+            start_crop('record')
+
     toolbar.tool_record_full.connect(on_toggle_recording)
-    toolbar.tool_record_crop.connect(on_toggle_recording)
+    toolbar.tool_record_crop.connect(on_record_crop)
 
     # ===== CONEXIONES: OVERLAY =====
 
@@ -159,6 +305,37 @@ def main():
     overlay.crop_selected.connect(handle_crop_screenshot)
     overlay.minimize_requested.connect(hide_toolbar)
 
+    # ===== AUTOGUARDADO Y RECUPERACIÓN =====
+
+    # Al perfilar no se toca el diario: ni diálogo de recuperación ni sesión nueva.
+    # Si otra instancia tiene el diario bloqueado, ésta no lo recupera ni lo reemplaza.
+    journal = None
+    if not profiler:
+        journal_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppLocalDataLocation)
+        journal = SceneJournal(journal_dir)
+        if not journal.acquire():
+            print("Autosave disabled: another ScreenPaint instance is using the session journal")
+            journal = None
+    if journal and SceneJournal.has_session(journal_dir):
+        reply = QMessageBox.question(
+            None,
+            "Recuperar Sesión",
+            "ScreenPaint no se cerró correctamente la última vez.\n¿Deseas restaurar la última pizarra?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            try:
+                objects, next_point_id = SceneJournal.load_session(journal_dir)
+                overlay.restore_objects(objects, next_point_id)
+            except Exception as e:
+                print(f"Error restoring session: {e}")
+
+    if journal:
+        overlay.attach_journal(journal)
+        # Cierre limpio: el diario se descarta
+        app.aboutToQuit.connect(lambda: journal.close(discard=True))
+    app.aboutToQuit.connect(get_preferences_store().flush)
+
     # ===== FILTRO GLOBAL DE TECLAS =====
 
     def on_alt_double_press():
@@ -176,10 +353,18 @@ def main():
     screen = app.primaryScreen()
     screen_geo = screen.geometry()
     menu.move(20, 20)
+    if profiler:
+        def on_first_paint():
+            profiler.report()
+            app.quit()
+        profiler.watch_first_paint(menu, on_first_paint)
     menu.show()
 
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # El proceso de captura de la grabación se crea con 'spawn' (también en el ejecutable)
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,783 @@
+"""
+Benchmarks de rendimiento de ScreenPaint.
+
+Uso:
+    python -m tools.benchmark                 # lista los benchmarks
+    python -m tools.benchmark <nombre> [--opciones]
+
+Cada benchmark imprime sus resultados y termina con código 1 si no cumple su
+presupuesto, de modo que puede usarse como verificación automática.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_BENCHMARKS = {}
+
+
+def benchmark(name, description, arguments=()):
+    """Registra un benchmark. `arguments` es una lista de (flag, kwargs de argparse)."""
+    def register(func):
+        _BENCHMARKS[name] = (func, description, arguments)
+        return func
+    return register
+
+
+def _app():
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _report_latency(label, samples_ms):
+    print(f"  {label:<22} mediana {statistics.median(samples_ms):7.3f} ms   "
+          f"p99 {_percentile(samples_ms, 99):7.3f} ms   máx {max(samples_ms):7.3f} ms")
+
+
+# ===== DIARIO DE AUTOGUARDADO =====
+
+@benchmark('overlay-latency',
+           "Latencia de eventos de ratón con y sin diario de autoguardado (bucle de eventos real)",
+           [('--strokes', dict(type=int, default=100, help="Trazos simulados (cada uno seguido de un arrastre)")),
+            ('--moves', dict(type=int, default=30, help="Movimientos por trazo y por arrastre")),
+            ('--scene', dict(type=int, default=2000, help="Trazos previos en la escena")),
+            ('--compact-interval', dict(type=float, default=60.0,
+                                        help="Segundos entre compactaciones del diario (bajarlo mide su coste)")),
+            ('--budget-ms', dict(type=float, default=0.5,
+                                 help="Aumento máximo permitido del p99 al mover (ms)")),
+            ('--release-budget-ms', dict(type=float, default=5.0,
+                                         help="Aumento máximo permitido del p99 al soltar, con el registro (ms)"))])
+def bench_overlay_latency(args):
+    """Cada evento se publica en la cola de Qt y se mide hasta que el bucle la vacía.
+
+    La muestra incluye el manejador y los temporizadores que venzan en esa
+    vuelta. El temporizador del autoguardado se acorta a 0 ms, así que el
+    `_record_scene` que un arrastre programa cae en la muestra de su soltar.
+    Cada trazo se añade con el lápiz (registro inmediato) y luego se arrastra la
+    esquina de un rectángulo con la mano (registro diferido de los cambios).
+    El overlay no se muestra: el repintado es el mismo con y sin diario y, con
+    rasterizado por software, taparía la diferencia.
+    """
+    from PyQt6.QtCore import Qt, QEvent, QPoint, QPointF
+    from PyQt6.QtGui import QMouseEvent
+    from core.transparent_overlay import TransparentOverlay
+    from core.geometric_elements import FreehandObject
+    from core.scene_journal import SceneJournal
+
+    app = _app()
+    left = Qt.MouseButton.LeftButton
+
+    def make_overlay():
+        overlay = TransparentOverlay()
+        overlay.resize(1920, 1080)
+        for i in range(args.scene):
+            stroke = FreehandObject(width=3)
+            stroke.path.moveTo(i % 1900, i % 1000)
+            for k in range(30):
+                stroke.path.lineTo(i % 1900 + k, i % 1000 + k // 2)
+            overlay.objects.append(stroke)
+        corner = overlay._create_point(QPoint(1500, 100), save_history=False)
+        overlay._create_rectangle(corner, overlay._create_point(QPoint(1700, 300), save_history=False),
+                                  save_history=False)
+        overlay._autosave_timer.setInterval(0)
+        return overlay, corner
+
+    def send(overlay, kind, x, y):
+        button = left if kind != QEvent.Type.MouseMove else Qt.MouseButton.NoButton
+        buttons = Qt.MouseButton.NoButton if kind == QEvent.Type.MouseButtonRelease else left
+        t0 = time.perf_counter()
+        app.postEvent(overlay, QMouseEvent(kind, QPointF(x, y), QPointF(x, y), button, buttons,
+                                           Qt.KeyboardModifier.NoModifier))
+        app.processEvents()
+        return (time.perf_counter() - t0) * 1000
+
+    def gesture(overlay, x, y, step, samples):
+        # La pulsación no se mide: guarda el estado para deshacer igual con y sin diario
+        send(overlay, QEvent.Type.MouseButtonPress, x, y)
+        for m in range(1, args.moves + 1):
+            samples['mover'].append(send(overlay, QEvent.Type.MouseMove, x + m * step, y + m))
+        samples['soltar'].append(send(overlay, QEvent.Type.MouseButtonRelease, x + args.moves * step, y + args.moves))
+
+    def run(overlay, corner):
+        samples = {'mover': [], 'soltar': []}
+        for s in range(args.strokes):
+            overlay.set_tool_pen()
+            gesture(overlay, 10, 10 + s % 900, 3, samples)
+            overlay.set_tool_hand()
+            step = 1 if s % 2 == 0 else -1
+            gesture(overlay, corner.x, corner.y, step, samples)
+        return samples
+
+    print(f"Escena con {args.scene} trazos; {args.strokes} x (trazo + arrastre) de {args.moves} movimientos")
+    baseline = run(*make_overlay())
+    with tempfile.TemporaryDirectory() as tmp:
+        overlay, corner = make_overlay()
+        journal = SceneJournal(tmp, fsync_interval=0.05, compact_interval=args.compact_interval)
+        overlay.attach_journal(journal)
+        with_journal = run(overlay, corner)
+        journal.close(discard=True)
+
+    ok = True
+    for kind, budget in (('mover', args.budget_ms), ('soltar', args.release_budget_ms)):
+        _report_latency(f"{kind} sin diario", baseline[kind])
+        _report_latency(f"{kind} con diario", with_journal[kind])
+        delta = _percentile(with_journal[kind], 99) - _percentile(baseline[kind], 99)
+        print(f"  Aumento p99 ({kind}): {delta:.3f} ms (presupuesto {budget} ms)")
+        ok = ok and delta <= budget
+    return ok
+
+
+# ===== ARRANQUE =====
+
+@benchmark('startup',
+           "Tiempo hasta el primer pintado del FloatingMenu (python main.py --profile-startup)",
+           [('--runs', dict(type=int, default=5, help="Arranques medidos")),
+            ('--budget-ms', dict(type=float, default=500.0,
+                                 help="Mediana máxima permitida hasta el primer pintado (ms)"))])
+def bench_startup(args):
+    import json
+    import subprocess
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    if sys.platform.startswith('linux') and not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    samples, heavy = [], set()
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, 'startup.json')
+        for _ in range(args.runs):
+            proc = subprocess.run([sys.executable, 'main.py', f'--profile-startup={report}'],
+                                  cwd=root, env=env, capture_output=True, text=True, timeout=60)
+            if proc.returncode != 0 or not os.path.exists(report):
+                print(proc.stdout + proc.stderr)
+                return False
+            with open(report, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.remove(report)
+            samples.append(data['first_paint_ms'])
+            heavy.update(data['heavy_loaded'])
+
+    median = statistics.median(samples)
+    print(f"Primer pintado en {args.runs} arranques: mediana {median:.1f} ms   "
+          f"mín {min(samples):.1f} ms   máx {max(samples):.1f} ms (presupuesto {args.budget_ms} ms)")
+    if heavy:
+        print(f"  Dependencias pesadas cargadas en el arranque: {', '.join(sorted(heavy))}")
+    return median <= args.budget_ms and not heavy
+
+
+# ===== CAPTURAS DE PANTALLA =====
+
+class _SyntheticCapture:
+    """Sustituto de CaptureService con un frame fijo 'ANCHOxALTO' (sin servidor gráfico)."""
+
+    def __init__(self, size):
+        import numpy as np
+        self.width, self.height = (int(v) for v in size.lower().split('x'))
+        self.frame = np.random.default_rng(0).integers(
+            0, 256, (self.height, self.width, 4), dtype=np.uint8).tobytes()
+
+    def region(self, rect=None, monitor=None):
+        return {"left": 0, "top": 0, "width": self.width, "height": self.height}
+
+    def grab_region(self, region):
+        return self.frame, self.width, self.height
+
+
+def _capture(synthetic):
+    """Captura real con el servicio compartido, o sintética si se pide."""
+    if synthetic:
+        return _SyntheticCapture(synthetic)
+    from tools.capture_service import get_capture_service
+    return get_capture_service()
+
+
+@benchmark('screenshot-ui',
+           "Tiempo de UI bloqueada al capturar pantalla: manejador antiguo frente a ScreenshotService",
+           [('--runs', dict(type=int, default=5, help="Capturas por variante")),
+            ('--synthetic', dict(default=None, metavar='ANCHOxALTO',
+                                 help="Usar un frame sintético en lugar de mss (p. ej. 3840x2160)")),
+            ('--budget-ms', dict(type=float, default=50.0,
+                                 help="Bloqueo máximo permitido del bucle de eventos (ms)"))])
+def bench_screenshot_ui(args):
+    from PyQt6.QtCore import QTimer, QEventLoop
+    from PyQt6.QtWidgets import QWidget
+    from tools import capture_screen
+    from tools.screenshot_service import ScreenshotService
+
+    app = _app()  # noqa: F841 (debe vivir durante el benchmark)
+    capture = _capture(args.synthetic)
+    windows = [QWidget(), QWidget()]
+    for w in windows:
+        w.resize(400, 300)
+        w.show()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Antes: ocultar + sleep(0.3) + captura y PNG síncronos en el hilo de la UI
+        legacy = []
+        for i in range(args.runs):
+            t0 = time.perf_counter()
+            for w in windows:
+                w.hide()
+            time.sleep(0.3)
+            raw, width, height = capture.grab_region(capture.region())
+            capture_screen.save_frame(raw, width, height, os.path.join(tmp, f"legacy_{i}.png"))
+            for w in windows:
+                w.show()
+            legacy.append((time.perf_counter() - t0) * 1000)
+
+        # Después: mayor pausa del bucle de eventos durante toda la captura
+        service = ScreenshotService(capture=capture)
+        stalls, restore, total = [], [], []
+        for i in range(args.runs):
+            loop = QEventLoop()
+            gaps = []
+            last = [time.perf_counter()]
+
+            def tick():
+                now = time.perf_counter()
+                gaps.append((now - last[0]) * 1000)
+                last[0] = now
+
+            heartbeat = QTimer()
+            heartbeat.setInterval(1)
+            heartbeat.timeout.connect(tick)
+            heartbeat.start()
+
+            t0 = time.perf_counter()
+            marks = {}
+            on_restored = lambda: marks.setdefault('restored', time.perf_counter())  # noqa: E731
+            service.restored.connect(on_restored)
+            service.saved.connect(loop.quit)
+            service.error_occurred.connect(loop.quit)
+            service.capture(filename=os.path.join(tmp, f"async_{i}.png"), hide=windows)
+            loop.exec()
+            heartbeat.stop()
+            service.restored.disconnect(on_restored)
+            service.saved.disconnect(loop.quit)
+            service.error_occurred.disconnect(loop.quit)
+
+            total.append((time.perf_counter() - t0) * 1000)
+            restore.append((marks.get('restored', time.perf_counter()) - t0) * 1000)
+            stalls.append(max(gaps) if gaps else total[-1])
+        service.shutdown()
+
+    print(f"Capturas: {args.runs} por variante ({args.synthetic or 'mss'})")
+    print(f"  Antes: UI bloqueada     mediana {statistics.median(legacy):8.1f} ms   máx {max(legacy):8.1f} ms")
+    print(f"  Después: pausa máx. UI  mediana {statistics.median(stalls):8.1f} ms   máx {max(stalls):8.1f} ms")
+    print(f"  Después: ventanas de vuelta en {statistics.median(restore):.1f} ms; "
+          f"archivo escrito en {statistics.median(total):.1f} ms (mediana)")
+    print(f"  Presupuesto de bloqueo: {args.budget_ms} ms")
+    return max(stalls) <= args.budget_ms
+
+
+def _sample_frame(width, height):
+    """Frame BGRA con aspecto de escritorio: fondo plano, ventanas, texto y una foto."""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(1)
+    frame = np.empty((height, width, 4), np.uint8)
+    frame[...] = (48, 40, 36, 255)
+    for i in range(12):
+        x, y = int(rng.integers(0, width * 3 // 4)), int(rng.integers(0, height * 3 // 4))
+        w, h = int(rng.integers(width // 6, width // 3)), int(rng.integers(height // 6, height // 3))
+        shade = int(rng.integers(200, 250))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (shade, shade, shade, 255), -1)
+        cv2.rectangle(frame, (x, y), (x + w, y + 28), (120, 80, 40, 255), -1)
+        for line in range(40, h - 10, 22):
+            cv2.putText(frame, "Lorem ipsum dolor sit amet 0123456789", (x + 8, y + line),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30, 255), 1, cv2.LINE_AA)
+    # Zona fotográfica (degradado con ruido), la más costosa de comprimir
+    ph, pw = height // 4, width // 4
+    gradient = np.linspace(0, 255, pw, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (ph, pw, 3)).astype(np.float32)
+    frame[-ph:, -pw:, :3] = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    return frame
+
+
+@benchmark('encoders',
+           "Tiempo de codificación y tamaño por formato de captura (1080p y 4K)",
+           [('--runs', dict(type=int, default=3, help="Repeticiones por formato")),
+            ('--image', dict(default=None, help="Usar una captura real en lugar del frame de muestra")),
+            ('--budget-ms', dict(type=float, default=600.0,
+                                 help="Tiempo máximo del formato por defecto en 4K (ms)"))])
+def bench_encoders(args):
+    import cv2
+    from tools import image_encoders
+
+    if args.image:
+        image = cv2.imread(args.image, cv2.IMREAD_COLOR)
+        samples = [(f"{image.shape[1]}x{image.shape[0]}", image)]
+    else:
+        samples = [(f"{w}x{h}", cv2.cvtColor(_sample_frame(w, h), cv2.COLOR_BGRA2BGR))
+                   for w, h in ((1920, 1080), (3840, 2160))]
+
+    variants = [{'format': 'png', 'png_level': level} for level in (1, 3, 6, 9)]
+    variants += [{'format': 'png_fast'}]
+    variants += [{'format': fmt, 'quality': q} for fmt in ('jpeg', 'webp') for q in (75, 90)]
+
+    default_ms = None
+    for label, image in samples:
+        print(f"{label}:")
+        for variant in variants:
+            times = []
+            for _ in range(args.runs):
+                t0 = time.perf_counter()
+                data = image_encoders.encode(image, variant)
+                times.append((time.perf_counter() - t0) * 1000)
+            name = ' '.join(f"{k}={v}" for k, v in variant.items() if k != 'format')
+            ms = statistics.median(times)
+            print(f"  {variant['format']:<9} {name:<12} {ms:8.1f} ms   {len(data) / 1024:9.1f} KB")
+            if variant == {'format': 'png', 'png_level': image_encoders.DEFAULT_SETTINGS['png_level']}:
+                default_ms = ms
+    print(f"  Formato por defecto (png, nivel {image_encoders.DEFAULT_SETTINGS['png_level']}) en la "
+          f"muestra mayor: {default_ms:.1f} ms (presupuesto {args.budget_ms} ms)")
+    return default_ms <= args.budget_ms
+
+
+# ===== GRABACIÓN =====
+
+@benchmark('recording-queue',
+           "Memoria de la cola de fotogramas de la grabación con un codificador lento",
+           [('--size', dict(default='3840x2160', metavar='ANCHOxALTO', help="Tamaño del fotograma")),
+            ('--fps', dict(type=float, default=12.0, help="Ritmo de captura")),
+            ('--encoder-fps', dict(type=float, default=8.0,
+                                   help="Fotogramas por segundo que acepta el codificador simulado")),
+            ('--seconds', dict(type=float, default=5.0, help="Duración de la simulación")),
+            ('--budget-mb', dict(type=float, default=256.0, help="Presupuesto de memoria de la cola (MB)"))])
+def bench_recording_queue(args):
+    import threading
+    from tools.frame_pool import FramePool
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    frame_bytes = width * height * 4
+    pool = FramePool.for_budget(frame_bytes, args.budget_mb * 1048576)
+    stop = threading.Event()
+
+    def encoder():
+        # Consume a ritmo fijo, como un ffmpeg que no da abasto
+        while not stop.is_set() or pool.pending():
+            slot = pool.get(timeout=0.05)
+            if slot is None:
+                continue
+            bytes(pool.view(slot)[:4096])
+            time.sleep(1.0 / args.encoder_fps)
+            pool.release(slot)
+
+    thread = threading.Thread(target=encoder, daemon=True)
+    thread.start()
+    grab = bytearray(frame_bytes)
+    samples = []
+    t0 = time.perf_counter()
+    frames = 0
+    while time.perf_counter() - t0 < args.seconds:
+        pool.put(grab)
+        frames += 1
+        samples.append(pool.stats()['depth'])
+        wait = t0 + frames / args.fps - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+    stop.set()
+    thread.join()
+
+    stats = pool.stats()
+    mb = 1048576
+    print(f"Fotograma {args.size}: {frame_bytes / mb:.1f} MB; captura {args.fps} fps, codificador {args.encoder_fps} fps")
+    print(f"  Antes (Queue(maxsize=30)): hasta {30 * frame_bytes / mb:.0f} MB en cola")
+    print(f"  Ahora: {stats['slots']} ranuras ({stats['capacity_bytes'] / mb:.0f} MB), profundidad media "
+          f"{statistics.mean(samples):.1f}, máximo {stats['high_water']} ({stats['high_water_bytes'] / mb:.0f} MB)")
+    print(f"  Capturados {frames}, perdidos {stats['dropped']}")
+    print(f"  Presupuesto: {args.budget_mb:.0f} MB")
+    return stats['high_water_bytes'] <= max(args.budget_mb * mb, FramePool.MIN_SLOTS * frame_bytes)
+
+
+
+@benchmark('recording-timing',
+           "Deriva entre la duración del vídeo y el reloj de la grabación (simulada)",
+           [('--seconds', dict(type=float, default=600.0, help="Duración simulada de la grabación")),
+            ('--drop-rate', dict(type=float, default=0.03, help="Fracción de fotogramas perdidos en la cola")),
+            ('--seed', dict(type=int, default=1, help="Semilla de la simulación"))])
+def bench_recording_timing(args):
+    import random
+    from tools.recording_timeline import CfrSegmentWriter
+
+    class _CountingSink:
+        def __init__(self, fps):
+            self.fps, self.frames = fps, 0
+
+        def write(self, data):
+            self.frames += 1
+
+        def close(self):
+            pass
+
+    rng = random.Random(args.seed)
+    sinks = []
+
+    def open_segment(fps):
+        sinks.append(_CountingSink(fps))
+        return sinks[-1]
+
+    writer = CfrSegmentWriter(open_segment, lambda token: None)
+    # Ritmos que elegiría el regulador y retrasos de captura (con algún atasco)
+    rates = (12.0, 8.0, 20.0, 12.0, 5.0, 30.0)
+    t, frames, lost = 0.0, 0, 0
+    legacy = 0.0    # Antes: cada fotograma recibido ocupaba 1/fps, sin huecos ni repeticiones
+    while t < args.seconds:
+        fps = rates[int(t // 60) % len(rates)]
+        if rng.random() < args.drop_rate:
+            lost += 1
+        else:
+            writer.write(frames, b'', t, fps)
+            legacy += 1.0 / fps
+        frames += 1
+        late = rng.uniform(0, 0.015) + (0.25 if rng.random() < 0.01 else 0.0)
+        t += 1.0 / fps + late
+    writer.finish(t)
+
+    error = abs(writer.duration - t)
+    frame = 1.0 / sinks[-1].fps
+    print(f"Reloj: {t:.3f} s; {frames} capturas, {lost} perdidas en la cola")
+    print(f"  Antes: vídeo {legacy:.3f} s (deriva {legacy - t:+.3f} s)")
+    print(f"  Ahora: vídeo {writer.duration:.3f} s (deriva {writer.duration - t:+.3f} s); "
+          f"{writer.duplicated} repetidos, {writer.dropped} descartados, {len(sinks)} tramos")
+    print(f"  Tolerancia: un fotograma ({frame * 1000:.0f} ms)")
+    return error <= frame
+
+
+
+@benchmark('recording-static',
+           "Capturas sin cambios en una grabación de diapositivas: copias y datos hacia ffmpeg",
+           [('--size', dict(default='1920x1080', metavar='ANCHOxALTO', help="Tamaño del fotograma")),
+            ('--fps', dict(type=float, default=12.0, help="Ritmo de captura")),
+            ('--seconds', dict(type=float, default=300.0, help="Duración simulada de la grabación")),
+            ('--slide-seconds', dict(type=float, default=20.0, help="Segundos por diapositiva")),
+            ('--hold', dict(type=float, default=2.0, help="static_hold de la grabación (s)"))])
+def bench_recording_static(args):
+    import cv2
+    from tools.recording_timeline import CfrSegmentWriter
+    from tools.static_frames import StaticFrameDetector
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    base = _sample_frame(width, height)
+
+    class _CountingSink:
+        frames = 0
+
+        def write(self, data):
+            _CountingSink.frames += 1
+
+        def close(self):
+            pass
+
+    def simulate(detect, hold):
+        _CountingSink.frames = 0
+        writer = CfrSegmentWriter(lambda fps: _CountingSink(), lambda token: None, hold)
+        detector = StaticFrameDetector(width * 4)
+        frame = base.copy()
+        check_ms, copied = [], 0
+        total = int(args.seconds * args.fps)
+        for i in range(total):
+            t = i / args.fps
+            slide = int(t // args.slide_seconds)
+            if i == 0 or int((i - 1) / args.fps // args.slide_seconds) != slide:
+                frame = base.copy()
+                cv2.putText(frame, f"Diapositiva {slide + 1}", (width // 10, height // 2),
+                            cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255, 255), 6)
+            elif t % args.slide_seconds < 1.0:
+                # Animación de entrada: el primer segundo cambia una línea por fotograma
+                y = height // 2 + 40 + (i % 12) * 8
+                cv2.line(frame, (width // 10, y), (width // 2, y), (0, 200, 255, 255), 2)
+            raw = frame.data
+            if detect:
+                t0 = time.perf_counter()
+                changed = detector.changed(raw)
+                check_ms.append((time.perf_counter() - t0) * 1000)
+                if not changed:
+                    continue
+            bytes(raw)      # La copia al pool
+            copied += 1
+            writer.write(i, raw, t, args.fps)
+        writer.finish(total / args.fps)
+        return total, copied, _CountingSink.frames, writer, check_ms
+
+    frame_mb = width * height * 4 / 1048576
+    total, copied, piped, _, _ = simulate(False, 0.0)
+    print(f"{args.size}, {args.fps:g} fps, {args.seconds:.0f} s, una diapositiva cada {args.slide_seconds:g} s")
+    print(f"  Antes: {copied} copias al pool, {piped} fotogramas a ffmpeg ({piped * frame_mb:.0f} MB por la tubería)")
+    for label, hold in (("CFR (static_hold 0)", 0.0), (f"static_hold {args.hold:g} s", args.hold)):
+        total, copied, piped, writer, check_ms = simulate(True, hold)
+        print(f"  {label}: {copied} copias al pool, {piped} fotogramas a ffmpeg "
+              f"({piped * frame_mb:.0f} MB), {writer.holds} huecos mantenidos, vídeo {writer.duration:.2f} s")
+    print(f"  Detección: mediana {statistics.median(check_ms):.3f} ms por captura "
+          f"(copia de un fotograma: {_copy_ms(width * height * 4):.3f} ms)")
+    return abs(writer.duration - total / args.fps) <= 1.0 / args.fps and piped < total / 2
+
+
+def _copy_ms(frame_bytes, runs=20):
+    src, dst = bytearray(frame_bytes), bytearray(frame_bytes)
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        memoryview(dst)[:] = src
+    return (time.perf_counter() - t0) * 1000 / runs
+
+
+
+@benchmark('recording-convert',
+           "Conversión BGRA → yuv420p (y reescalado) antes de la tubería de ffmpeg, 1080p y 4K",
+           [('--frames', dict(type=int, default=120, help="Fotogramas por variante")),
+            ('--fps', dict(type=float, default=30.0, help="Ritmo que debe sostener cada variante"))])
+def bench_recording_convert(args):
+    import resource
+    import shutil
+    import subprocess
+    from tools.capture_screen import _get_ffmpeg
+    from tools.frame_convert import FrameConverter
+
+    ffmpeg = shutil.which(_get_ffmpeg())
+    if not ffmpeg:
+        print("  (ffmpeg no disponible: sólo se mide la conversión y los datos por la tubería)")
+
+    def children_cpu():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    ok = True
+    for width, height in ((1920, 1080), (3840, 2160)):
+        raw = bytearray(_sample_frame(width, height).tobytes())
+        print(f"{width}x{height}:")
+        variants = [("BGRA (ffmpeg convierte)", None), ("yuv420p", 0)]
+        if height > 1080:
+            variants.append(("yuv420p a 1080p", 1080))
+        for label, output_height in variants:
+            converter = None if output_height is None else FrameConverter(width, height, output_height)
+            if converter:
+                size, pix_fmt, frame_bytes = f"{converter.width}x{converter.height}", 'yuv420p', converter.frame_bytes
+            else:
+                size, pix_fmt, frame_bytes = f"{width}x{height}", 'bgra', len(raw)
+            proc = None
+            if ffmpeg:
+                proc = subprocess.Popen([ffmpeg, '-y', '-f', 'rawvideo', '-s', size, '-pix_fmt', pix_fmt,
+                                         '-r', f'{args.fps:g}', '-i', '-', '-c:v', 'libx264',
+                                         '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-crf', '28',
+                                         '-f', 'null', '-'],
+                                        stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            cpu0, child0, t0 = time.process_time(), children_cpu(), time.perf_counter()
+            convert_ms = []
+            for i in range(args.frames):
+                t = time.perf_counter()
+                frame = converter.convert(raw, i % 2) if converter else raw
+                convert_ms.append((time.perf_counter() - t) * 1000)
+                if proc:
+                    proc.stdin.write(frame)
+            if proc:
+                proc.stdin.close()
+                proc.wait()
+            wall = time.perf_counter() - t0
+            cpu = time.process_time() - cpu0 + children_cpu() - child0
+            achieved = args.frames / wall
+            line = (f"  {label:<24} conversión {statistics.median(convert_ms):6.2f} ms  "
+                    f"tubería {frame_bytes / 1048576:5.1f} MB/fotograma")
+            if proc:
+                line += f"  {achieved:6.1f} fps  CPU {cpu / args.frames * 1000:6.1f} ms/fotograma"
+                if converter and achieved < args.fps:
+                    ok = False
+            print(line)
+    return ok
+
+
+
+@benchmark('recording-region',
+           "CPU y datos por fotograma al grabar una región frente a la pantalla completa",
+           [('--size', dict(default='1920x1080', metavar='ANCHOxALTO', help="Tamaño de la pantalla")),
+            ('--frames', dict(type=int, default=120, help="Fotogramas por región"))])
+def bench_recording_region(args):
+    from tools.frame_convert import FrameConverter
+    from tools.frame_pool import FramePool
+    from tools.static_frames import StaticFrameDetector
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    screen = _sample_frame(width, height)
+    regions = [(width, height), (width // 2 // 2 * 2, height // 2 // 2 * 2),
+               (width // 4 // 2 * 2, height // 4 // 2 * 2)]
+
+    results = []
+    for w, h in regions:
+        # Recorte como el de mss (copia de la región) y el resto de la cadena por fotograma
+        pool = FramePool(w * h * 4, slots=4)
+        detector = StaticFrameDetector(w * 4)
+        converter = FrameConverter(w, h)
+        frame = screen.copy()
+        t0 = time.process_time()
+        for i in range(args.frames):
+            frame[i % h, :, 0] = i & 0xFF     # Cambio en cada fotograma: nada se omite
+            raw = frame[:h, :w].tobytes()
+            detector.changed(raw)
+            pool.put(raw)
+            slot = pool.get()
+            converter.convert(pool.view(slot), i % 2)
+            pool.release(slot)
+        cpu_ms = (time.process_time() - t0) * 1000 / args.frames
+        results.append((w, h, cpu_ms, converter.frame_bytes))
+
+    full_cpu, full_bytes = results[0][2], results[0][3]
+    print(f"Pantalla {args.size}: captura, detección de estáticos, pool y conversión a yuv420p")
+    for w, h, cpu_ms, pipe_bytes in results:
+        print(f"  {w}x{h:<5} área {w * h / (width * height) * 100:5.1f} %   CPU {cpu_ms:6.2f} ms/fotograma "
+              f"({cpu_ms / full_cpu * 100:5.1f} %)   tubería {pipe_bytes / 1048576:5.2f} MB "
+              f"({pipe_bytes / full_bytes * 100:5.1f} %)")
+    # La región más pequeña debe costar como mucho el doble de su proporción de área
+    w, h, cpu_ms, _ = results[-1]
+    return cpu_ms / full_cpu <= 2 * w * h / (width * height)
+
+
+@benchmark('recording-zoom',
+           "Coste por fotograma del zoom automático (detección, camino y recorte)",
+           [('--size', dict(default='3840x2160', metavar='ANCHOxALTO', help="Tamaño de la pantalla")),
+            ('--output-height', dict(type=int, default=1080, help="Altura del vídeo")),
+            ('--frames', dict(type=int, default=120, help="Fotogramas simulados")),
+            ('--budget-ms', dict(type=float, default=33.0,
+                                 help="Máximo por fotograma (ms) de detección + recorte"))])
+def bench_recording_zoom(args):
+    from tools.auto_zoom import AutoZoom
+    from tools.frame_convert import FrameConverter, output_size
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    out_w, out_h = output_size(width, height, args.output_height)
+    frame = _sample_frame(width, height)
+    data = frame.reshape(-1).data
+
+    # Referencia: reducir la pantalla entera al tamaño de salida y convertir
+    plain = FrameConverter(width, height, args.output_height)
+    t0 = time.perf_counter()
+    for i in range(args.frames):
+        plain.convert(data, i % 2)
+    plain_ms = (time.perf_counter() - t0) * 1000 / args.frames
+
+    # Escritura junto al cursor en la primera mitad y cursor recorriendo la pantalla después
+    zoom = AutoZoom(width, height, out_w, out_h)
+    converter = FrameConverter(out_w, out_h)
+    fps = 30.0
+    t0 = time.perf_counter()
+    for i in range(args.frames):
+        cursor = (width * 3 // 4, height * 3 // 4)
+        if i < args.frames // 2:
+            x = cursor[0] + (i % 40) * 12
+            frame[cursor[1]:cursor[1] + 16, x:x + 10] = (i * 37) & 0xFF
+        else:
+            cursor = (width * (args.frames - i) // args.frames, height // 3)
+        converter.convert(zoom.process(data, i / fps, cursor), i % 2)
+    zoom_ms = (time.perf_counter() - t0) * 1000 / args.frames
+
+    views = [view for _, _, _, view in zoom.path.samples]
+    zooms = [zoom.path.base[0] / w for _, _, w, _ in views]
+    print(f"Pantalla {args.size} → {out_w}x{out_h}, {args.frames} fotogramas a {fps:g} fps")
+    print(f"  Reducción y conversión (sin zoom)  {plain_ms:7.2f} ms/fotograma")
+    print(f"  Zoom automático + conversión       {zoom_ms:7.2f} ms/fotograma "
+          f"({zoom.seconds * 1000 / args.frames:.2f} ms detección + recorte)")
+    print(f"  Actividad en {zoom.path.activity} fotogramas; zoom entre {min(zooms):.2f} y {max(zooms):.2f}")
+    return zoom.seconds * 1000 / args.frames <= args.budget_ms
+
+
+@benchmark('redaction',
+           "Coste del pixelado de zonas privadas según su área",
+           [('--size', dict(default='3840x2160', metavar='ANCHOxALTO', help="Tamaño del fotograma")),
+            ('--mode', dict(default='pixelate', choices=('pixelate', 'blur'), help="Modo")),
+            ('--block', dict(type=int, default=16, help="Tamaño del bloque (px)")),
+            ('--repeat', dict(type=int, default=20, help="Repeticiones por zona"))])
+def bench_redaction(args):
+    from tools.redaction import redact
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    frame = _sample_frame(width, height)
+    zones = [("campo de texto", [(width // 3, height // 3, 400, 40)]),
+             ("panel lateral", [(0, 0, width // 5, height)]),
+             ("cuarto de pantalla", [(width // 4, height // 4, width // 2, height // 2)]),
+             ("pantalla completa", [(0, 0, width, height)])]
+    print(f"Fotograma {args.size}, modo {args.mode}, bloque {args.block} px")
+    results = []
+    for label, rects in zones:
+        redact(frame, rects, args.mode, args.block)     # Arranque del pool y de OpenCV
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            redact(frame, rects, args.mode, args.block)
+        ms = (time.perf_counter() - t0) * 1000 / args.repeat
+        area = sum(w * h for _, _, w, h in rects) / (width * height)
+        results.append((area, ms))
+        print(f"  {label:<20} área {area * 100:6.2f} %   {ms:7.3f} ms/fotograma")
+    # Coste proporcional al área: una zona pequeña no puede costar como el fotograma
+    small_area, small_ms = results[0]
+    full_ms = results[-1][1]
+    return small_ms <= max(0.5, full_ms * small_area * 20)
+
+
+@benchmark('cursor-overlay',
+           "Coste del cursor y las ondas de clic dibujados en cada fotograma según la resolución",
+           [('--sizes', dict(default='1280x720,1920x1080,3840x2160', metavar='ANCHOxALTO,...',
+                             help="Tamaños de fotograma")),
+            ('--cursor-size', dict(type=int, default=32, help="Alto de la flecha (px)")),
+            ('--repeat', dict(type=int, default=500, help="Fotogramas por tamaño"))])
+def bench_cursor_overlay(args):
+    import numpy as np
+    from tools.compositing import blend_premultiplied
+    from tools.cursor_overlay import CLICK_SECONDS, CursorCompositor
+
+    _app()
+    compositor = CursorCompositor({'size': args.cursor_size, 'ripples': True})
+    print(f"Flecha de {args.cursor_size} px, dos clics animándose; "
+          f"referencia: mezclar una capa del tamaño del fotograma")
+    results = []
+    for size in args.sizes.split(','):
+        width, height = (int(v) for v in size.lower().split('x'))
+        frame = _sample_frame(width, height)
+        placement = (0, 0, 1.0, 0, 0)
+        t0 = time.perf_counter()
+        for i in range(args.repeat):
+            x, y = (i * 7) % width, (i * 3) % height
+            age = (i % 30) / 30 * CLICK_SECONDS
+            compositor.composite(frame, (x, y, ((x, y, age), (width // 2, height // 2, age / 2))),
+                                 placement)
+        sprite_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+        # Una capa a pantalla completa con sólo el cursor pintado: el recuadro se busca en todo el fotograma
+        layer = np.zeros_like(frame)
+        layer[100:132, 100:124] = 200
+        t0 = time.perf_counter()
+        for _ in range(max(1, args.repeat // 50)):
+            blend_premultiplied(frame, layer)
+        layer_ms = (time.perf_counter() - t0) * 1000 / max(1, args.repeat // 50)
+        results.append(sprite_ms)
+        print(f"  {size:<10} sprites {sprite_ms:7.3f} ms/fotograma   capa completa {layer_ms:7.3f} ms")
+    # Coste constante: el tamaño del fotograma no debe multiplicarlo
+    return max(results) <= max(0.5, 3 * min(results))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.benchmark", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='name')
+    for name, (_, description, arguments) in _BENCHMARKS.items():
+        p = sub.add_parser(name, help=description, description=description)
+        for flag, kwargs in arguments:
+            p.add_argument(flag, **kwargs)
+
+    args = parser.parse_args(argv)
+    if not args.name:
+        parser.print_help()
+        return 0
+
+    func = _BENCHMARKS[args.name][0]
+    ok = func(args)
+    print("OK" if ok else "FALLO: presupuesto superado")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Captura de la grabación en un proceso aparte.
+
+En el proceso de la aplicación el bucle de mss y el hilo codificador
+compiten por el GIL con el pintado y la entrada del overlay: dibujar
+mientras se graba hace que ambos tartamudeen. Con `CaptureProcess` el bucle
+de captura (reloj, regulador de fps y detección de estáticos) corre en un
+proceso hijo que copia cada fotograma en un anillo de
+`multiprocessing.shared_memory`:
+
+- Las ranuras libres y las listas viajan como índices por dos colas; sólo
+  el índice, el instante y los fps cruzan entre procesos, nunca los píxeles.
+- `SharedFrameRing` ofrece al hilo codificador la misma interfaz de
+  consumidor que FramePool (get/view/info/release/pending/stats).
+- Los tiempos de escritura medidos en la aplicación llegan al regulador del
+  hijo por valores compartidos; la pausa, por un Event; la región de una
+  grabación que sigue a un marco o ventana (RegionFollower) y la posición
+  del cursor con sus clics recientes, por dos Array. El cursor vuelve con
+  cada fotograma, fijado al instante de la captura, junto con la
+  colocación del escritorio en él (zonas privadas, cursor dibujado).
+
+El hijo se crea con 'spawn' (fork no es seguro con Qt). 'spawn' vuelve a
+importar el módulo principal como __mp_main__; main.py importa la interfaz
+dentro de main(), así que el hijo sólo carga mss y los módulos de
+temporización, no PyQt. Aun así arranca un intérprete nuevo, de ahí el
+margen de START_TIMEOUT.
+"""
+
+import queue
+import time
+
+from tools.cursor_overlay import MAX_CLICKS
+
+START_TIMEOUT = 15.0    # Segundos para que el hijo arranque (un intérprete nuevo)
+STOP_TIMEOUT = 10.0
+
+
+class SharedFrameRing:
+    """Anillo de ranuras en memoria compartida; lado consumidor (la aplicación).
+
+    Sólo descarta la captura nueva con el anillo lleno ('drop_newest'): el hijo no
+    puede retirar una ranura ya lista sin coordinarse con el codificador.
+    """
+
+    policy = 'drop_newest'
+
+    def __init__(self, ctx, frame_bytes, slots):
+        from multiprocessing import shared_memory
+        self.frame_bytes = frame_bytes
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(create=True, size=frame_bytes * slots)
+        self._free = ctx.Queue()
+        self._ready = ctx.Queue()
+        self._pending = ctx.Value('i', 0)
+        self._dropped = ctx.Value('i', 0)
+        self._info = [None] * slots
+        self._high_water = 0
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def producer_args(self):
+        """Lo que necesita `_RingProducer` en el proceso hijo."""
+        return (self._shm.name, self.frame_bytes, self.slots, self._free, self._ready,
+                self._pending, self._dropped)
+
+    def get(self, timeout=None):
+        try:
+            slot, stamp, fps, cursor, placement = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._pending.get_lock():
+            self._high_water = max(self._high_water, self._pending.value)
+            self._pending.value -= 1
+        self._info[slot] = (stamp, fps, cursor, placement)
+        return slot
+
+    def view(self, slot):
+        start = slot * self.frame_bytes
+        return self._shm.buf[start:start + self.frame_bytes]
+
+    def info(self, slot):
+        return self._info[slot]
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def pending(self):
+        return self._pending.value
+
+    def stats(self):
+        depth = self.pending()
+        return {
+            'slots': self.slots,
+            'depth': depth,
+            'bytes': depth * self.frame_bytes,
+            'high_water': self._high_water,
+            'high_water_bytes': self._high_water * self.frame_bytes,
+            'capacity_bytes': self.slots * self.frame_bytes,
+            'dropped': self._dropped.value,
+            'policy': self.policy,
+        }
+
+    def close(self):
+        for q in (self._free, self._ready):
+            q.close()
+            q.cancel_join_thread()
+        try:
+            self._shm.close()
+        except BufferError:
+            # Aún queda alguna vista viva; el bloque se libera al recogerla
+            pass
+        self._shm.unlink()
+
+
+class _RingProducer:
+    """Lado productor del anillo, en el proceso de captura."""
+
+    def __init__(self, name, frame_bytes, slots, free, ready, pending, dropped):
+        self.frame_bytes = frame_bytes
+        self.slots = slots
+        self._shm = _attach(name)
+        self._free = free
+        self._ready = ready
+        self._pending = pending
+        self._dropped = dropped
+
+    def put(self, data, stamp, fps, cursor=None, placement=None):
+        """Como FramePool.put con 'drop_newest': sin ranura libre, la captura se pierde."""
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            with self._dropped.get_lock():
+                self._dropped.value += 1
+            return False
+        start = slot * self.frame_bytes
+        self._shm.buf[start:start + self.frame_bytes] = data
+        with self._pending.get_lock():
+            self._pending.value += 1
+        self._ready.put((slot, stamp, fps, cursor, placement))
+        return True
+
+    def pending(self):
+        return self._pending.value
+
+    def close(self):
+        # Los índices encolados tienen que llegar antes que el resumen final
+        self._ready.close()
+        self._ready.join_thread()
+        self._shm.close()
+
+
+def _attach(name):
+    # El hijo comparte el resource_tracker del padre ('spawn'): registrarse de
+    # nuevo no duplica el bloque, y sólo lo libera quien lo creó
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)     # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _capture_main(ring_args, monitor, limits, stop, paused, encode_seconds, encode_count,
+                  fps_value, region, cursor, skip_static, results):
+    """Proceso de captura: bucle de mss hacia el anillo compartido."""
+    try:
+        import mss
+        from tools.cursor_overlay import at
+        from tools.frame_rate_governor import FrameRateGovernor
+        from tools.recording_timeline import RecordingClock, capture_loop
+        from tools.static_frames import StaticFrameDetector
+
+        producer = _RingProducer(*ring_args)
+        sct = mss.mss()
+        governor = FrameRateGovernor(*limits)
+        detector = StaticFrameDetector(monitor['width'] * 4)
+        grab = lambda: sct.grab(monitor).raw
+        placement = lambda: (monitor['left'], monitor['top'], 1.0, 0, 0)
+        if region is not None:
+            from tools.region_follow import RegionFollower
+            follower = RegionFollower(
+                lambda: dict(zip(("left", "top", "width", "height"), region[:])),
+                monitor['width'], monitor['height'], sct.monitors[0])
+            grab = lambda: follower.grab(sct.grab)
+            placement = lambda: follower.placement
+        clock = RecordingClock()
+        if paused.is_set():
+            clock.pause()
+    except Exception as e:
+        results.put(('error', str(e)))
+        return
+    results.put(('started', clock.start))
+
+    seen = 0
+
+    def running():
+        nonlocal seen
+        if paused.is_set() != clock.paused:
+            if paused.is_set(): clock.pause()
+            else: clock.resume()
+        count = encode_count.value
+        if count != seen:
+            seen = count
+            governor.record_encode(encode_seconds.value)
+        fps_value.value = governor.fps
+        return not stop.is_set()
+
+    last_cursor = None
+
+    def submit(raw, now, fps):
+        nonlocal last_cursor
+        # Las capturas iguales a la anterior no cruzan al anillo, salvo que el cursor
+        # (que se dibuja en el fotograma) se haya movido o tenga clics animándose
+        pixels = detector.changed(raw)
+        sample = None
+        if cursor is not None:
+            with cursor.get_lock():
+                values = cursor[:]
+            if values[0] >= 0:
+                clicks = [tuple(values[i:i + 3]) for i in range(3, 3 + 3 * int(values[0]), 3)]
+                sample = at((int(values[1]), int(values[2]), clicks), time.perf_counter())
+        if pixels or not skip_static or sample != last_cursor:
+            if not pixels:
+                detector.copied_anyway()
+            last_cursor = sample
+            producer.put(raw, now, fps, sample, placement())
+
+    error = None
+    try:
+        capture_loop(clock, governor, grab, submit, producer.pending, producer.slots, running)
+    except Exception as e:
+        error = str(e)
+    finally:
+        duration = clock.now()
+        sct.close()
+        producer.close()
+    results.put(('finished', {
+        'duration': duration,
+        'report': governor.report(duration),
+        'static': detector.static,
+        'error': error,
+    }))
+
+
+class CaptureProcess:
+    """Proceso de captura de una grabación y su anillo de fotogramas."""
+
+    def __init__(self, monitor, slots, min_fps, max_fps, start_fps, paused=False, follow=False,
+                 cursor=False, skip_static=True):
+        """Con `follow` la región se actualiza durante la grabación (set_region); con
+        `cursor`, cada fotograma lleva la última muestra dada a set_cursor."""
+        import multiprocessing      # Con shared_memory arrastra subprocess: sólo al grabar así
+        ctx = multiprocessing.get_context('spawn')
+        self.ring = SharedFrameRing(ctx, monitor['width'] * monitor['height'] * 4, slots)
+        self._stop = ctx.Event()
+        self._paused = ctx.Event()
+        if paused:
+            self._paused.set()
+        self._encode_seconds = ctx.Value('d', 0.0, lock=False)
+        self._encode_count = ctx.Value('i', 0, lock=False)
+        self._fps = ctx.Value('d', float(start_fps), lock=False)
+        self._region = None
+        if follow:
+            self._region = ctx.Array('i', [monitor['left'], monitor['top'],
+                                           monitor['width'], monitor['height']])
+        # [clics, x, y, (x, y, perf_counter) por clic]; -1 clics: aún sin muestra
+        self._cursor = ctx.Array('d', [-1.0] + [0.0] * (2 + 3 * MAX_CLICKS)) if cursor else None
+        self._results = ctx.Queue()
+        self._process = ctx.Process(
+            target=_capture_main, name="ScreenPaintCapture", daemon=True,
+            args=(self.ring.producer_args(), dict(monitor), (min_fps, max_fps, start_fps),
+                  self._stop, self._paused, self._encode_seconds, self._encode_count,
+                  self._fps, self._region, self._cursor, skip_static, self._results))
+        try:
+            self._process.start()
+            kind, value = self._results.get(timeout=START_TIMEOUT)
+        except Exception as e:
+            self._abort()
+            raise RuntimeError(f"El proceso de captura no arrancó: {e}")
+        if kind == 'error':
+            self._abort()
+            raise RuntimeError(f"El proceso de captura falló: {value}")
+        self.clock_start = value     # perf_counter del hijo: el reloj monotónico es del sistema
+
+    @property
+    def fps(self):
+        return self._fps.value
+
+    def alive(self):
+        return self._process.is_alive()
+
+    def record_encode(self, seconds):
+        """Tiempo de escritura de un fotograma, para el regulador del hijo."""
+        self._encode_seconds.value = seconds
+        self._encode_count.value += 1
+
+    def set_region(self, region):
+        """Nueva región (dict mss) de una grabación creada con `follow`."""
+        self._region[:] = [region['left'], region['top'], region['width'], region['height']]
+
+    def set_cursor(self, sample):
+        """Muestra (x, y, clics) de tools.cursor_sampler, para los siguientes fotogramas."""
+        if sample is not None:
+            x, y, clicks = sample
+            clicks = clicks[-MAX_CLICKS:]
+            values = [len(clicks), x, y] + [v for click in clicks for v in click]
+            with self._cursor.get_lock():
+                self._cursor[:len(values)] = values
+
+    def set_paused(self, paused):
+        if paused: self._paused.set()
+        else: self._paused.clear()
+
+    def stop(self):
+        """Detiene la captura; devuelve el resumen del hijo (duración, registro de fps...)."""
+        self._stop.set()
+        deadline = time.perf_counter() + STOP_TIMEOUT
+        summary = None
+        while summary is None:
+            try:
+                kind, summary = self._results.get(timeout=0.2)
+            except queue.Empty:
+                if self._process.is_alive() and time.perf_counter() < deadline:
+                    continue
+                summary = {'duration': time.perf_counter() - self.clock_start, 'report': '',
+                           'static': 0, 'error': "El proceso de captura no respondió"}
+        self._process.join(STOP_TIMEOUT)
+        if self._process.is_alive():
+            self._process.terminate()
+        return summary
+
+    def close(self):
+        self.ring.close()
+        self._results.close()
+
+    def _abort(self):
+        if self._process.is_alive():
+            self._process.terminate()
+        self.close()
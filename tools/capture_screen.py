@@ -1,32 +1,55 @@
-import cv2
-import numpy as np
+# Las dependencias pesadas (cv2, numpy, pyaudio, wave, subprocess, mss) se
+# importan dentro de las funciones: sólo se cargan al primer uso (captura,
+# grabación o audio) y no retrasan el arranque de la aplicación.
 import datetime
 import time
 import os
 import tempfile
 import threading
-import subprocess
-import queue
 from PyQt6.QtCore import QThread, pyqtSignal
+from tools.capture_service import get_capture_service
+from tools.frame_pool import FramePool
+from tools.frame_rate_governor import FrameRateGovernor
+from tools.recording_timeline import RecordingClock, CfrSegmentWriter, capture_loop
+from tools.static_frames import StaticFrameDetector
+from tools.frame_convert import FrameConverter, output_size
+from tools.region_follow import RegionFollower
+from tools.auto_zoom import AutoZoom
+from tools.cursor_overlay import CursorCompositor, at
+from tools import redaction
 
-def take_screenshot(rect=None, filename=None):
-    """Captura rápida de pantalla."""
-    import mss
-    if not filename:
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"screenshot_{ts}.png"
+def default_screenshot_name(extension=".png"):
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"screenshot_{ts}{extension}"
+
+def grab_screen(rect=None):
+    """Captura cruda en BGRA con el servicio compartido. Devuelve (bytes, ancho, alto)."""
+    return get_capture_service().grab(rect)
 
-    with mss.mss() as sct:
-        monitor = sct.monitors[1]
-        if rect:
-            monitor = {"top": rect.y(), "left": rect.x(), "width": rect.width(), "height": rect.height()}
-        img = sct.grab(monitor)
-        frame = np.frombuffer(img.raw, dtype=np.uint8).reshape((img.height, img.width, 4))
-        cv2.imwrite(filename, cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR))
-    return filename
+def save_frame(raw, width, height, filename, encoder=None):
+    """Codifica y escribe un frame BGRA a disco."""
+    import numpy as np
+    frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+    return save_bgra(frame, filename, encoder=encoder)
 
-import pyaudio
-import wave
+def save_bgra(frame, filename, keep_alpha=False, encoder=None):
+    """Escribe un array BGRA (alto, ancho, 4) con el codificador elegido
+    (ver tools.image_encoders); con keep_alpha conserva la transparencia."""
+    from tools import image_encoders
+    if keep_alpha:
+        encoder = image_encoders.for_alpha(encoder)
+    else:
+        import cv2
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return image_encoders.write(frame, filename, encoder)
+
+def take_screenshot(rect=None, filename=None, encoder=None):
+    """Captura rápida de pantalla (síncrona)."""
+    from tools import image_encoders
+    if not filename:
+        filename = default_screenshot_name(image_encoders.extension(encoder))
+    raw, width, height = grab_screen(rect)
+    return save_frame(raw, width, height, filename, encoder)
 
 def _get_ffmpeg():
     try:
@@ -47,20 +70,21 @@ class AudioRecorder(threading.Thread):
         self.start_time = None
 
     def run(self):
+        import pyaudio
+        import wave
         p = pyaudio.PyAudio()
         try:
             stream = p.open(format=pyaudio.paInt16, channels=self.channels, rate=self.rate, input=True, frames_per_buffer=self.chunk)
             frames = []
             self.start_time = time.perf_counter()
             while not self._stop_event.is_set():
-                if self._paused:
-                    time.sleep(0.01)
-                    continue
                 try:
                     data = stream.read(self.chunk, exception_on_overflow=False)
-                    frames.append(data)
                 except:
                     continue
+                # En pausa se sigue leyendo (y descartando): al reanudar no llega audio atrasado
+                if not self._paused:
+                    frames.append(data)
             stream.stop_stream()
             stream.close()
             wf = wave.open(self.filename, 'wb')
@@ -79,10 +103,116 @@ class AudioRecorder(threading.Thread):
         self._stop_event.set()
         self.join(timeout=1)
 
+class _FrameEncoder(threading.Thread):
+    """Hilo codificador de ScreenRecorder: del pool de fotogramas a los tramos de ffmpeg.
+
+    Escribe desde la ranura, sin copias; el CfrSegmentWriter repite o descarta
+    fotogramas para que cada uno caiga en su instante. Antes de convertir se
+    pixelan las zonas privadas y se dibuja el cursor; con zoom se convierte el
+    encuadre, ya del tamaño de salida, y `raw` = (escritor, conversor) guarda
+    además la captura completa.
+    """
+
+    def __init__(self, pool, width, height, writer, converter, record_encode, zoom=None,
+                 compositor=None, origin=(0, 0), raw=None, redaction_source=None,
+                 redaction_settings=None):
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.width, self.height = width, height
+        self.writer = writer
+        self.converter = converter
+        self.record_encode = record_encode
+        self.zoom = zoom if converter else None
+        self.compositor = compositor
+        self.origin = origin
+        self.raw_writer, self.raw_converter = raw or (None, None)
+        self.redaction_source = redaction_source
+        self.redaction_settings = redaction_settings or {}
+        self.redacted = 0
+        self.redaction_seconds = 0.0
+        self._duration = 0
+        self._capture_done = threading.Event()
+
+    def run(self):
+        ok = True
+        while True:
+            slot = self.pool.get(timeout=0.1)
+            if slot is None:
+                if self._capture_done.is_set(): break
+                continue
+            try:
+                self._encode(slot)
+            except Exception as e:
+                print(f"Encoder error: {e}")
+                ok = False
+                break
+        for part_writer in filter(None, (self.writer, self.raw_writer)):
+            try:
+                if ok: part_writer.finish(self._duration)
+                else: part_writer.abort()
+            except Exception as e:
+                print(f"Encoder error: {e}")
+
+    def finish(self, duration):
+        """Con la captura ya detenida: vacía el pool y cierra los vídeos en `duration`."""
+        self._duration = duration
+        self._capture_done.set()
+        self.join()
+
+    def report(self):
+        if not self.redacted:
+            return ""
+        return (f"Zonas privadas: {self.redacted} fotogramas, "
+                f"{self.redaction_seconds * 1000 / self.redacted:.2f} ms/fotograma")
+
+    def _encode(self, slot):
+        pool = self.pool
+        stamp, fps, cursor, placement = pool.info(slot)
+        t_write = time.perf_counter()
+        rects = self.redaction_source() if self.redaction_source else None
+        if rects:
+            # En la ranura, antes de convertir, hacer zoom o escribir: nada sale sin pixelar
+            redaction.redact_raw(pool.view(slot), self.width, self.height, rects, placement,
+                                 self.redaction_settings)
+            self.redacted += 1
+            self.redaction_seconds += time.perf_counter() - t_write
+        if self.compositor and cursor and not self.zoom:
+            # Encima de las zonas privadas, antes de convertir
+            self.compositor.composite_raw(pool.view(slot), self.width, self.height, cursor, placement)
+        if self.converter:
+            token, frame = self._convert(pool.view(slot), stamp, fps, cursor)
+            pool.release(slot)
+        else:
+            token, frame = slot, pool.view(slot)
+        self.writer.write(token, frame, stamp, fps)
+        self.record_encode(time.perf_counter() - t_write)
+
+    def _convert(self, source, stamp, fps, cursor):
+        if self.zoom:
+            if self.raw_writer:
+                raw_token = 1 if self.raw_writer.held_token == 0 else 0
+                self.raw_writer.write(raw_token, self.raw_converter.convert(source, raw_token), stamp, fps)
+            source = self.zoom.process(source, stamp, cursor, self.origin)
+            if self.compositor and cursor:
+                # Sobre el encuadre: el sprite no cuenta como actividad y
+                # mantiene su tamaño con cualquier zoom
+                self.compositor.composite(source, cursor, self.zoom.placement)
+        # El búfer que no retiene el escritor (puede necesitarlo para repetir)
+        token = 1 if self.writer.held_token == 0 else 0
+        return token, self.converter.convert(source, token)
+
 class ScreenRecorder(QThread):
     """
     Motor de grabación avanzado:
-    Usa una cola de frames para desacoplar mss (captura) de ffmpeg (codificación).
+    Un pool de búferes preasignados (tools.frame_pool) desacopla mss (captura)
+    de ffmpeg (codificación). Con capture_process la captura corre en otro
+    proceso y el pool es un anillo en memoria compartida (tools.capture_process).
+    Con auto_zoom el vídeo es un encuadre que sigue al cursor (tools.auto_zoom).
+    Las zonas privadas se pixelan antes de codificar (tools.redaction) y,
+    con show_cursor, se dibujan el cursor y sus clics (tools.cursor_overlay).
+
+    `settings` lleva los ajustes de la preferencia 'recording' (mismas claves
+    que DEFAULT_SETTINGS; las que falten toman su valor por defecto).
     """
     recording_started = pyqtSignal()
     recording_stopped = pyqtSignal()
@@ -90,10 +220,32 @@ class ScreenRecorder(QThread):
     processing_started = pyqtSignal()
     progress_updated = pyqtSignal(int)
 
-    _TARGET_FPS = 12.0 # Ajustado para balancear calidad y rendimiento en equipos variados
+    _TARGET_FPS = 12.0 # Ritmo inicial; FrameRateGovernor lo ajusta entre min_fps y max_fps
+    DEFAULT_SETTINGS = {
+        'drop_policy': FramePool.DROP_NEWEST,
+        'queue_budget_mb': 256,     # La profundidad de la cola sale del tamaño del fotograma
+        'min_fps': 5.0,
+        'max_fps': 30.0,
+        'static_hold': 2.0,         # Segundos estáticos a partir de los que no se codifican copias
+        'preconvert': True,
+        'output_height': 0,
+        'capture_process': False,
+        'auto_zoom': False,         # Sólo en pantalla completa (sin rect ni geometry_source)
+        'zoom': 2.0,
+        'zoom_idle': 1.0,
+        'zoom_smooth': 0.35,
+        'zoom_linger': 1.5,
+        'zoom_keep_raw': False,
+        'show_cursor': True,        # Necesita cursor_source
+        'click_ripples': True,
+        'cursor_size': 24,          # Píxeles lógicos; cursor_scale los pasa a físicos
+    }
 
-    def __init__(self, rect=None, geometry_source=None, output_filename=None, audio_enabled=True):
+    def __init__(self, rect=None, geometry_source=None, output_filename=None, audio_enabled=True,
+                 settings=None, cursor_source=None, cursor_scale=1.0, redaction_source=None,
+                 redaction_settings=None, stats_log=None):
         super().__init__()
+        s = dict(self.DEFAULT_SETTINGS, **(settings or {}))
         self.rect = rect
         self.geometry_source = geometry_source
         self.output_filename = output_filename
@@ -102,91 +254,297 @@ class ScreenRecorder(QThread):
         self.is_paused = False
         self._audio_rec = None
         self._video_start = None
-        self._frame_queue = queue.Queue(maxsize=30)
+        self.drop_policy = s['drop_policy'] if s['drop_policy'] in FramePool.POLICIES else FramePool.DROP_NEWEST
+        self.queue_budget_mb = s['queue_budget_mb']
+        self.min_fps = s['min_fps']
+        self.max_fps = s['max_fps']
+        self.static_hold = s['static_hold']
+        self.preconvert = s['preconvert']        # BGRA → I420 con OpenCV antes de la tubería
+        self.output_height = s['output_height']  # 0: tamaño de la pantalla
+        self.capture_process = s['capture_process']  # Bucle de captura en otro proceso (tools.capture_process)
+        # Ajustes del zoom automático (None: desactivado)
+        self.auto_zoom = None
+        if s['auto_zoom']:
+            self.auto_zoom = {'zoom': s['zoom'], 'idle_zoom': s['zoom_idle'],
+                              'smooth_time': s['zoom_smooth'], 'linger': s['zoom_linger']}
+        self.keep_raw = s['zoom_keep_raw']       # Con zoom, guardar también la captura completa
+        self.cursor_source = cursor_source  # Muestra del cursor (tools.cursor_sampler); desde cualquier hilo
+        # Ajustes del cursor dibujado, tamaño en píxeles físicos (None: sin cursor)
+        self.cursor_overlay = None
+        if s['show_cursor']:
+            self.cursor_overlay = {'size': round(s['cursor_size'] * cursor_scale), 'ripples': s['click_ripples']}
+        self.redaction_source = redaction_source  # Zonas privadas [(x, y, ancho, alto)] físicas, ídem
+        self.redaction_settings = redaction_settings or {}  # 'mode' y 'block' (ver tools.redaction)
+        self.stats_log = stats_log
+        self._pool = None
+        self._governor = None
+        self._clock = None
+        self._capture_proc = None
+        self._writer = None
         self._video_duration = 0
 
     def run(self):
-        import mss
-        with mss.mss() as sct:
-            if self.rect:
-                g = self.rect
-                monitor = {"top": g.y(), "left": g.x(), "width": g.width(), "height": g.height()}
-            elif self.geometry_source:
-                g = self.geometry_source()
-                monitor = {"top": g.y(), "left": g.x(), "width": g.width(), "height": g.height()}
-            else:
-                monitor = sct.monitors[1]
-            w, h = monitor["width"], monitor["height"]
+        capture = get_capture_service()
+        monitor = self._monitor(capture)
+        w, h = monitor["width"], monitor["height"]
+        # Con geometry_source la región se vuelve a leer en cada fotograma sobre un lienzo
+        # fijo del tamaño inicial; debe poder llamarse desde este hilo
+        follow = self.geometry_source is not None and not self.rect
+        zoom = self._prepare_zoom(w, h)
+        compositor = self._prepare_compositor()
+        cursor_source = self.cursor_source if zoom or compositor else None
 
         tmp_dir = tempfile.gettempdir()
         ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         vid_tmp = os.path.join(tmp_dir, f"sp_raw_{ts}.mp4")
         aud_tmp = os.path.join(tmp_dir, f"sp_aud_{ts}.wav")
+        raw_tmp = os.path.join(tmp_dir, f"sp_full_{ts}.mp4")
 
         if self.audio_enabled:
             self._audio_rec = AudioRecorder(aud_tmp)
             self._audio_rec.start()
             while self._audio_rec.start_time is None: time.sleep(0.001)
 
-        ffmpeg_exe = _get_ffmpeg()
-        command = [
-            ffmpeg_exe, '-y', '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', f'{w}x{h}',
-            '-pix_fmt', 'bgra', '-r', str(self._TARGET_FPS), '-i', '-',
-            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-crf', '28', vid_tmp
-        ]
-
-        # DEVNULL en stderr es vital para evitar bloqueos por buffer lleno
-        proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
-        
         self.is_recording = True
+        budget = self.queue_budget_mb * 1024 * 1024
+        proc_capture = None
+        if self.capture_process:
+            proc_capture = self._start_capture_process(monitor, budget, follow, cursor_source is not None,
+                                                       zoom is None)
+        self._capture_proc = proc_capture
         self.recording_started.emit()
-        self._video_start = time.perf_counter()
-        
-        # Hilo de codificación/escritura
-        def encoder():
-            while self.is_recording or not self._frame_queue.empty():
-                try:
-                    frame = self._frame_queue.get(timeout=0.1)
-                    if frame is not None:
-                        proc.stdin.write(frame)
-                    self._frame_queue.task_done()
-                except queue.Empty: continue
-                except Exception as e:
-                    print(f"Encoder error: {e}")
-                    break
-            if proc.stdin: proc.stdin.close()
-            proc.wait()
-
-        encode_thread = threading.Thread(target=encoder, daemon=True)
-        encode_thread.start()
-
-        frame_dur = 1.0 / self._TARGET_FPS
+        pool, record_encode = self._open_pool(proc_capture, w * h * 4, budget)
+
+        converter = self._prepare_converter(zoom, w, h)
+        if converter:
+            out_size, pix_fmt = f'{converter.width}x{converter.height}', 'yuv420p'
+        else:
+            out_size, pix_fmt = f'{w}x{h}', 'bgra'
+        segments, raw_segments = [], []
+        base = os.path.join(tmp_dir, f"sp_raw_{ts}")
+        # Convertidos, los tokens son búferes del conversor: la ranura se libera al convertir
+        writer = CfrSegmentWriter(self._segment_opener(segments, base, out_size, pix_fmt),
+                                  (lambda token: None) if converter else pool.release, self.static_hold)
+        self._writer = writer
+        # Captura completa junto al vídeo con zoom, para volver a montarlo (tools.auto_zoom)
+        raw = None
+        if zoom and converter and self.keep_raw:
+            raw = (CfrSegmentWriter(self._segment_opener(raw_segments, base + '_full', f'{w}x{h}', 'yuv420p'),
+                                    lambda token: None, self.static_hold),
+                   FrameConverter(w, h))
+        encoder = _FrameEncoder(pool, w, h, writer, converter, record_encode, zoom, compositor,
+                                (monitor["left"], monitor["top"]), raw,
+                                self.redaction_source, self.redaction_settings)
+        encoder.start()
+
+        detector = None if proc_capture else StaticFrameDetector(w * 4)
         try:
-            with mss.mss() as sct:
-                while self.is_recording:
-                    if self.is_paused:
-                        time.sleep(0.05)
-                        continue
-                    
-                    t_start = time.perf_counter()
-                    img = sct.grab(monitor)
-                    
-                    try: self._frame_queue.put(img.raw, block=False)
-                    except queue.Full: pass # Drop frame if too slow
-                    
-                    elapsed = time.perf_counter() - t_start
-                    wait = frame_dur - elapsed
-                    if wait > 0: time.sleep(wait)
+            if proc_capture:
+                self._relay_to_process(proc_capture, capture, follow, cursor_source)
+            else:
+                self._capture_in_thread(capture, monitor, pool, detector, follow, zoom, cursor_source)
         except Exception as e:
             self.error_occurred.emit(str(e))
         finally:
             self.is_recording = False
-            encode_thread.join(timeout=3)
-            self._video_duration = time.perf_counter() - self._video_start
+            fps_report, static = self._stop_capture(proc_capture, capture, detector)
+            encoder.finish(self._video_duration)
+            pipe_bytes = converter.frame_bytes if converter else w * h * 4
+            reports = [fps_report, zoom.report() if zoom else "",
+                       compositor.report() if compositor else "", encoder.report()]
+            self._write_stats(pool.stats(), "\n".join(filter(None, reports)), writer, static,
+                              f"{out_size} {pix_fmt}", pipe_bytes)
+            if proc_capture:
+                proc_capture.close()
+                self._capture_proc = None
 
+        self._join_parts([(writer, segments, vid_tmp), (raw and raw[0], raw_segments, raw_tmp)])
         if self._audio_rec: self._audio_rec.stop()
-
         final_out = self.output_filename or os.path.join(tmp_dir, f"final_{ts}.mp4")
+        self._save_output(vid_tmp, aud_tmp, raw_tmp, final_out, zoom)
+        self.recording_stopped.emit()
+
+    def _monitor(self, capture):
+        """Región a grabar (dict de mss), con ancho y alto pares."""
+        if self.rect:
+            monitor = capture.monitor_for(self.rect)
+        elif self.geometry_source:
+            monitor = capture.monitor_for(self.geometry_source())
+        else:
+            monitor = capture.monitor_for()
+        # yuv420p exige ancho y alto pares: se recorta el píxel sobrante
+        return dict(monitor, width=max(2, monitor["width"] // 2 * 2),
+                    height=max(2, monitor["height"] // 2 * 2))
+
+    def _prepare_zoom(self, w, h):
+        # Zoom automático sólo a pantalla completa: el encuadre sale de la captura entera
+        if self.auto_zoom is None or self.rect or self.geometry_source:
+            return None
+        try:
+            return AutoZoom(w, h, *output_size(w, h, self.output_height), self.auto_zoom)
+        except Exception as e:
+            print(f"Error preparing auto zoom, recording the whole screen: {e}")
+            return None
+
+    def _prepare_compositor(self):
+        if self.cursor_overlay is None or not self.cursor_source:
+            return None
+        try:
+            return CursorCompositor(self.cursor_overlay)
+        except Exception as e:
+            print(f"Error preparing cursor overlay, recording without cursor: {e}")
+            return None
+
+    def _prepare_converter(self, zoom, w, h):
+        """Conversor a I420 (reescalado) para la tubería; None: se envía BGRA (sin OpenCV).
+
+        Con zoom se convierte el encuadre, ya del tamaño de salida.
+        """
+        if not (zoom or self.preconvert or self.output_height):
+            return None
+        try:
+            if zoom: return FrameConverter(zoom.width, zoom.height)
+            return FrameConverter(w, h, self.output_height)
+        except Exception as e:
+            print(f"Error preparing frame conversion, piping BGRA: {e}")
+            return None
+
+    def _start_capture_process(self, monitor, budget, follow, cursor, skip_static):
+        """Proceso de captura con su anillo compartido; None si no arranca (se captura en un hilo)."""
+        try:
+            from tools.capture_process import CaptureProcess
+            # El anillo compartido sólo admite 'drop_newest' (el hijo no toca las listas)
+            if self.drop_policy != FramePool.DROP_NEWEST:
+                print(f"Capture process only drops the newest frame, ignoring '{self.drop_policy}'")
+            slots = max(FramePool.MIN_SLOTS, int(budget // (monitor["width"] * monitor["height"] * 4)))
+            return CaptureProcess(monitor, slots, self.min_fps, self.max_fps, self._TARGET_FPS,
+                                  paused=self.is_paused, follow=follow, cursor=cursor,
+                                  skip_static=skip_static)
+        except Exception as e:
+            print(f"Error starting capture process, capturing in a thread: {e}")
+            return None
+
+    def _open_pool(self, proc_capture, frame_bytes, budget):
+        """Pool de fotogramas y la función que da al regulador el tiempo de cada escritura."""
+        if proc_capture:
+            # El hijo captura: aquí sólo se codifica desde su anillo
+            self._pool = proc_capture.ring
+            self._video_start = proc_capture.clock_start
+            return self._pool, proc_capture.record_encode
+        # Reloj de la grabación (sin pausas): instantes de los fotogramas y plazos de captura
+        clock = RecordingClock()
+        self._clock = clock
+        self._video_start = clock.start
+        if self.is_paused: clock.pause()
+        self._pool = FramePool.for_budget(frame_bytes, budget, self.drop_policy)
+        self._governor = FrameRateGovernor(self.min_fps, self.max_fps, self._TARGET_FPS)
+        return self._pool, self._governor.record_encode
+
+    @staticmethod
+    def _segment_opener(segments, base, size, pix_fmt):
+        """Un tramo de ffmpeg por cada ritmo de captura (-r fijo dentro del tramo)."""
+        import subprocess
+        ffmpeg_exe = _get_ffmpeg()
+
+        def open_segment(fps):
+            path = f"{base}_{len(segments):03d}.mp4"
+            command = [
+                ffmpeg_exe, '-y', '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', size,
+                '-pix_fmt', pix_fmt, '-r', f'{fps:g}', '-i', '-',
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-crf', '28', path
+            ]
+            # DEVNULL en stderr es vital para evitar bloqueos por buffer lleno
+            proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            segments.append((path, proc))
+            # ffmpeg cierra el tramo por su cuenta al acabarse su entrada
+            return proc.stdin
+        return open_segment
+
+    def _relay_to_process(self, proc_capture, capture, follow, cursor_source):
+        """Con la captura en el proceso hijo: le pasa región y cursor hasta que termina."""
+        while self.is_recording and proc_capture.alive():
+            if follow:
+                proc_capture.set_region(capture.monitor_for(self.geometry_source()))
+            if cursor_source:
+                proc_capture.set_cursor(cursor_source())
+            time.sleep(0.02 if follow or cursor_source else 0.05)
+
+    def _capture_in_thread(self, capture, monitor, pool, detector, follow, zoom, cursor_source):
+        """Bucle de captura en este hilo hasta que termina la grabación.
+
+        Las capturas iguales a la anterior no se copian al pool: el codificador
+        repite el último fotograma o, pasado static_hold, deja el hueco. Con zoom
+        el encuadre se mueve aunque la pantalla no: se copian todas. Un cursor
+        que se mueve o un clic que se anima también cambian el fotograma.
+        """
+        grab = lambda: capture.grab_monitor(monitor).raw
+        fixed_placement = (monitor["left"], monitor["top"], 1.0, 0, 0)
+        placement = lambda: fixed_placement
+        if follow:
+            follower = RegionFollower(lambda: capture.monitor_for(self.geometry_source()),
+                                      monitor["width"], monitor["height"], capture.monitors()[0])
+            grab = lambda: follower.grab(capture.grab_monitor)
+            placement = lambda: follower.placement
+        last_cursor = None
+
+        def submit(raw, now, fps):
+            nonlocal last_cursor
+            # El cursor se fija al instante de la captura (la edad de sus clics)
+            cursor = at(cursor_source(), time.perf_counter()) if cursor_source else None
+            pixels = zoom or detector.changed(raw)
+            if pixels or cursor != last_cursor:
+                if not pixels:
+                    detector.copied_anyway()
+                last_cursor = cursor
+                # Con el pool lleno decide drop_policy
+                pool.put(raw, (now, fps, cursor, placement()))
+
+        capture_loop(self._clock, self._governor, grab, submit, pool.pending, pool.slots,
+                     lambda: self.is_recording)
+
+    def _stop_capture(self, proc_capture, capture, detector):
+        """Detiene la captura; devuelve su registro de fps y las capturas estáticas no copiadas."""
+        if proc_capture:
+            summary = proc_capture.stop()
+            if summary['error']: self.error_occurred.emit(summary['error'])
+            self._video_duration = summary['duration']
+            return "Captura en un proceso aparte (memoria compartida)\n" + summary['report'], summary['static']
+        capture.release_thread()
+        self._video_duration = self._clock.now()
+        return self._governor.report(self._video_duration), detector.static
+
+    def _join_parts(self, parts):
+        """Espera a los ffmpeg de cada vídeo [(escritor, tramos, salida)] y une sus tramos."""
+        import subprocess
+        for _, segments, _ in parts:
+            for _, p in segments:
+                try: p.wait(timeout=60)
+                except subprocess.TimeoutExpired: p.kill()
+        try:
+            # Cada tramo con su duración: la de los mantenidos incluye el hueco
+            for part_writer, segments, out in parts:
+                if part_writer is None: continue
+                durations = [seconds for _, _, seconds in part_writer.segments]
+                self._join_segments([(path, seconds) for (path, _), seconds in zip(segments, durations)], out)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            for _, segments, _ in parts:
+                for path, _ in segments:
+                    if os.path.exists(path):
+                        try: os.remove(path)
+                        except: pass
+
+    def _save_output(self, vid_tmp, aud_tmp, raw_tmp, final_out, zoom):
+        """Vídeo final con el audio (si lo hay); con zoom, su camino y la captura completa al lado."""
+        if zoom:
+            # Camino del zoom (y captura completa) junto al vídeo: python -m tools.auto_zoom
+            base = os.path.splitext(final_out)[0]
+            try:
+                zoom.path.export(base + ".zoom.json", (zoom.width, zoom.height))
+                if os.path.exists(raw_tmp): os.replace(raw_tmp, base + ".raw.mp4")
+            except Exception as e:
+                print(f"Error saving zoom path: {e}")
         try:
             self.processing_started.emit()
             if self.audio_enabled and os.path.exists(aud_tmp):
@@ -197,14 +555,62 @@ class ScreenRecorder(QThread):
         except Exception as e:
             self.error_occurred.emit(str(e))
         finally:
-            for f in [vid_tmp, aud_tmp]:
+            for f in [vid_tmp, aud_tmp, raw_tmp]:
                 if os.path.exists(f): 
                     try: os.remove(f)
                     except: pass
-        self.recording_stopped.emit()
+
+    def _join_segments(self, entries, out):
+        """Une los tramos [(ruta, segundos)] sin recodificar.
+
+        La duración declarada desplaza el inicio del tramo siguiente: si supera
+        la de sus fotogramas, el último se mantiene en pantalla durante el hueco.
+        """
+        import subprocess
+        entries = [(p, d) for p, d in entries if os.path.exists(p) and os.path.getsize(p) > 0]
+        if not entries:
+            return
+        if len(entries) == 1:
+            os.replace(entries[0][0], out)
+            return
+        list_file = out + ".txt"
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for path, seconds in entries:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\nduration {seconds:.6f}\n")
+        try:
+            cmd = [_get_ffmpeg(), '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-c', 'copy', out]
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        finally:
+            os.remove(list_file)
+
+    def _write_stats(self, stats, fps_report, writer, static, pipe_format, pipe_bytes):
+        """Registro de la grabación: cambios de fps, cola, fidelidad de tiempos y estáticos."""
+        frame_mb = pipe_bytes / 1048576
+        report = "\n".join([
+            fps_report,
+            f"Cola: {stats['slots']} ranuras, máximo {stats['high_water']} "
+            f"({stats['high_water_bytes'] / 1048576:.0f} MB), {stats['dropped']} fotogramas "
+            f"perdidos ({stats['policy']})",
+            f"Duración: reloj {self._video_duration:.3f} s, vídeo {writer.duration:.3f} s; "
+            f"{writer.duplicated} fotogramas repetidos, {writer.dropped} descartados",
+            f"Estáticos: {static} capturas sin cambios no copiadas; {writer.holds} huecos "
+            f"mantenidos ({writer.held_seconds:.1f} s sin codificar); a ffmpeg {writer.written} "
+            f"fotogramas ({writer.written * frame_mb:.0f} MB, {pipe_format})",
+        ])
+        print(f"Recording stats:\n{report}")
+        if self.stats_log:
+            try:
+                os.makedirs(os.path.dirname(self.stats_log) or ".", exist_ok=True)
+                with open(self.stats_log, 'w', encoding='utf-8') as f:
+                    f.write(report + "\n")
+            except Exception as e:
+                print(f"Error writing recording stats: {e}")
 
     def _merge_final(self, vid, aud, out, offset):
+        import subprocess
         ffmpeg_exe = _get_ffmpeg()
+        # Duración del reloj de la grabación (sin pausas): la misma que cubre el vídeo
         dur = self._video_duration
         cmd = [
             ffmpeg_exe, '-y', '-ss', f'{offset:.4f}', '-i', aud, '-i', vid,
@@ -221,8 +627,26 @@ class ScreenRecorder(QThread):
         proc.wait()
         self.progress_updated.emit(100)
 
+    def queue_stats(self):
+        """Estado de la cola de fotogramas (ver FramePool.stats); None si no se está grabando."""
+        pool = self._pool
+        return pool.stats() if pool else None
+
+    def current_fps(self):
+        proc_capture = self._capture_proc
+        if proc_capture:
+            return proc_capture.fps
+        governor = self._governor
+        return governor.fps if governor else None
+
     def stop(self): 
         self.is_recording = False
     def pause(self):
         self.is_paused = not self.is_paused
+        clock = self._clock
+        if clock:
+            if self.is_paused: clock.pause()
+            else: clock.resume()
+        proc_capture = self._capture_proc
+        if proc_capture: proc_capture.set_paused(self.is_paused)
         if self._audio_rec: self._audio_rec.pause()
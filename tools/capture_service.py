@@ -0,0 +1,184 @@
+"""
+Servicio de captura de pantalla compartido por todo el proceso.
+
+Una conexión `mss` por hilo (las conexiones con el servidor gráfico no se
+pueden compartir entre hilos), creada al primer uso y reutilizada después:
+capturas, instantáneas y grabación ya no abren y cierran una conexión por
+llamada. La geometría de los monitores se guarda en caché y se invalida con
+las señales de pantallas de Qt (conexión, desconexión, cambio de geometría).
+
+`physical_point` y `physical_rect` pasan coordenadas lógicas de Qt a píxeles
+físicos del escritorio (las de mss), pantalla por pantalla.
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, QPoint, QRect, pyqtSignal
+
+
+class CaptureService(QObject):
+    """Capturador con afinidad de hilo y caché de monitores."""
+
+    monitors_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._monitors = None
+        self._generation = 0
+        self._watched_screens = set()
+
+    # ===== CONEXIÓN POR HILO =====
+
+    def _sct(self):
+        """Instancia mss del hilo actual; se recrea si cambiaron las pantallas."""
+        local = self._local
+        sct = getattr(local, 'sct', None)
+        if sct is not None and local.generation != self._generation:
+            sct.close()
+            sct = None
+        if sct is None:
+            import mss
+            sct = mss.mss()
+            local.sct = sct
+            local.generation = self._generation
+        return sct
+
+    def release_thread(self):
+        """Cierra la conexión del hilo actual (al terminar hilos de grabación)."""
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+    # ===== MONITORES =====
+
+    def monitors(self):
+        """Copia de la lista de monitores de mss ([0] = escritorio completo)."""
+        with self._lock:
+            if self._monitors is None:
+                self._monitors = [dict(m) for m in self._sct().monitors]
+            return [dict(m) for m in self._monitors]
+
+    def monitor_for(self, rect=None):
+        """Región de captura para un QRect, o el monitor principal si no hay rect."""
+        if rect is not None:
+            return {"top": rect.y(), "left": rect.x(), "width": rect.width(), "height": rect.height()}
+        return self.monitors()[1]
+
+    def monitor_at(self, x, y):
+        """Índice mss del monitor que contiene el punto (1 si ninguno)."""
+        for index, m in enumerate(self.monitors()[1:], 1):
+            if m["left"] <= x < m["left"] + m["width"] and m["top"] <= y < m["top"] + m["height"]:
+                return index
+        return 1
+
+    def region(self, rect=None, monitor=None):
+        """Región a capturar: un rect, o un monitor.
+
+        `monitor`: 'primary' (o None), 'cursor', 'all' (escritorio virtual
+        completo, `monitors[0]`: una sola captura para todas las pantallas) o
+        el índice mss del monitor (1..N).
+        """
+        if rect is not None:
+            return self.monitor_for(rect)
+        monitors = self.monitors()
+        if monitor == 'all':
+            return monitors[0]
+        if monitor == 'cursor':
+            from PyQt6.QtGui import QCursor, QGuiApplication
+            pos = QCursor.pos()
+            screen = QGuiApplication.screenAt(pos)
+            dpr = screen.devicePixelRatio() if screen else 1.0
+            monitor = self.monitor_at(pos.x() * dpr, pos.y() * dpr)
+        if isinstance(monitor, int) and 0 < monitor < len(monitors):
+            return monitors[monitor]
+        return monitors[1]
+
+    def invalidate(self):
+        """Olvida la geometría en caché; cada hilo reabre su conexión al usarla."""
+        with self._lock:
+            self._monitors = None
+            self._generation += 1
+        self.monitors_changed.emit()
+
+    def watch_screens(self, app):
+        """Invalida la caché cuando cambian las pantallas de la aplicación."""
+        app.screenAdded.connect(self._on_screen_added)
+        app.screenRemoved.connect(self._on_screens_changed)
+        app.primaryScreenChanged.connect(self._on_screens_changed)
+        for screen in app.screens():
+            self._watch(screen)
+
+    def _on_screen_added(self, screen):
+        self._watch(screen)
+        self.invalidate()
+
+    def _on_screens_changed(self, *args):
+        self.invalidate()
+
+    def _watch(self, screen):
+        if id(screen) in self._watched_screens:
+            return
+        self._watched_screens.add(id(screen))
+        screen.geometryChanged.connect(self._on_screens_changed)
+
+    # ===== CAPTURA =====
+
+    def grab(self, rect=None):
+        """Captura cruda en BGRA desde el hilo actual. Devuelve (bytes, ancho, alto)."""
+        return self.grab_region(self.monitor_for(rect))
+
+    def grab_region(self, region):
+        """Como grab(), para una región ya resuelta con region()."""
+        img = self._sct().grab(region)
+        return img.raw, img.width, img.height
+
+    def grab_monitor(self, monitor):
+        """Captura una región mss ya calculada (bucle de grabación)."""
+        return self._sct().grab(monitor)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def physical_point(x, y, screen=None):
+    """Punto lógico global de Qt → (x, y) en píxeles físicos del escritorio.
+
+    Qt escala cada pantalla alrededor de su origen nativo, que conserva como
+    `geometry().topLeft()`: sólo el desplazamiento dentro de la pantalla se
+    multiplica por su devicePixelRatio. `screen`: la pantalla a usar (por
+    defecto, la que contiene el punto, o la principal).
+    """
+    from PyQt6.QtGui import QGuiApplication
+    screen = screen or QGuiApplication.screenAt(QPoint(int(x), int(y))) or QGuiApplication.primaryScreen()
+    if screen is None:
+        return round(x), round(y)
+    origin, dpr = screen.geometry().topLeft(), screen.devicePixelRatio()
+    return (round(origin.x() + (x - origin.x()) * dpr),
+            round(origin.y() + (y - origin.y()) * dpr))
+
+
+def physical_rect(rect, screen=None):
+    """QRect lógico global → QRect en píxeles físicos, con la pantalla de su centro."""
+    from PyQt6.QtGui import QGuiApplication
+    screen = screen or QGuiApplication.screenAt(rect.center()) or QGuiApplication.primaryScreen()
+    dpr = screen.devicePixelRatio() if screen else 1.0
+    x, y = physical_point(rect.x(), rect.y(), screen)
+    return QRect(x, y, round(rect.width() * dpr), round(rect.height() * dpr))
+
+
+def get_capture_service():
+    """Servicio compartido. La primera llamada debe hacerse desde el hilo de la UI,
+    para que las señales de pantallas se entreguen en él."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            from PyQt6.QtGui import QGuiApplication
+            _service = CaptureService()
+            app = QGuiApplication.instance()
+            if app is not None:
+                _service.watch_screens(app)
+        return _service
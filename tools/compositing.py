@@ -0,0 +1,71 @@
+"""
+Composición en memoria de las anotaciones sobre una captura de pantalla.
+
+Las anotaciones llegan como QImage ARGB32 premultiplicada (en memoria: B, G,
+R, A por píxel, igual que el BGRA de mss), así que la mezcla es directa:
+    destino = anotación + destino * (255 - alfa) / 255
+Se hace con NumPy sólo sobre el recuadro que contiene píxeles no transparentes.
+Estas funciones corren en hilos de trabajo (QImage es segura fuera de la UI).
+"""
+
+from PyQt6.QtGui import QImage
+
+from tools import capture_screen
+
+
+def qimage_view(image):
+    """Vista NumPy (alto, ancho, 4) sin copia de una QImage de 32 bits."""
+    import numpy as np
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4)
+
+
+def blend_premultiplied(frame, layer):
+    """Mezcla `layer` (BGRA premultiplicado) sobre `frame` (BGRA), en sitio."""
+    import numpy as np
+    alpha = layer[..., 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return frame
+    cols = np.flatnonzero(alpha[rows[0]:rows[-1] + 1].any(axis=0))
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+    src = layer[y0:y1, x0:x1]
+    dst = frame[y0:y1, x0:x1, :3]
+    inv = 255 - src[..., 3:4].astype(np.uint16)
+    mixed = src[..., :3] + (dst * inv + 127) // 255
+    dst[...] = np.minimum(mixed, 255)
+    return frame
+
+
+def compose_in_place(frame, layer, offset=(0, 0)):
+    """Mezcla la QImage `layer` sobre el array BGRA `frame` en la posición `offset`."""
+    import cv2
+    height, width = frame.shape[:2]
+    overlay = qimage_view(layer)
+    x, y = offset
+    if (x, y) == (0, 0) and overlay.shape[:2] != (height, width) and \
+            abs(overlay.shape[1] - width) <= 2 and abs(overlay.shape[0] - height) <= 2:
+        # Redondeo lógico/físico (HiDPI): ajustar la capa a la captura
+        overlay = cv2.resize(overlay, (width, height), interpolation=cv2.INTER_LINEAR)
+    h = min(overlay.shape[0], height - y)
+    w = min(overlay.shape[1], width - x)
+    if h > 0 and w > 0:
+        blend_premultiplied(frame[y:y + h, x:x + w], overlay[:h, :w])
+    return frame
+
+
+def compose_and_save(raw, width, height, layer, filename, encoder=None, offset=(0, 0)):
+    """Captura BGRA + anotaciones (colocadas en `offset` dentro de la captura) → archivo."""
+    import numpy as np
+    frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4)).copy()
+    compose_in_place(frame, layer, offset)
+    return capture_screen.save_bgra(frame, filename, encoder=encoder)
+
+
+def save_layer(layer, filename, encoder=None):
+    """Sólo anotaciones: imagen con transparencia (alfa sin premultiplicar)."""
+    straight = layer.convertToFormat(QImage.Format.Format_ARGB32)
+    return capture_screen.save_bgra(qimage_view(straight), filename, keep_alpha=True, encoder=encoder)
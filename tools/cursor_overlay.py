@@ -0,0 +1,169 @@
+"""
+Cursor y ondas de clic dibujados en los fotogramas de una grabación.
+
+mss no captura el puntero: sin esto un tutorial grabado no muestra dónde se
+señala ni dónde se pulsa. La posición se muestrea junto al instante de cada
+captura (tools.cursor_sampler) y viaja con el fotograma hasta el hilo
+codificador, que la dibuja en la ranura antes de convertir.
+
+Los sprites (flecha y las fases de la onda) se dibujan una vez con QPainter
+y se guardan ya preparados para la mezcla:
+    destino = color premultiplicado + destino * (255 - alfa) / 255
+con color y 255 - alfa en uint16, recortados a los píxeles visibles. Cada
+fotograma sólo mezcla el recuadro de cada sprite: el coste es constante,
+sea cual sea la resolución de la grabación.
+
+Una muestra del cursor fijada a un instante (`at`) es (x, y, clics) con
+clics = ((x, y, edad en segundos), ...), en píxeles físicos del escritorio.
+"""
+
+CLICK_SECONDS = 0.6     # Duración de la onda de un clic
+MAX_CLICKS = 4          # Clics recientes que acompañan a cada muestra
+RIPPLE_PHASES = 12      # Fases precalculadas de la onda
+RIPPLE_COLOR = (255, 193, 7)    # RGB; ámbar, visible sobre fondos claros y oscuros
+DEFAULTS = {
+    'size': 24,         # Alto de la flecha en píxeles físicos
+    'ripples': True,    # Ondas en los clics
+}
+
+
+def at(sample, now):
+    """`sample` (x, y, ((x, y, perf_counter), ...)) en el instante `now`: clics con su edad."""
+    if sample is None:
+        return None
+    x, y, clicks = sample
+    return (x, y, tuple((cx, cy, now - t) for cx, cy, t in clicks if 0 <= now - t < CLICK_SECONDS))
+
+
+class Sprite:
+    """Imagen BGRA premultiplicada lista para mezclar, con su punto de anclaje."""
+
+    def __init__(self, bgra, hot_x, hot_y):
+        import numpy as np
+        alpha = bgra[..., 3]
+        rows = np.flatnonzero(alpha.any(axis=1))
+        cols = np.flatnonzero(alpha.any(axis=0))
+        if rows.size == 0:
+            rows = cols = np.array([0])
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        visible = bgra[y0:y1, x0:x1]
+        self.color = visible[..., :3].astype(np.uint16)
+        self.inv = 255 - visible[..., 3:4].astype(np.uint16)
+        self.hot_x, self.hot_y = hot_x - x0, hot_y - y0
+        self.height, self.width = self.color.shape[:2]
+
+    def blend(self, frame, x, y):
+        """Mezcla el sprite con su anclaje en (x, y) de `frame` (alto×ancho×4), en sitio."""
+        x, y = x - self.hot_x, y - self.hot_y
+        height, width = frame.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(width, x + self.width), min(height, y + self.height)
+        if x1 <= x0 or y1 <= y0:
+            return False
+        sx, sy = x0 - x, y0 - y
+        rows, cols = slice(sy, sy + y1 - y0), slice(sx, sx + x1 - x0)
+        dst = frame[y0:y1, x0:x1, :3]
+        # Premultiplicado: el resultado nunca pasa de 255
+        dst[...] = self.color[rows, cols] + (dst * self.inv[rows, cols] + 127) // 255
+        return True
+
+
+def _render(width, height, paint):
+    """Sprite BGRA premultiplicado (NumPy) pintado por `paint(painter)` sobre transparente."""
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QImage, QPainter
+    from tools.compositing import qimage_view
+    image = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    paint(painter)
+    painter.end()
+    return qimage_view(image).copy()
+
+
+def arrow_sprite(size):
+    """Flecha clásica (blanca con borde negro) de `size` píxeles de alto, anclada en la punta."""
+    from PyQt6.QtCore import QPointF, Qt
+    from PyQt6.QtGui import QColor, QPen, QPolygonF
+    unit = size / 20.0
+    pen_width = max(1.0, unit * 1.2)
+    margin = int(pen_width) + 1
+    shape = [(0, 0), (0, 17), (4, 13), (7, 20), (10, 19), (7, 12), (12, 12)]
+
+    def paint(painter):
+        painter.setPen(QPen(QColor(0, 0, 0), pen_width, Qt.PenStyle.SolidLine,
+                            Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin))
+        painter.setBrush(QColor(255, 255, 255))
+        painter.drawPolygon(QPolygonF([QPointF(margin + x * unit, margin + y * unit) for x, y in shape]))
+
+    return Sprite(_render(int(12 * unit) + 2 * margin + 1, int(20 * unit) + 2 * margin + 1, paint),
+                  margin, margin)
+
+
+def ripple_sprites(size, phases=RIPPLE_PHASES):
+    """Fases de la onda de un clic: un anillo que crece y se desvanece, centrado en el clic."""
+    from PyQt6.QtCore import QPointF
+    from PyQt6.QtGui import QColor, QPen
+    r0, r1 = size * 0.25, size * 1.1
+    pen_width = max(2.0, size / 8.0)
+    half = int(r1 + pen_width) + 1
+    sprites = []
+    for phase in range(phases):
+        p = (phase + 0.5) / phases
+        radius = r0 + (r1 - r0) * (1 - (1 - p) ** 2)    # Frena al final
+        alpha = 1.0 - p
+
+        def paint(painter, radius=radius, alpha=alpha):
+            ring, fill = QColor(*RIPPLE_COLOR), QColor(*RIPPLE_COLOR)
+            ring.setAlphaF(0.9 * alpha)
+            fill.setAlphaF(0.25 * alpha)
+            painter.setPen(QPen(ring, pen_width))
+            painter.setBrush(fill)
+            painter.drawEllipse(QPointF(half, half), radius, radius)
+
+        sprites.append(Sprite(_render(2 * half + 1, 2 * half + 1, paint), half, half))
+    return sprites
+
+
+class CursorCompositor:
+    """Dibuja cursor y ondas de clic en fotogramas BGRA de una grabación."""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULTS, **(settings or {}))
+        size = max(8, int(self.settings['size']))
+        self.arrow = arrow_sprite(size)
+        self.ripples = ripple_sprites(size) if self.settings['ripples'] else []
+        self.frames = 0
+        self.seconds = 0.0
+
+    def composite(self, frame, cursor, placement):
+        """Dibuja `cursor` (muestra fijada, en el escritorio) sobre `frame` según `placement`.
+
+        `placement` = (izquierda, arriba, escala, desplazamiento x, desplazamiento y),
+        como en tools.redaction.to_frame. Devuelve si algo cayó dentro del fotograma.
+        """
+        import time
+        start = time.perf_counter()
+        left, top, scale, off_x, off_y = placement
+        to_frame = lambda x, y: (round((x - left) * scale + off_x), round((y - top) * scale + off_y))
+        drawn = False
+        x, y, clicks = cursor
+        for cx, cy, age in clicks if self.ripples else ():
+            phase = min(len(self.ripples) - 1, int(age / CLICK_SECONDS * len(self.ripples)))
+            drawn |= self.ripples[phase].blend(frame, *to_frame(cx, cy))
+        drawn |= self.arrow.blend(frame, *to_frame(x, y))
+        if drawn:
+            self.frames += 1
+            self.seconds += time.perf_counter() - start
+        return drawn
+
+    def composite_raw(self, raw, width, height, cursor, placement):
+        """Como composite() sobre bytes BGRA escribibles de una captura."""
+        import numpy as np
+        frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+        return self.composite(frame, cursor, placement)
+
+    def report(self):
+        mean_ms = self.seconds / self.frames * 1000 if self.frames else 0.0
+        return f"Cursor: {self.frames} fotogramas, {mean_ms:.2f} ms/fotograma"
@@ -0,0 +1,133 @@
+"""
+Posición del cursor y clics para la grabación.
+
+Qt sólo debe consultarse desde el hilo de la interfaz: `CursorSampler` lee
+`QCursor.pos()` con un QTimer y guarda la última muestra, en píxeles
+físicos del escritorio (las coordenadas de mss, convertidas pantalla por
+pantalla con `capture_service.physical_point`), en una tupla que el bucle
+de captura lee sin cerrojos (asignarla es atómico).
+
+Los clics se detectan como pulsaciones nuevas entre dos lecturas del estado
+de los botones. Qt sólo lo conoce para sus propias ventanas; el estado
+global se pide al sistema con ctypes (GetAsyncKeyState en Windows,
+XQueryPointer en X11). En el resto (Wayland, macOS) se usa el de Qt.
+
+Una muestra es (x, y, clics) con clics = ((x, y, perf_counter), ...);
+tools.cursor_overlay.at la fija al instante de una captura.
+"""
+
+import sys
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, QTimer
+
+from tools.capture_service import physical_point
+from tools.cursor_overlay import MAX_CLICKS
+
+
+class _GlobalButtons:
+    """Botones del ratón pulsados en todo el escritorio (bit 0 izquierdo, bit 1 derecho)."""
+
+    def __init__(self):
+        self._read = self._qt
+        try:
+            if sys.platform == 'win32':
+                import ctypes
+                self._user32 = ctypes.windll.user32
+                self._read = self._win32
+            elif sys.platform.startswith('linux'):
+                from PyQt6.QtGui import QGuiApplication
+                if QGuiApplication.platformName() == 'xcb':
+                    self._open_x11()
+                    self._read = self._x11
+        except Exception as e:
+            print(f"Global mouse buttons unavailable, using Qt's: {e}")
+
+    def __call__(self):
+        try:
+            return self._read()
+        except Exception:
+            self._read = self._qt
+            return self._qt()
+
+    @staticmethod
+    def _qt():
+        from PyQt6.QtCore import Qt
+        from PyQt6.QtGui import QGuiApplication
+        buttons = QGuiApplication.mouseButtons()
+        return (1 if buttons & Qt.MouseButton.LeftButton else 0) | \
+               (2 if buttons & Qt.MouseButton.RightButton else 0)
+
+    def _win32(self):
+        # VK_LBUTTON = 1, VK_RBUTTON = 2; el bit alto indica «pulsado ahora»
+        return (1 if self._user32.GetAsyncKeyState(1) & 0x8000 else 0) | \
+               (2 if self._user32.GetAsyncKeyState(2) & 0x8000 else 0)
+
+    def _open_x11(self):
+        import ctypes
+        import ctypes.util
+        x11 = ctypes.cdll.LoadLibrary(ctypes.util.find_library('X11') or 'libX11.so.6')
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        ulong_p, int_p = ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int)
+        x11.XQueryPointer.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ulong_p, ulong_p,
+                                      int_p, int_p, int_p, int_p, ctypes.POINTER(ctypes.c_uint)]
+        display = x11.XOpenDisplay(None)
+        if not display:
+            raise OSError("XOpenDisplay falló")
+        self._x11_lib, self._display = x11, display
+        self._root = x11.XDefaultRootWindow(display)
+        self._x11_out = [ctypes.c_ulong(), ctypes.c_ulong()] + [ctypes.c_int() for _ in range(4)]
+        self._x11_mask = ctypes.c_uint()
+
+    def _x11(self):
+        import ctypes
+        out = [ctypes.byref(v) for v in self._x11_out]
+        self._x11_lib.XQueryPointer(self._display, self._root, *out, ctypes.byref(self._x11_mask))
+        mask = self._x11_mask.value
+        # Button1Mask = 1 << 8, Button3Mask = 1 << 10
+        return (1 if mask & (1 << 8) else 0) | (2 if mask & (1 << 10) else 0)
+
+
+class CursorSampler(QObject):
+    """Muestrea cursor y clics en el hilo de la interfaz; `sample()` desde cualquier hilo."""
+
+    INTERVAL_MS = 8     # ~120 Hz: más que el ritmo máximo de captura
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sample = None
+        self._buttons = None
+        self._pressed = 0
+        self._clicks = deque(maxlen=MAX_CLICKS)
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self._poll)
+
+    def start(self):
+        if self._buttons is None:
+            self._buttons = _GlobalButtons()
+        self._pressed = self._buttons()     # Lo que ya estaba pulsado no es un clic
+        self._clicks.clear()
+        self._poll()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def sample(self):
+        """Última muestra (x, y, clics) en píxeles físicos, o None si aún no hay."""
+        return self._sample
+
+    def _poll(self):
+        from PyQt6.QtGui import QCursor
+        pos = QCursor.pos()
+        x, y = physical_point(pos.x(), pos.y())
+        pressed = self._buttons()
+        if pressed & ~self._pressed:
+            self._clicks.append((x, y, time.perf_counter()))
+        self._pressed = pressed
+        self._sample = (x, y, tuple(self._clicks))
@@ -0,0 +1,53 @@
+"""
+Conversión de los fotogramas de la grabación antes de la tubería de ffmpeg.
+
+ffmpeg acaba codificando en yuv420p: si recibe BGRA, la tubería transporta
+4 bytes por píxel para que ffmpeg los reduzca a 1,5. `FrameConverter` hace
+esa conversión (BGRA → I420) con OpenCV en el hilo codificador y, si se pide
+una altura de salida, reescala antes (INTER_AREA), p. ej. grabar una
+pantalla 4K a 1080p. OpenCV reparte ambas operaciones entre varios núcleos
+sin retener el GIL.
+
+Los búferes de salida son fijos: se escribe alternando entre dos, uno de
+ellos puede estar retenido por CfrSegmentWriter para repetirlo.
+"""
+
+
+def output_size(width, height, output_height=0):
+    """Tamaño de salida: `output_height` (sin ampliar) con el mismo aspecto, en pares.
+
+    I420 submuestrea el color 2×2: ancho y alto deben ser pares.
+    """
+    if output_height and output_height < height:
+        width = width * output_height / height
+        height = output_height
+    return max(2, int(width) // 2 * 2), max(2, int(height) // 2 * 2)
+
+
+class FrameConverter:
+    """BGRA (ancho×alto×4) → I420 (yuv420p) del tamaño de salida."""
+
+    BUFFERS = 2
+
+    def __init__(self, width, height, output_height=0):
+        import numpy as np
+        self.source_size = (width, height)
+        self.width, self.height = output_size(width, height, output_height)
+        self.frame_bytes = self.width * self.height * 3 // 2
+        self._buffers = [np.empty((self.height * 3 // 2, self.width), np.uint8)
+                         for _ in range(self.BUFFERS)]
+        scaled = (self.width, self.height) != self.source_size
+        self._scaled = np.empty((self.height, self.width, 4), np.uint8) if scaled else None
+
+    def convert(self, data, index):
+        """Convierte `data` en el búfer `index` y lo devuelve (válido hasta reutilizarlo)."""
+        import cv2
+        import numpy as np
+        width, height = self.source_size
+        frame = np.frombuffer(data, dtype=np.uint8).reshape((height, width, 4))
+        if self._scaled is not None:
+            cv2.resize(frame, (self.width, self.height), dst=self._scaled,
+                       interpolation=cv2.INTER_AREA)
+            frame = self._scaled
+        cv2.cvtColor(frame, cv2.COLOR_BGRA2YUV_I420, dst=self._buffers[index])
+        return self._buffers[index]
@@ -0,0 +1,119 @@
+"""
+Pool de búferes preasignados para los fotogramas de la grabación.
+
+El bucle de captura copia cada fotograma en una ranura libre del pool y el
+hilo codificador lo escribe en ffmpeg desde un `memoryview` de la ranura y
+la devuelve: la cola ya no crea ni retiene un objeto de ancho×alto×4 bytes
+por fotograma. Las ranuras libres se reutilizan en orden LIFO, así que sólo
+llegan a ocupar memoria física las que hacen falta para la profundidad real.
+
+El número de ranuras sale de un presupuesto de memoria (`for_budget`): a 4K
+caben menos fotogramas que a 720p, pero ocupan lo mismo. `stats()` da la
+profundidad actual, sus bytes y el máximo alcanzado, para ajustar el
+presupuesto en cada equipo.
+
+Con el pool lleno, la política decide qué fotograma se pierde:
+- 'drop_newest': se descarta la captura nueva (comportamiento de la antigua cola).
+- 'drop_oldest': se reutiliza el fotograma en espera más antiguo; el vídeo
+  se queda con lo más reciente.
+"""
+
+import threading
+from collections import deque
+
+
+class FramePool:
+    """Anillo de ranuras de tamaño fijo entre un productor y un consumidor."""
+
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    POLICIES = (DROP_NEWEST, DROP_OLDEST)
+
+    MIN_SLOTS = 3   # Uno capturándose, uno escribiéndose y el último escrito (se repite si hace falta)
+
+    def __init__(self, frame_bytes, slots=30, policy=DROP_NEWEST):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de descarte desconocida: {policy}")
+        self.frame_bytes = frame_bytes
+        self.policy = policy
+        # bytearray(n) no toca las páginas: la memoria se compromete al primer uso
+        self._buffers = [bytearray(frame_bytes) for _ in range(max(1, slots))]
+        self._views = [memoryview(b) for b in self._buffers]
+        self._info = [None] * len(self._buffers)
+        self._free = list(range(len(self._buffers)))
+        self._ready = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self._high_water = 0
+
+    @classmethod
+    def for_budget(cls, frame_bytes, budget_bytes, policy=DROP_NEWEST):
+        """Tantas ranuras como quepan en `budget_bytes` (al menos MIN_SLOTS)."""
+        return cls(frame_bytes, max(cls.MIN_SLOTS, int(budget_bytes // frame_bytes)), policy)
+
+    @property
+    def slots(self):
+        return len(self._buffers)
+
+    def stats(self):
+        """Profundidad de la cola, sus bytes, máximo alcanzado y fotogramas perdidos (y con qué política)."""
+        with self._cond:
+            depth = len(self._ready)
+            return {
+                'slots': self.slots,
+                'depth': depth,
+                'bytes': depth * self.frame_bytes,
+                'high_water': self._high_water,
+                'high_water_bytes': self._high_water * self.frame_bytes,
+                'capacity_bytes': self.slots * self.frame_bytes,
+                'dropped': self.dropped,
+                'policy': self.policy,
+            }
+
+    # ===== PRODUCTOR =====
+
+    def put(self, data, info=None):
+        """Copia `data` en una ranura y la encola. False si el fotograma se perdió.
+
+        `info` acompaña al fotograma (p. ej. su instante de captura); ver info().
+        """
+        with self._cond:
+            if self._free:
+                slot = self._free.pop()
+            elif self.policy == self.DROP_OLDEST and self._ready:
+                slot = self._ready.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return False
+        # La ranura es sólo del productor hasta encolarla: copia fuera del cerrojo
+        self._views[slot][:] = data
+        self._info[slot] = info
+        with self._cond:
+            self._ready.append(slot)
+            self._high_water = max(self._high_water, len(self._ready))
+            self._cond.notify()
+        return True
+
+    # ===== CONSUMIDOR =====
+
+    def get(self, timeout=None):
+        """Siguiente ranura con datos, o None si no llega ninguna a tiempo."""
+        with self._cond:
+            if not self._ready and not self._cond.wait_for(lambda: self._ready, timeout):
+                return None
+            return self._ready.popleft()
+
+    def view(self, slot):
+        return self._views[slot]
+
+    def info(self, slot):
+        return self._info[slot]
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+
+    def pending(self):
+        with self._cond:
+            return len(self._ready)
@@ -0,0 +1,102 @@
+"""
+Regulador adaptativo del ritmo de captura de la grabación.
+
+Mide el tiempo de captura de mss, el de escritura de cada fotograma en
+ffmpeg (que se bloquea cuando el codificador no da abasto) y la ocupación de
+la cola de fotogramas, y cada EVAL_SECONDS sube o baja los fps dentro de
+[min_fps, max_fps]:
+- Cola llenándose            → baja un 30 %.
+- Capacidad medida < fps     → baja a la capacidad (con margen HEADROOM).
+- Cola vacía y capacidad sobrada → sube un 25 %, sin pasar de la capacidad.
+Cada cambio queda en `history` para el registro de la grabación.
+"""
+
+import statistics
+from collections import deque
+
+
+class FrameRateGovernor:
+    """Elige los fps de captura a partir de las mediciones de la grabación."""
+
+    EVAL_SECONDS = 2.0
+    HEADROOM = 0.8      # Fracción de la capacidad medida que se usa
+    STEP_UP = 1.25
+    STEP_DOWN = 0.7
+    SAMPLES = 60
+
+    def __init__(self, min_fps=5.0, max_fps=30.0, start_fps=12.0):
+        self.min_fps = float(min_fps)
+        self.max_fps = max(self.min_fps, float(max_fps))
+        self.fps = self._clamp(start_fps)
+        self._grab = deque(maxlen=self.SAMPLES)
+        self._encode = deque(maxlen=self.SAMPLES)
+        self._last_eval = 0.0
+        self._last_depth = 0
+        self.history = [(0.0, self.fps, 'inicio', None, None, 0)]
+
+    def _clamp(self, fps):
+        # Los fps de cada tramo se pasan a ffmpeg: siempre enteros
+        return float(min(self.max_fps, max(self.min_fps, round(fps))))
+
+    # ===== MEDICIONES =====
+
+    def record_grab(self, seconds):
+        self._grab.append(seconds)
+
+    def record_encode(self, seconds):
+        """Desde el hilo codificador (deque.append es atómico)."""
+        self._encode.append(seconds)
+
+    # ===== DECISIÓN =====
+
+    def update(self, now, depth, slots):
+        """Reevalúa los fps cada EVAL_SECONDS; devuelve los fps vigentes.
+
+        `now` son los segundos de grabación; `depth`/`slots`, la cola de fotogramas.
+        """
+        if now - self._last_eval < self.EVAL_SECONDS or not self._grab:
+            return self.fps
+        self._last_eval = now
+
+        grab = statistics.median(self._grab)
+        encode = statistics.median(self._encode) if self._encode else 0.0
+        per_frame = max(grab, encode, 1e-6)
+        capacity = self.HEADROOM / per_frame
+        fill = depth / max(1, slots)
+        growing = depth > self._last_depth + 1
+        self._last_depth = depth
+
+        target, reason = self.fps, None
+        if fill > 0.5 or growing:
+            target, reason = self.fps * self.STEP_DOWN, 'cola'
+        elif capacity < self.fps:
+            target, reason = capacity, 'capacidad'
+        elif depth <= max(1, slots * 0.1) and capacity > self.fps * self.STEP_UP:
+            target, reason = min(self.fps * self.STEP_UP, capacity), 'margen'
+
+        target = self._clamp(target)
+        if reason and target != self.fps:
+            self.fps = target
+            self.history.append((now, target, reason, grab, encode, depth))
+        return self.fps
+
+    # ===== REGISTRO =====
+
+    def report(self, duration=None):
+        """Texto con los cambios de fps de la grabación."""
+        lines = [f"fps de captura: mín {self.min_fps:g}, máx {self.max_fps:g}"]
+        for now, fps, reason, grab, encode, depth in self.history:
+            line = f"{now:8.1f} s  {fps:5.1f} fps  ({reason})"
+            if grab is not None:
+                line += f"  captura {grab * 1000:.1f} ms, escritura {encode * 1000:.1f} ms, cola {depth}"
+            lines.append(line)
+        if duration:
+            lines.append(f"fps medio: {self.average_fps(duration):.1f}")
+        return "\n".join(lines)
+
+    def average_fps(self, duration):
+        """Media ponderada por el tiempo que estuvo vigente cada ritmo."""
+        total = 0.0
+        for (start, fps, *_), nxt in zip(self.history, self.history[1:] + [(duration,)]):
+            total += fps * max(0.0, min(nxt[0], duration) - start)
+        return total / duration if duration > 0 else self.fps
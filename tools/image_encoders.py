@@ -0,0 +1,91 @@
+"""
+Codificadores de imagen para capturas de pantalla.
+
+Formatos (clave → extensión):
+- 'png':      sin pérdida, nivel de compresión 0-9 (`png_level`).
+- 'png_fast': sin pérdida para ráfagas: nivel 1 con un único filtro (SUB) en
+              lugar de elegir filtro por fila; archivos algo mayores.
+- 'jpeg':     con pérdida, calidad 1-100 (`quality`). Sin transparencia.
+- 'webp':     con pérdida, calidad 1-100 (`quality`); admite transparencia.
+
+La configuración es un dict como el de la preferencia `screenshot_encoder`:
+    {'format': 'png', 'png_level': 3, 'quality': 90}
+Los valores por defecto salen de `python -m tools.benchmark encoders`.
+"""
+
+import os
+
+FORMATS = {
+    'png': '.png',
+    'png_fast': '.png',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+}
+
+DEFAULT_SETTINGS = {'format': 'png', 'png_level': 3, 'quality': 90}
+
+_ALPHA_FORMATS = ('png', 'png_fast', 'webp')
+
+
+def settings_with_defaults(settings=None):
+    merged = dict(DEFAULT_SETTINGS)
+    if settings:
+        merged.update(settings)
+    if merged['format'] not in FORMATS:
+        merged['format'] = DEFAULT_SETTINGS['format']
+    return merged
+
+
+def extension(settings=None):
+    return FORMATS[settings_with_defaults(settings)['format']]
+
+
+def for_alpha(settings=None):
+    """Configuración válida para imágenes con transparencia (JPEG → PNG)."""
+    settings = settings_with_defaults(settings)
+    if settings['format'] not in _ALPHA_FORMATS:
+        settings['format'] = 'png'
+    return settings
+
+
+def _params(settings):
+    import cv2
+    fmt = settings['format']
+    if fmt == 'png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(settings['png_level'])]
+    if fmt == 'png_fast':
+        return [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_FILTER, cv2.IMWRITE_PNG_FILTER_SUB]
+    if fmt == 'jpeg':
+        return [cv2.IMWRITE_JPEG_QUALITY, int(settings['quality'])]
+    if fmt == 'webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, int(settings['quality'])]
+    return []
+
+
+def encode(frame, settings=None):
+    """Codifica un array BGR o BGRA. Devuelve los bytes del archivo."""
+    import cv2
+    settings = settings_with_defaults(settings)
+    ok, data = cv2.imencode(FORMATS[settings['format']], frame, _params(settings))
+    if not ok:
+        raise RuntimeError(f"No se pudo codificar la imagen como {settings['format']}")
+    return data
+
+
+def _matching_filename(filename, settings):
+    """Si la extensión del archivo indica otro formato conocido, se respeta."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.jpeg':
+        ext = '.jpg'
+    if ext in FORMATS.values() and ext != FORMATS[settings['format']]:
+        settings = dict(settings, format=next(f for f, e in FORMATS.items() if e == ext))
+    return settings
+
+
+def write(frame, filename, settings=None):
+    """Codifica y escribe `frame` en `filename`. Devuelve la ruta."""
+    settings = _matching_filename(filename, settings_with_defaults(settings))
+    data = encode(frame, settings)
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return filename
@@ -0,0 +1,248 @@
+"""
+Captura por intervalos (timelapse) para demostraciones largas.
+
+Cada N segundos se captura la región elegida y se compara una miniatura en
+gris (160 px de ancho) con la de la última captura guardada: sólo se
+codifican y escriben las que cambian más de un umbral (porcentaje de píxeles
+de la miniatura que difieren). La escritura va en un hilo aparte que vacía
+la cola por lotes; la cola está acotada y, si el disco no da abasto, el
+bucle espera al escritor (se saltan plazos) en vez de acumular capturas en
+memoria. Al terminar se emite un resumen y, si se pide, se monta un vídeo
+con las capturas guardadas (cada una dura hasta el siguiente cambio).
+
+Con `redaction_source`, las zonas privadas se leen en el hilo de la UI (un
+QTimer las copia en una tupla) y se pixelan en cada captura antes de
+compararla y de encolarla: ninguna imagen sin pixelar llega al disco.
+"""
+
+import datetime
+import os
+import queue
+import threading
+import time
+
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+
+from tools import image_encoders, redaction
+from tools.capture_service import get_capture_service
+
+
+class IntervalCapture(QThread):
+    """Capturas periódicas que descartan los fotogramas sin cambios."""
+
+    frame_saved = pyqtSignal(str)
+    progress = pyqtSignal(int, int)         # capturadas, omitidas
+    processing_started = pyqtSignal()       # Montaje del vídeo
+    finished_summary = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
+
+    THUMB_WIDTH = 160
+    PIXEL_DELTA = 12        # Diferencia de gris para contar un píxel como cambiado
+    BATCH_SIZE = 8          # Capturas por lote de escritura
+    BATCH_TIMEOUT = 2.0     # Segundos máximos que un lote espera a completarse
+    MAX_PENDING = 16        # Capturas máximas esperando al escritor
+    REDACTION_REFRESH_MS = 100
+    VIDEO_FPS = 30
+
+    def __init__(self, region, interval=5.0, threshold=0.5, output_dir=None, encoder=None,
+                 make_video=False, redaction_source=None):
+        """`region` es una región mss ya resuelta (CaptureService.region, hilo de la UI);
+        `threshold` es el porcentaje mínimo de la miniatura que debe cambiar;
+        `redaction_source` devuelve las zonas privadas [(x, y, ancho, alto)] físicas
+        y se llama en el hilo de la UI."""
+        super().__init__()
+        self.region = dict(region)
+        self.interval = max(0.1, float(interval))
+        self.threshold = float(threshold)
+        self.encoder = image_encoders.settings_with_defaults(encoder)
+        self.make_video = make_video
+        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.output_dir = output_dir or os.path.abspath(f"timelapse_{ts}")
+        self._stop_event = threading.Event()
+        self._write_queue = queue.Queue(maxsize=self.MAX_PENDING)
+        self._kept = []             # (ruta, segundos desde el inicio)
+
+        # Zonas privadas: el hilo de captura sólo lee la tupla que deja el temporizador
+        self.redaction_source = redaction_source
+        self._redactions = None     # (rects, ajustes) o None
+        self._redaction_timer = QTimer(self)
+        self._redaction_timer.setInterval(self.REDACTION_REFRESH_MS)
+        self._redaction_timer.timeout.connect(self._refresh_redactions)
+        self.finished.connect(self._redaction_timer.stop)
+
+    def start(self, *args):
+        if self.redaction_source is not None:
+            self._refresh_redactions()
+            self._redaction_timer.start()
+        super().start(*args)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _refresh_redactions(self):
+        """Zonas privadas y ajustes de pixelado del momento (hilo de la UI)."""
+        try:
+            rects = tuple(self.redaction_source())
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+        if rects:
+            from config.preferences_manager import get_preferences_store
+            self._redactions = (rects, get_preferences_store().get('redaction'))
+        else:
+            self._redactions = None
+
+    def run(self):
+        capture = get_capture_service()
+        captured = skipped = 0
+        previous = None
+        writer = threading.Thread(target=self._writer, daemon=True)
+        t0 = time.perf_counter()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            writer.start()
+            while not self._stop_event.is_set():
+                raw, width, height = capture.grab_region(self.region)
+                elapsed = time.perf_counter() - t0
+                captured += 1
+                raw = self._redact(raw, width, height)
+                thumb = self._thumbnail(raw, width, height)
+                if previous is not None and self._changed_percent(previous, thumb) < self.threshold:
+                    skipped += 1
+                else:
+                    previous = thumb
+                    self._kept.append(None)
+                    self._enqueue((len(self._kept) - 1, elapsed, raw, width, height), writer)
+                self.progress.emit(captured, skipped)
+
+                # Plazos fijos desde el inicio: sin deriva aunque la captura tarde
+                now = time.perf_counter() - t0
+                self._stop_event.wait((int(now / self.interval) + 1) * self.interval - now)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+        finally:
+            capture.release_thread()
+            if writer.is_alive():
+                try:
+                    self._enqueue(None, writer)
+                except RuntimeError:
+                    pass
+                writer.join()
+
+        duration = time.perf_counter() - t0
+        kept = [k for k in self._kept if k is not None]
+        summary = {
+            'captured': captured,
+            'saved': len(kept),
+            'skipped': skipped,
+            'duration': duration,
+            'output_dir': self.output_dir,
+            'video': None,
+        }
+        if self.make_video and kept:
+            self.processing_started.emit()
+            try:
+                summary['video'] = assemble_video(kept, duration, self.output_dir + ".mp4", self.VIDEO_FPS)
+            except Exception as e:
+                self.error_occurred.emit(str(e))
+        self.finished_summary.emit(summary)
+
+    def _enqueue(self, item, writer):
+        """Encola para el escritor; con la cola llena espera a que haga sitio."""
+        while True:
+            try:
+                self._write_queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if not writer.is_alive():
+                    raise RuntimeError("El escritor de capturas se detuvo")
+
+    def _redact(self, raw, width, height):
+        """Pixela las zonas privadas sobre la captura; devuelve un buffer escribible."""
+        redactions = self._redactions
+        if redactions is None:
+            return raw
+        if not isinstance(raw, bytearray):
+            raw = bytearray(raw)
+        rects, settings = redactions
+        placement = (self.region["left"], self.region["top"], 1.0, 0, 0)
+        redaction.redact_raw(raw, width, height, rects, placement, settings)
+        return raw
+
+    # ===== COMPARACIÓN =====
+
+    def _thumbnail(self, raw, width, height):
+        import cv2
+        import numpy as np
+        frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+        thumb_h = max(1, round(height * self.THUMB_WIDTH / width))
+        small = cv2.resize(frame, (self.THUMB_WIDTH, thumb_h), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY)
+
+    def _changed_percent(self, a, b):
+        import cv2
+        import numpy as np
+        return float(np.count_nonzero(cv2.absdiff(a, b) > self.PIXEL_DELTA)) * 100.0 / a.size
+
+    # ===== ESCRITURA POR LOTES =====
+
+    def _writer(self):
+        from tools import capture_screen
+        ext = image_encoders.extension(self.encoder)
+        done = False
+        while not done:
+            batch = [self._write_queue.get()]
+            deadline = time.perf_counter() + self.BATCH_TIMEOUT
+            while batch[-1] is not None and len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._write_queue.get(timeout=max(0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    done = True
+                    continue
+                index, elapsed, raw, width, height = item
+                filename = os.path.join(self.output_dir, f"frame_{index + 1:05d}{ext}")
+                try:
+                    capture_screen.save_frame(raw, width, height, filename, self.encoder)
+                except Exception as e:
+                    self.error_occurred.emit(str(e))
+                    continue
+                self._kept[index] = (filename, elapsed)
+                self.frame_saved.emit(filename)
+
+
+def assemble_video(frames, duration, output, fps=30):
+    """Monta un vídeo con ffmpeg a partir de [(ruta, segundo)], en orden.
+
+    Cada imagen se mantiene hasta el instante de la siguiente (la última,
+    hasta `duration`), así el vídeo respeta el tiempo real de la sesión.
+    """
+    import subprocess
+    from tools.capture_screen import _get_ffmpeg
+
+    def entry(path):
+        # Comillas simples escapadas según la sintaxis del demuxer concat
+        return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n"
+
+    list_file = output + ".txt"
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for i, (path, start) in enumerate(frames):
+            end = frames[i + 1][1] if i + 1 < len(frames) else max(duration, start + 1.0 / fps)
+            f.write(entry(path))
+            f.write(f"duration {end - start:.3f}\n")
+        # El demuxer concat ignora la duración de la última entrada si no se repite
+        f.write(entry(frames[-1][0]))
+    command = [
+        _get_ffmpeg(), '-y', '-f', 'concat', '-safe', '0', '-i', list_file,
+        '-vf', f'fps={fps},pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', output
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.remove(list_file)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg no pudo montar el vídeo: {result.stderr.strip()[-300:]}")
+    return output
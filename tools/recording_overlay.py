@@ -2,20 +2,27 @@ from PyQt6.QtWidgets import (
     QWidget, QHBoxLayout, QPushButton, QLabel,
     QFileDialog, QApplication, QProgressDialog
 )
-from PyQt6.QtCore import Qt, QPoint, QTimer, QRect
-from PyQt6.QtGui import QPainter, QPen, QColor, QFont
-from tools.capture_screen import ScreenRecorder, take_screenshot
+from PyQt6.QtCore import Qt, QPoint, QTimer, QRect, QStandardPaths, pyqtSignal
+from PyQt6.QtGui import QPainter, QPen, QColor, QFont, QGuiApplication
+from tools.capture_screen import ScreenRecorder
+from tools.capture_service import physical_point, physical_rect
+from tools.screenshot_service import ScreenshotService
+from tools.cursor_sampler import CursorSampler
+from config.preferences_manager import get_preferences_store
 import os
 import datetime
-import time
 
 
 class ScreenRecordingOverlay(QWidget):
     """
-    Overlay de pantalla completa con marco de color.
+    Overlay con marco de color: la pantalla completa o, al grabar una región,
+    un marco por fuera de ella (no entra en el vídeo) que se puede arrastrar
+    con su asa también durante la grabación.
     Panel de control independiente y arrastrable.
     """
 
+    snapshot_saved = pyqtSignal(str)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowFlags(
@@ -32,6 +39,18 @@ class ScreenRecordingOverlay(QWidget):
         self.is_paused       = False
         self.audio_enabled   = True
         self._progress_dlg   = None
+        self._cursor         = CursorSampler(self)   # Cursor y clics (zoom automático, cursor dibujado)
+        self._redaction_source = None
+        self._redactions     = ()     # Zonas privadas, copiadas en el hilo de la UI para el grabador
+        self._redaction_timer = QTimer(self)
+        self._redaction_timer.setInterval(100)
+        self._redaction_timer.timeout.connect(self._refresh_redactions)
+        self._region_px      = None   # Región grabada en píxeles físicos (None: pantalla completa)
+
+        # Instantáneas asíncronas con la conexión de captura compartida
+        self._screenshots = ScreenshotService(parent=self)
+        self._screenshots.error_occurred.connect(lambda e: print(f"Snapshot Error: {e}"))
+        self._screenshots.saved.connect(self.snapshot_saved.emit)
 
         # Colores de estado
         self.COLOR_IDLE  = QColor(220, 0,  0, 200)
@@ -54,16 +73,37 @@ class ScreenRecordingOverlay(QWidget):
         self.panel.btn_snap.clicked.connect(self.take_snapshot)
         self.panel.btn_close.clicked.connect(self.close_overlay)
 
+        # Asa para mover el marco de una región (fuera de lo grabado)
+        self.handle = _MoveHandle()
+        self.handle.dragged.connect(self._move_region)
+
         self._update_ui_state(recording=False, paused=False)
 
     # ------------------------------------------------------------------
 
-    def show_overlay(self):
-        screen_geo = QApplication.primaryScreen().geometry()
-        self.setGeometry(screen_geo)
+    def show_overlay(self, region=None):
+        """`region`: QRect global (lógico) a grabar; None graba la pantalla principal."""
+        if self.recorder and self.recorder.isRunning():
+            return
+        if region is None:
+            self._region_px = None
+            screen = QApplication.primaryScreen()
+            self.setGeometry(screen.geometry())
+        else:
+            screen = QGuiApplication.screenAt(region.center()) or QApplication.primaryScreen()
+            # mss trabaja en píxeles físicos
+            self._region_px = physical_rect(region, screen)
+            b = self.BORDER_W
+            self.setGeometry(region.adjusted(-b, -b, b, b))
         self.show()
         self.raise_()
-        self._reposition_panel(screen_geo)
+        self._reposition_panel(screen.geometry())
+        if self._region_px is None:
+            self.handle.hide()
+        else:
+            self.handle.move(self.x() - self.handle.width(), self.y() - self.handle.height())
+            self.handle.show()
+            self.handle.raise_()
         self.panel.show()
         self.panel.raise_()
 
@@ -72,13 +112,29 @@ class ScreenRecordingOverlay(QWidget):
             self.save_and_stop()
             return
         self.panel.hide()
+        self.handle.hide()
         self.hide()
 
     def start_recording(self):
         if self.recorder and self.recorder.isRunning():
             return
         
-        self.recorder = ScreenRecorder(audio_enabled=self.audio_enabled)
+        settings = get_preferences_store().get('recording')
+        # Una región se relee en cada fotograma: el marco puede moverse mientras se graba
+        geometry_source = (lambda: self._region_px) if self._region_px is not None else None
+        # El zoom automático encuadra la pantalla completa siguiendo al cursor; mss no
+        # captura el puntero, así que con show_cursor se dibuja en cada fotograma
+        if (settings['auto_zoom'] and geometry_source is None) or settings['show_cursor']:
+            self._cursor.start()
+        self._refresh_redactions()
+        if self._redaction_source is not None:
+            self._redaction_timer.start()
+        self.recorder = ScreenRecorder(geometry_source=geometry_source, audio_enabled=self.audio_enabled,
+                                       settings=settings, cursor_source=self._cursor.sample,
+                                       cursor_scale=self.devicePixelRatioF(),
+                                       redaction_source=lambda: self._redactions,
+                                       redaction_settings=get_preferences_store().get('redaction'),
+                                       stats_log=self._stats_log_path())
         self.recorder.recording_stopped.connect(self._on_stopped)
         self.recorder.processing_started.connect(self._on_processing_started)
         self.recorder.progress_updated.connect(self._on_progress)
@@ -92,6 +148,24 @@ class ScreenRecordingOverlay(QWidget):
         self._update_ui_state(recording=True, paused=False)
         self.update()
 
+    def set_redaction_source(self, source):
+        """Zonas privadas [(x, y, ancho, alto)] físicas para grabaciones e instantáneas."""
+        self._redaction_source = source
+        self._screenshots.redaction_source = source
+
+    def _refresh_redactions(self):
+        # El grabador lee la tupla desde su hilo; el overlay sólo se consulta aquí
+        try:
+            self._redactions = tuple(self._redaction_source()) if self._redaction_source else ()
+        except Exception as e:
+            print(f"Error reading redaction regions: {e}")
+
+    @staticmethod
+    def _stats_log_path():
+        """Registro de la última grabación (fps elegidos y ocupación de la cola)."""
+        base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppLocalDataLocation)
+        return os.path.join(base, "last_recording_stats.log")
+
     def toggle_pause(self):
         if not self.recorder: return
         self.recorder.pause()
@@ -116,20 +190,16 @@ class ScreenRecordingOverlay(QWidget):
         self.recorder.stop()
 
     def take_snapshot(self):
-        self.hide()
-        QApplication.processEvents()
-        time.sleep(0.2)
-        
-        # Guardar captura
         if self.recorder and self.recorder.output_filename:
             d = os.path.dirname(self.recorder.output_filename) or "."
             ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            take_screenshot(filename=os.path.join(d, f"snapshot_{ts}.png"))
+            fname = os.path.join(d, f"snapshot_{ts}.png")
         else:
             fname, _ = QFileDialog.getSaveFileName(self.panel, "Guardar Imagen", "", "PNG (*.png)")
-            if fname: take_screenshot(filename=fname)
+            if not fname: return
         
-        self.show()
+        # Se oculta el marco sólo hasta tener la imagen; la escritura va en segundo plano
+        self._screenshots.capture(rect=self._region_px, filename=fname, hide=(self,))
 
     # ------------------------------------------------------------------
 
@@ -172,12 +242,15 @@ class ScreenRecordingOverlay(QWidget):
                 pass
             self._progress_dlg = None
         
+        self._cursor.stop()
+        self._redaction_timer.stop()
         self.recorder = None
         self.is_paused = False
         self.elapsed_secs = 0
         self.panel.lbl_time.setText("")
         self._update_ui_state(recording=False, paused=False)
         self.panel.hide()
+        self.handle.hide()
         self.hide()
         self.update()
 
@@ -187,6 +260,15 @@ class ScreenRecordingOverlay(QWidget):
         self.panel.btn_save.setEnabled(recording)
         self.panel.btn_pause.setText("▶️" if paused else "⏸️")
 
+    def _move_region(self, handle_pos: QPoint):
+        """El asa se arrastró a `handle_pos`: el marco y la región la siguen."""
+        self.move(handle_pos.x() + self.handle.width(), handle_pos.y() + self.handle.height())
+        # El tamaño en píxeles no cambia (el lienzo del vídeo es fijo); el origen se
+        # convierte con la pantalla en la que cae ahora
+        x, y = physical_point(self.x() + self.BORDER_W, self.y() + self.BORDER_W)
+        # QRect nuevo (no se modifica el anterior): el hilo de grabación lo lee sin cerrojo
+        self._region_px = QRect(x, y, self._region_px.width(), self._region_px.height())
+
     def _reposition_panel(self, screen_geo: QRect):
         self.panel.adjustSize()
         x = screen_geo.right() - self.panel.width() - 25
@@ -200,7 +282,8 @@ class ScreenRecordingOverlay(QWidget):
         br = self.BORDER_W // 2
         painter.drawRect(br, br, self.width() - self.BORDER_W, self.height() - self.BORDER_W)
         
-        if self.recorder:
+        # En una región el texto quedaría dentro del vídeo: el tiempo va en el panel
+        if self.recorder and self._region_px is None:
             m, s = divmod(self.elapsed_secs, 60)
             status = "RECORD" if not self.is_paused else "PAUSED"
             painter.setFont(QFont("Arial", 11, QFont.Weight.Bold))
@@ -208,6 +291,38 @@ class ScreenRecordingOverlay(QWidget):
             painter.drawText(20, 25, f"{status} - {m:02d}:{s:02d}")
 
 
+class _MoveHandle(QWidget):
+    """Asa arrastrable en la esquina exterior del marco de una región."""
+
+    dragged = pyqtSignal(QPoint)    # Nueva posición (global) de la esquina superior izquierda
+
+    def __init__(self):
+        super().__init__(None, Qt.WindowType.Tool | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.FramelessWindowHint)
+        self.setFixedSize(24, 24)
+        self.setToolTip("Arrastrar para mover la región grabada")
+        self.setCursor(Qt.CursorShape.SizeAllCursor)
+        self.setStyleSheet("background: #333; color: #EEE; border-radius: 4px;")
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        label = QLabel("✥")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(label)
+        self._drag_pos = None
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_pos = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_pos and event.buttons() & Qt.MouseButton.LeftButton:
+            pos = event.globalPosition().toPoint() - self._drag_pos
+            self.move(pos)
+            self.dragged.emit(pos)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_pos = None
+
+
 class _ControlPanel(QWidget):
     def __init__(self):
         super().__init__(None, Qt.WindowType.Tool | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.FramelessWindowHint)
@@ -0,0 +1,216 @@
+"""
+Línea de tiempo de la grabación: reloj sin pausas y escritura a ritmo constante.
+
+`RecordingClock` da los segundos de grabación sobre `perf_counter`, sin
+contar las pausas; el bucle de captura (`capture_loop`, en un hilo o en el
+proceso de captura) programa cada fotograma contra plazos absolutos de este
+reloj, así que los retrasos no se acumulan.
+
+`CfrSegmentWriter` recibe cada fotograma con su instante de captura y lo
+coloca en su hueco dentro del tramo de ffmpeg (fps constantes por tramo):
+- si faltan huecos (fotogramas perdidos o capturas tardías) repite el
+  anterior;
+- si el hueco ya está ocupado (llega antes de tiempo) lo descarta;
+- al cambiar de ritmo rellena el tramo hasta el inicio del siguiente, y al
+  terminar hasta el final de la grabación.
+Así la duración del vídeo coincide con la del reloj (y con el audio) aunque
+se pierdan fotogramas.
+
+Con `max_hold` los huecos más largos que esos segundos (pantalla estática:
+el productor no envía las capturas iguales) no se rellenan: el tramo se
+cierra con esa duración y el siguiente empieza en el nuevo fotograma. Al
+unir los tramos, el reproductor mantiene el último fotograma durante el
+hueco (vídeo de ritmo variable) sin que ffmpeg reciba ni codifique copias.
+"""
+
+import threading
+import time
+
+
+class RecordingClock:
+    """Segundos de grabación transcurridos, sin contar las pausas."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._paused_at = None
+        self._paused_total = 0.0
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def now(self):
+        with self._lock:
+            t = self._paused_at if self._paused_at is not None else time.perf_counter()
+            return t - self.start - self._paused_total
+
+    def pause(self):
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = time.perf_counter()
+
+    def resume(self):
+        with self._lock:
+            if self._paused_at is not None:
+                self._paused_total += time.perf_counter() - self._paused_at
+                self._paused_at = None
+
+
+def capture_loop(clock, governor, grab, submit, depth, slots, running):
+    """Bucle del productor de la grabación.
+
+    Captura con `grab()` en los plazos del reloj al ritmo del regulador y
+    entrega cada captura con `submit(raw, instante, fps)`. `depth()` es la
+    ocupación de la cola (de `slots` ranuras); sigue mientras `running()`.
+    """
+    next_due = 0.0
+    while running():
+        if clock.paused:
+            time.sleep(0.05)
+            continue
+        # Plazos absolutos del reloj: un retraso no desplaza los siguientes
+        wait = next_due - clock.now()
+        if wait > 0:
+            time.sleep(min(wait, 0.05))
+            continue
+
+        now = clock.now()
+        t_grab = time.perf_counter()
+        raw = grab()
+        governor.record_grab(time.perf_counter() - t_grab)
+
+        # Cada fotograma lleva su instante y el ritmo al que se capturó
+        submit(raw, now, governor.fps)
+        fps = governor.update(now, depth(), slots)
+
+        next_due += 1.0 / fps
+        if next_due < clock.now():
+            # Plazos ya perdidos: el codificador repite el último fotograma
+            next_due = clock.now()
+
+
+class CfrSegmentWriter:
+    """Escribe fotogramas con marca de tiempo en tramos de fps constantes.
+
+    `open_segment(fps)` devuelve un destino con write()/close() (la entrada de
+    un ffmpeg). `release(token)` devuelve el búfer de un fotograma: el último
+    escrito se retiene para poder repetirlo sin copiarlo.
+    """
+
+    def __init__(self, open_segment, release, max_hold=0.0):
+        self._open_segment = open_segment
+        self._release = release
+        self.max_hold = max_hold    # Segundos a partir de los que un hueco no se rellena (0: nunca)
+        self._sink = None
+        self._fps = None
+        self._segment_start = 0.0   # Instante de vídeo en que empieza el tramo actual
+        self._written = 0           # Fotogramas escritos en el tramo actual
+        self._held = None           # (token, frame) del último fotograma escrito
+        self.segments = []          # [(fps, fotogramas, segundos)] de los tramos cerrados
+        self.written = 0            # Fotogramas entregados a ffmpeg en total
+        self.duplicated = 0
+        self.dropped = 0
+        self.holds = 0              # Huecos mantenidos sin rellenar
+        self.held_seconds = 0.0
+
+    def write(self, token, frame, timestamp, fps):
+        if self._sink is None or fps != self._fps or self._long_gap(self._due(timestamp)):
+            self._switch(fps, timestamp)
+
+        due = self._due(timestamp)
+        if due < self._written:
+            # Su hueco ya está cubierto: llegó antes de tiempo
+            self.dropped += 1
+            self._release(token)
+            return
+        self._pad(due, frame)
+        self._sink.write(frame)
+        self._written += 1
+        self.written += 1
+
+        if self._held is not None:
+            self._release(self._held[0])
+        self._held = (token, frame)
+
+    def finish(self, end_time):
+        """Rellena el último tramo hasta `end_time` (segundos del reloj) y lo cierra."""
+        if self._sink is not None:
+            if self._long_gap(self._due(end_time)):
+                # Se mantiene el fotograma hasta el último hueco, que lo repite para cerrar el vídeo
+                self._switch(self._fps, end_time - 1.0 / self._fps)
+            self._pad(self._due(end_time))
+            self._close_segment()
+        if self._held is not None:
+            self._release(self._held[0])
+            self._held = None
+
+    def abort(self):
+        """Cierra sin rellenar (p. ej. si ffmpeg dejó de aceptar datos)."""
+        if self._sink is not None:
+            try:
+                self._close_segment()
+            except Exception:
+                pass
+        if self._held is not None:
+            self._release(self._held[0])
+            self._held = None
+
+    @property
+    def held_token(self):
+        """Token del fotograma retenido (no debe reutilizarse su búfer), o None."""
+        return self._held[0] if self._held is not None else None
+
+    @property
+    def duration(self):
+        """Segundos de vídeo escritos."""
+        total = sum(seconds for _, _, seconds in self.segments)
+        if self._sink is not None:
+            total += self._written / self._fps
+        return total
+
+    def _due(self, timestamp):
+        """Hueco del tramo actual que corresponde a `timestamp`."""
+        return round((timestamp - self._segment_start) * self._fps)
+
+    def _long_gap(self, target):
+        return (self.max_hold > 0 and self._held is not None
+                and (target - self._written) / self._fps > self.max_hold)
+
+    def _switch(self, fps, timestamp):
+        if self._sink is not None:
+            # El tramo anterior dura hasta el inicio de este fotograma
+            target = self._due(timestamp)
+            if self._long_gap(target):
+                self.holds += 1
+                self.held_seconds += timestamp - self._segment_start - self._written / self._fps
+                self._close_segment(timestamp)
+            else:
+                self._pad(target)
+                self._close_segment()
+        self._sink = self._open_segment(fps)
+        self._fps = fps
+        self._written = 0
+
+    def _close_segment(self, end_time=None):
+        """`end_time`: fin del tramo si se mantiene su último fotograma más allá."""
+        sink, self._sink = self._sink, None
+        if end_time is None:
+            seconds = self._written / self._fps
+        else:
+            seconds = end_time - self._segment_start
+        self.segments.append((self._fps, self._written, seconds))
+        # El siguiente tramo empieza donde acabó éste (sin errores de redondeo acumulados)
+        self._segment_start += seconds
+        sink.close()
+
+    def _pad(self, target, frame=None):
+        """Repite el último fotograma (o `frame`, si aún no hay ninguno) hasta `target`."""
+        source = self._held[1] if self._held is not None else frame
+        if source is None:
+            return
+        while self._written < target:
+            self._sink.write(source)
+            self._written += 1
+            self.written += 1
+            self.duplicated += 1
@@ -0,0 +1,107 @@
+"""
+Zonas privadas: pixelado o difuminado de rectángulos en capturas y grabaciones.
+
+Las zonas llegan en píxeles físicos del escritorio (rectángulos «Zona
+Privada» del overlay y `redaction.regions` de las preferencias) y se aplican
+sobre el BGRA de mss antes de codificar, en sitio:
+- 'pixelate': cada bloque de `block`×`block` píxeles pasa a ser su media
+  (INTER_AREA hacia abajo, INTER_NEAREST hacia arriba).
+- 'blur': la misma reducción, suavizada y ampliada con INTER_LINEAR.
+Ambos son irreversibles: del bloque sólo queda la media.
+
+Sólo se procesan los rectángulos, no el fotograma: el coste depende del área
+privada. Las zonas grandes se parten en franjas de filas (múltiplos del
+bloque, sin costuras al pixelar) que se reparten en un pool de hilos;
+OpenCV libera el GIL durante cada franja.
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ('pixelate', 'blur')
+BAND_PIXELS = 256 * 1024    # Área mínima por tarea: por debajo no compensa repartir
+
+_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))   # Con un núcleo, en el hilo que llama
+_pool = None
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="Redaction")
+    return _pool
+
+
+def to_frame(rects, placement, width, height):
+    """Rectángulos del escritorio → coordenadas de un fotograma de ancho×alto, recortados.
+
+    `placement` = (izquierda, arriba, escala, desplazamiento x, desplazamiento y):
+    dónde cae el escritorio en el fotograma (ver RegionFollower.placement).
+    """
+    left, top, scale, off_x, off_y = placement
+    local = []
+    for x, y, w, h in rects:
+        # Hacia fuera: una zona escalada nunca deja un borde sin cubrir
+        x0 = max(0, math.floor((x - left) * scale + off_x))
+        y0 = max(0, math.floor((y - top) * scale + off_y))
+        x1 = min(width, math.ceil((x + w - left) * scale + off_x))
+        y1 = min(height, math.ceil((y + h - top) * scale + off_y))
+        if x1 > x0 and y1 > y0:
+            local.append((x0, y0, x1 - x0, y1 - y0))
+    return local
+
+
+def redact(frame, rects, mode='pixelate', block=16):
+    """Pixela o difumina `rects` (x, y, ancho, alto; locales) de `frame` (alto×ancho×4), en sitio.
+
+    Devuelve los píxeles procesados.
+    """
+    block = max(2, int(block))
+    tasks = []
+    for x, y, w, h in rects:
+        # Franjas de filas múltiplo del bloque: los bloques coinciden entre franjas
+        rows = max(block, BAND_PIXELS // max(1, w) // block * block)
+        for band in range(y, y + h, rows):
+            tasks.append(frame[band:min(y + h, band + rows), x:x + w])
+    if not tasks:
+        return 0
+    if len(tasks) == 1 or _WORKERS == 1:
+        for roi in tasks:
+            _redact_roi(roi, mode, block)
+    else:
+        for future in [_executor().submit(_redact_roi, roi, mode, block) for roi in tasks]:
+            future.result()
+    return sum(w * h for _, _, w, h in rects)
+
+
+def _redact_roi(roi, mode, block):
+    import cv2
+    h, w = roi.shape[:2]
+    cols, rows = -(-w // block), -(-h // block)
+    full_w, full_h = cols * block, rows * block
+    src = roi
+    if (full_w, full_h) != (w, h):
+        # Bloques exactos: se completa el múltiplo del bloque repitiendo el borde
+        src = cv2.copyMakeBorder(roi, 0, full_h - h, 0, full_w - w, cv2.BORDER_REPLICATE)
+    # Reducción por un factor entero: la ruta rápida de INTER_AREA (media de cada bloque)
+    small = cv2.resize(src, (cols, rows), interpolation=cv2.INTER_AREA)
+    if mode == 'blur':
+        small = cv2.blur(small, (3, 3))
+        interpolation = cv2.INTER_LINEAR
+    else:
+        interpolation = cv2.INTER_NEAREST
+    if src is roi:
+        cv2.resize(small, (w, h), dst=roi, interpolation=interpolation)
+    else:
+        roi[...] = cv2.resize(small, (full_w, full_h), interpolation=interpolation)[:h, :w]
+
+
+def redact_raw(raw, width, height, rects, placement, settings):
+    """Como redact() sobre bytes BGRA escribibles de una captura con su `placement`."""
+    import numpy as np
+    local = to_frame(rects, placement, width, height)
+    if not local:
+        return 0
+    frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+    return redact(frame, local, settings.get('mode', 'pixelate'), settings.get('block', 16))
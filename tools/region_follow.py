@@ -0,0 +1,83 @@
+"""
+Grabación de una región que se mueve (marco arrastrable, ventana seguida...).
+
+`RegionFollower` vuelve a pedir la región a su fuente en cada fotograma y
+entrega siempre un lienzo del mismo tamaño, así ffmpeg ve dimensiones
+constantes y el codificador nunca se reinicia:
+- Si la región sólo se desplaza (mismo tamaño que el lienzo), se captura
+  directamente en su nueva posición: moverla no cuesta nada.
+- Si cambia de tamaño, la captura se escala para caber en el lienzo sin
+  deformarse (INTER_AREA) y se centra con bandas negras, sobre un búfer
+  preasignado.
+La región se limita siempre al escritorio virtual. `placement` dice dónde
+cayó el escritorio en el último lienzo (zonas privadas, cursor).
+"""
+
+
+def clamp_region(region, bounds):
+    """`region` (dict mss) dentro de `bounds`; al menos 2×2 píxeles."""
+    width = max(2, min(region["width"], bounds["width"]))
+    height = max(2, min(region["height"], bounds["height"]))
+    left = min(max(region["left"], bounds["left"]), bounds["left"] + bounds["width"] - width)
+    top = min(max(region["top"], bounds["top"]), bounds["top"] + bounds["height"] - height)
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+class RegionFollower:
+    """Captura cada fotograma en la región actual de `source()` sobre un lienzo fijo."""
+
+    def __init__(self, source, width, height, bounds):
+        self.source = source        # Devuelve la región mss actual
+        self.width = width
+        self.height = height
+        self.bounds = dict(bounds)
+        self._canvas = None
+        self._layout = None         # (ancho, alto) de la última captura escalada
+        self.moves = 0
+        self.rescaled = 0
+        self._last = None
+        self.placement = (bounds["left"], bounds["top"], 1.0, 0, 0)
+
+    def grab(self, grab_region):
+        """`grab_region(region)` devuelve una captura mss; se devuelven sus bytes en el lienzo."""
+        try:
+            region = clamp_region(self.source(), self.bounds)
+            # Como el lienzo, en pares: una región impar no obliga a reescalar
+            region["width"] -= region["width"] % 2
+            region["height"] -= region["height"] % 2
+        except Exception as e:
+            # Sin fuente válida se mantiene la última región
+            if self._last is None:
+                raise
+            print(f"Error reading recording region: {e}")
+            region = self._last
+        if region != self._last:
+            self.moves += 1
+            self._last = region
+        img = grab_region(region)
+        if region["width"] == self.width and region["height"] == self.height:
+            self.placement = (region["left"], region["top"], 1.0, 0, 0)
+            return img.raw
+        self.rescaled += 1
+        return self._fit(img.raw, region)
+
+    def _fit(self, raw, region):
+        import cv2
+        import numpy as np
+        if self._canvas is None:
+            self._canvas = np.zeros((self.height, self.width, 4), np.uint8)
+        width, height = region["width"], region["height"]
+        scale = min(self.width / width, self.height / height)
+        fit_w = max(1, min(self.width, round(width * scale)))
+        fit_h = max(1, min(self.height, round(height * scale)))
+        x, y = (self.width - fit_w) // 2, (self.height - fit_h) // 2
+        if self._layout != (fit_w, fit_h):
+            # Las bandas sólo se limpian cuando cambia la colocación
+            self._canvas[:] = 0
+            self._layout = (fit_w, fit_h)
+        self.placement = (region["left"], region["top"], fit_w / width, x, y)
+        frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        cv2.resize(frame, (fit_w, fit_h), dst=self._canvas[y:y + fit_h, x:x + fit_w],
+                   interpolation=interpolation)
+        return self._canvas.reshape(-1).data
@@ -0,0 +1,444 @@
+"""
+Servicio de capturas de pantalla sin bloquear el hilo de la UI.
+
+Flujo de `ScreenshotService.capture`:
+1. Oculta las ventanas indicadas y espera (por eventos, sin `time.sleep`) a
+   que el sistema de ventanas las retire de la pantalla.
+2. Captura en un hilo de trabajo.
+3. Emite `restored` en cuanto hay captura: las ventanas vuelven de inmediato.
+4. Codifica y escribe el archivo en un pool de hilos y emite `saved(ruta)`.
+
+`capture_annotated` no oculta ninguna ventana: excluye el overlay de la
+captura (afinidad de pantalla en Windows, opacidad 0 durante un fotograma en
+el resto) y compone las anotaciones en memoria sobre la imagen. Limitación:
+en X11 sin compositor la opacidad de ventana no tiene efecto, así que ahí las
+ventanas sí se ocultan y se espera a que se desmapeen, como en `capture`
+(con el parpadeo que eso conlleva).
+
+`capture_to_clipboard` sigue el mismo camino pero no escribe archivo: el
+buffer BGRA de mss se envuelve en una QImage sin copiarlo y va directo al
+portapapeles; opcionalmente se guarda después una copia en disco.
+
+Con `redaction_source`, las zonas privadas se leen en el hilo de la UI al
+pedir la captura y se pixelan en el hilo de captura, antes de componer,
+codificar o copiar nada (tools.redaction).
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, QEvent, QRect, QTimer, pyqtSignal
+from PyQt6.QtGui import QGuiApplication, QImage
+
+from tools import capture_screen, compositing, image_encoders, redaction
+from tools.capture_service import get_capture_service
+
+
+class _UnmapWaiter(QObject):
+    """Espera a que un conjunto de ventanas deje de estar expuesto."""
+
+    SETTLE_MS = 16      # Un fotograma para que el compositor retire la ventana
+    TIMEOUT_MS = 300    # Plataformas que no notifican la des-exposición
+
+    def __init__(self, widgets, callback, parent=None):
+        super().__init__(parent)
+        self._callback = callback
+        self._pending = set()
+        self._done = False
+
+        for widget in widgets:
+            window = widget.windowHandle()
+            if window is not None and window.isExposed():
+                self._pending.add(window)
+                window.installEventFilter(self)
+
+        if self._pending:
+            QTimer.singleShot(self.TIMEOUT_MS, self._finish)
+        else:
+            QTimer.singleShot(self.SETTLE_MS, self._finish)
+
+    def eventFilter(self, window, event):
+        if event.type() == QEvent.Type.Expose and window in self._pending and not window.isExposed():
+            window.removeEventFilter(self)
+            self._pending.discard(window)
+            if not self._pending:
+                QTimer.singleShot(self.SETTLE_MS, self._finish)
+        return False
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        for window in self._pending:
+            window.removeEventFilter(self)
+        self._pending.clear()
+        self._callback()
+        self.deleteLater()
+
+
+def _x11_without_compositor():
+    """True en X11 si nadie posee la selección _NET_WM_CM_S<pantalla> (sin compositor)."""
+    if QGuiApplication.platformName() != 'xcb':
+        return False
+    try:
+        import ctypes
+        import ctypes.util
+        x11 = ctypes.cdll.LoadLibrary(ctypes.util.find_library('X11') or 'libX11.so.6')
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XInternAtom.restype = ctypes.c_ulong
+        x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        x11.XGetSelectionOwner.restype = ctypes.c_ulong
+        x11.XGetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        display = x11.XOpenDisplay(None)
+        if not display:
+            raise OSError("XOpenDisplay falló")
+        try:
+            atom = x11.XInternAtom(display, b'_NET_WM_CM_S%d' % x11.XDefaultScreen(display), 0)
+            return x11.XGetSelectionOwner(display, atom) == 0
+        finally:
+            x11.XCloseDisplay(display)
+    except Exception as e:
+        # Sin poder comprobarlo, ocultar es lo único seguro
+        print(f"Compositor check failed, hiding windows for the capture: {e}")
+        return True
+
+
+class _CaptureExclusion:
+    """Deja ventanas fuera de la captura sin ocultarlas ni desmapearlas.
+
+    Excepción: en X11 sin compositor la opacidad no se aplica y las ventanas se
+    ocultan, esperando su desmapeo con `_UnmapWaiter`.
+    """
+
+    WDA_NONE = 0x00
+    WDA_EXCLUDEFROMCAPTURE = 0x11   # Windows 10 2004+
+
+    def __init__(self, widgets):
+        self.widgets = list(widgets)
+        self._affinity = []
+        self._opacity = {}
+        self._hidden = []
+        self._waiter = None
+
+    def begin(self, callback):
+        if self.widgets and sys.platform != 'win32' and _x11_without_compositor():
+            self._hidden = self.widgets
+            for widget in self._hidden:
+                widget.hide()
+            self._waiter = _UnmapWaiter(self._hidden, callback)
+            return
+        for widget in self.widgets:
+            if not self._set_affinity(widget, self.WDA_EXCLUDEFROMCAPTURE):
+                self._opacity[widget] = widget.windowOpacity()
+                widget.setWindowOpacity(0.0)
+        # Un fotograma para que el compositor aplique el cambio
+        QTimer.singleShot(_UnmapWaiter.SETTLE_MS if self.widgets else 0, callback)
+
+    def end(self):
+        for widget in self._affinity:
+            self._set_affinity(widget, self.WDA_NONE)
+        for widget, opacity in self._opacity.items():
+            widget.setWindowOpacity(opacity)
+        for widget in self._hidden:
+            widget.show()
+        self._affinity = []
+        self._opacity = {}
+        self._hidden = []
+        self._waiter = None
+
+    def _set_affinity(self, widget, value):
+        if sys.platform != 'win32':
+            return False
+        try:
+            import ctypes
+            ok = bool(ctypes.windll.user32.SetWindowDisplayAffinity(int(widget.winId()), value))
+        except Exception:
+            return False
+        if ok and value != self.WDA_NONE:
+            self._affinity.append(widget)
+        return ok
+
+
+class ScreenshotService(QObject):
+    """Capturas asíncronas: ocultar → capturar (hilo) → restaurar → codificar (pool)."""
+
+    # Anotaciones en capturas
+    ANNOTATIONS_ON = 'on'       # Escritorio + anotaciones
+    ANNOTATIONS_OFF = 'off'     # Sólo escritorio
+    ANNOTATIONS_ONLY = 'only'   # Sólo anotaciones (PNG transparente)
+    ANNOTATION_MODES = (ANNOTATIONS_ON, ANNOTATIONS_OFF, ANNOTATIONS_ONLY)
+
+    restored = pyqtSignal()         # Ventanas restauradas tras la captura
+    saved = pyqtSignal(str)         # Ruta del archivo escrito
+    copied = pyqtSignal()           # Imagen puesta en el portapapeles
+    error_occurred = pyqtSignal(str)
+
+    _grabbed = pyqtSignal()
+    _failed = pyqtSignal(str)
+    _clipboard_ready = pyqtSignal(object)
+
+    def __init__(self, capture=None, parent=None, encode_workers=2):
+        super().__init__(parent)
+        # Servicio compartido, creado en el hilo de la UI (ver tools.capture_service)
+        self._capture = capture or get_capture_service()
+        self._grab_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ScreenGrab")
+        self._encode_pool = ThreadPoolExecutor(max_workers=encode_workers,
+                                               thread_name_prefix="ScreenshotEncode")
+        self._hidden = []
+        self._exclusion = None
+        self._busy = False
+        # La QImage del portapapeles comparte este buffer: vive hasta la siguiente copia
+        self._clipboard_buffer = None
+        # Zonas privadas [(x, y, ancho, alto)] físicas; se llama en el hilo de la UI
+        self.redaction_source = None
+
+        # Señales emitidas desde hilos de trabajo: se entregan en el hilo de la UI
+        self._grabbed.connect(self._restore)
+        self._failed.connect(self._on_failed)
+        self._clipboard_ready.connect(self._set_clipboard)
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def _region(self, rect, monitor):
+        try:
+            return self._capture.region(rect, monitor)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return None
+
+    def capture(self, rect=None, filename=None, hide=(), encoder=None, monitor=None):
+        """Inicia una captura. Devuelve False si ya hay una en curso.
+
+        `encoder` es la configuración de tools.image_encoders (None = PNG);
+        `monitor` se interpreta como en CaptureService.region().
+        """
+        if self._busy:
+            return False
+        region = self._region(rect, monitor)
+        if region is None:
+            return False
+        self._busy = True
+        filename = filename or capture_screen.default_screenshot_name(image_encoders.extension(encoder))
+
+        self._hidden = [w for w in hide if w.isVisible()]
+        for widget in self._hidden:
+            widget.hide()
+
+        redactions = self._redactions()
+        _UnmapWaiter(self._hidden, lambda: self._grab_pool.submit(self._grab, region, filename, None, encoder,
+                                                                   redactions), self)
+        return True
+
+    def capture_annotated(self, overlay, mode=ANNOTATIONS_ON, rect=None, filename=None, exclude=(),
+                          encoder=None, monitor=None):
+        """Captura sin ciclo de ocultar/mostrar, componiendo las anotaciones de `overlay`.
+
+        `rect` está en coordenadas lógicas de pantalla de Qt (None = `monitor`);
+        `exclude` son las ventanas que no deben salir en la imagen.
+        """
+        if self._busy:
+            return False
+        prepared = self._prepare(overlay, mode, rect, monitor)
+        if prepared is None:
+            return False
+        region, layer = prepared
+        if mode == self.ANNOTATIONS_ONLY:
+            encoder = image_encoders.for_alpha(encoder)
+        filename = filename or capture_screen.default_screenshot_name(image_encoders.extension(encoder))
+
+        if mode == self.ANNOTATIONS_ONLY:
+            future = self._encode_pool.submit(compositing.save_layer, layer[0], filename, encoder)
+            future.add_done_callback(self._on_encoded)
+            return True
+
+        self._busy = True
+        redactions = self._redactions()
+        self._exclusion = _CaptureExclusion(w for w in exclude if w.isVisible())
+        self._exclusion.begin(lambda: self._grab_pool.submit(self._grab, region, filename, layer, encoder,
+                                                             redactions))
+        return True
+
+    def capture_to_clipboard(self, overlay, mode=ANNOTATIONS_ON, rect=None, exclude=(), monitor=None,
+                             save_copy=False, filename=None, encoder=None):
+        """Como capture_annotated, pero la imagen va al portapapeles.
+
+        Con `save_copy` se escribe además el archivo en segundo plano, una vez
+        la imagen ya está en el portapapeles.
+        """
+        if self._busy:
+            return False
+        prepared = self._prepare(overlay, mode, rect, monitor)
+        if prepared is None:
+            return False
+        region, layer = prepared
+        if save_copy:
+            if mode == self.ANNOTATIONS_ONLY:
+                encoder = image_encoders.for_alpha(encoder)
+            filename = filename or capture_screen.default_screenshot_name(image_encoders.extension(encoder))
+        else:
+            filename = None
+
+        if mode == self.ANNOTATIONS_ONLY:
+            # La capa ya es una QImage en el hilo de la UI; `copied` sigue siendo asíncrona
+            payload = (layer[0], None, filename, encoder)
+            QTimer.singleShot(0, lambda: self._set_clipboard(payload))
+            return True
+
+        self._busy = True
+        redactions = self._redactions()
+        self._exclusion = _CaptureExclusion(w for w in exclude if w.isVisible())
+        self._exclusion.begin(lambda: self._grab_pool.submit(self._grab_to_clipboard, region, layer,
+                                                             filename, encoder, redactions))
+        return True
+
+    def _prepare(self, overlay, mode, rect, monitor):
+        """Región mss y capa de anotaciones (instantánea en el hilo de la UI)."""
+        dpr = overlay.devicePixelRatioF()
+        if rect is not None:
+            # mss trabaja en píxeles físicos
+            rect = QRect(round(rect.x() * dpr), round(rect.y() * dpr),
+                         round(rect.width() * dpr), round(rect.height() * dpr))
+        region = self._region(rect, monitor)
+        if region is None:
+            return None
+
+        layer = None
+        if mode != self.ANNOTATIONS_OFF:
+            layer = self._annotation_layer(overlay, region, dpr)
+        if mode == self.ANNOTATIONS_ONLY and layer is None:
+            self.error_occurred.emit("No hay anotaciones en la región elegida")
+            return None
+        return region, layer
+
+    @staticmethod
+    def _annotation_layer(overlay, region, dpr):
+        """Anotaciones de la parte del overlay dentro de `region` (píxeles físicos).
+
+        Devuelve (QImage, (x, y)) con la posición dentro de la captura, o None
+        si el overlay no cubre la región (p. ej. otro monitor).
+        """
+        g = overlay.geometry()
+        overlay_px = QRect(round(g.x() * dpr), round(g.y() * dpr),
+                           round(g.width() * dpr), round(g.height() * dpr))
+        target = QRect(region["left"], region["top"], region["width"], region["height"])
+        inter = target.intersected(overlay_px)
+        if inter.isEmpty():
+            return None
+        local = QRect(round(inter.x() / dpr) - g.x(), round(inter.y() / dpr) - g.y(),
+                      round(inter.width() / dpr), round(inter.height() / dpr))
+        image = overlay.render_annotations(local, dpr)
+        return image, (inter.x() - target.x(), inter.y() - target.y())
+
+    def _redactions(self):
+        """Zonas privadas y ajustes de pixelado en el momento de pedir la captura."""
+        if self.redaction_source is None:
+            return None
+        try:
+            rects = list(self.redaction_source())
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return None
+        if not rects:
+            return None
+        from config.preferences_manager import get_preferences_store
+        return rects, get_preferences_store().get('redaction')
+
+    def shutdown(self):
+        self._grab_pool.shutdown(wait=False)
+        self._encode_pool.shutdown(wait=True)
+
+    # ===== HILOS DE TRABAJO =====
+
+    @staticmethod
+    def _redact(raw, width, height, region, redactions):
+        """Pixela las zonas privadas sobre la captura; devuelve un buffer escribible."""
+        if redactions is None:
+            return raw
+        if not isinstance(raw, bytearray):
+            raw = bytearray(raw)
+        rects, settings = redactions
+        redaction.redact_raw(raw, width, height, rects, (region["left"], region["top"], 1.0, 0, 0), settings)
+        return raw
+
+    def _grab(self, region, filename, layer=None, encoder=None, redactions=None):
+        try:
+            raw, width, height = self._capture.grab_region(region)
+        except Exception as e:
+            self._failed.emit(str(e))
+            return
+        self._grabbed.emit()
+        try:
+            raw = self._redact(raw, width, height, region, redactions)
+        except Exception as e:
+            # Sin pixelar no se guarda nada
+            self.error_occurred.emit(str(e))
+            return
+        if layer is None:
+            future = self._encode_pool.submit(capture_screen.save_frame, raw, width, height, filename, encoder)
+        else:
+            image, offset = layer
+            future = self._encode_pool.submit(compositing.compose_and_save, raw, width, height, image,
+                                              filename, encoder, offset)
+        future.add_done_callback(self._on_encoded)
+
+    def _grab_to_clipboard(self, region, layer, filename, encoder, redactions=None):
+        try:
+            raw, width, height = self._capture.grab_region(region)
+        except Exception as e:
+            self._failed.emit(str(e))
+            return
+        self._grabbed.emit()
+        try:
+            if not isinstance(raw, bytearray):
+                raw = bytearray(raw)    # Sólo si el origen no da un buffer escribible
+            raw = self._redact(raw, width, height, region, redactions)
+            if layer is not None:
+                import numpy as np
+                frame = np.frombuffer(raw, dtype=np.uint8).reshape((height, width, 4))
+                compositing.compose_in_place(frame, *layer)
+            # BGRA en memoria == QImage RGB32 en little-endian: sin copia
+            image = QImage(raw, width, height, width * 4, QImage.Format.Format_RGB32)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+        self._clipboard_ready.emit((image, (raw, width, height), filename, encoder))
+
+    def _on_encoded(self, future):
+        try:
+            self.saved.emit(future.result())
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+    # ===== HILO DE LA UI =====
+
+    def _restore(self):
+        if self._exclusion:
+            self._exclusion.end()
+            self._exclusion = None
+        for widget in self._hidden:
+            widget.show()
+        self._hidden = []
+        self._busy = False
+        self.restored.emit()
+
+    def _set_clipboard(self, payload):
+        image, frame, filename, encoder = payload
+        QGuiApplication.clipboard().setImage(image)
+        self._clipboard_buffer = frame
+        self.copied.emit()
+        if not filename:
+            return
+        if frame is None:
+            future = self._encode_pool.submit(compositing.save_layer, image, filename, encoder)
+        else:
+            future = self._encode_pool.submit(capture_screen.save_frame, *frame, filename, encoder)
+        future.add_done_callback(self._on_encoded)
+
+    def _on_failed(self, message):
+        self._restore()
+        self.error_occurred.emit(message)
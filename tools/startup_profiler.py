@@ -0,0 +1,139 @@
+"""
+Perfilado del arranque de ScreenPaint (`python main.py --profile-startup`).
+
+Mide:
+- El tiempo de cada import realizado durante el arranque (propio e inclusivo).
+- La construcción de cada ventana/widget principal.
+- El tiempo hasta el primer pintado del `FloatingMenu`.
+Además indica si alguna dependencia pesada (cv2, numpy, pyaudio...) se cargó
+antes del primer pintado: deben importarse sólo al primer uso.
+
+Con `--profile-startup=ruta.json` el informe también se guarda como JSON
+(lo usa `python -m tools.benchmark startup`).
+"""
+
+import builtins
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+# Módulos que no deben cargarse hasta que el usuario capture, grabe o use audio
+HEAVY_MODULES = ('cv2', 'numpy', 'pyaudio', 'wave', 'subprocess', 'mss')
+
+
+def requested(argv):
+    """Devuelve (activo, ruta_json) según la opción --profile-startup[=ruta]"""
+    for arg in argv:
+        if arg == '--profile-startup':
+            return True, None
+        if arg.startswith('--profile-startup='):
+            return True, arg.split('=', 1)[1] or None
+    return False, None
+
+
+class StartupProfiler:
+    """Cronómetro del arranque; se crea antes de cualquier import de la aplicación."""
+
+    def __init__(self, json_path=None):
+        self.t0 = time.perf_counter()
+        self.json_path = json_path
+        self.imports = {}       # nombre -> [propio_ms, inclusivo_ms]
+        self.sections = []      # (nombre, ms)
+        self.first_paint_ms = None
+        self.heavy_loaded = []
+        self._stack = []
+        self._original_import = None
+        self._preloaded = set(sys.modules)
+
+    # ===== IMPORTS =====
+
+    def install_import_hook(self):
+        """Envuelve __import__ para medir cada módulo importado por primera vez."""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def remove_import_hook(self):
+        if self._original_import:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            entry = self.imports.setdefault(name, [0.0, 0.0])
+            entry[0] += elapsed - children
+            entry[1] += elapsed
+
+    # ===== SECCIONES =====
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((name, (time.perf_counter() - start) * 1000))
+
+    def watch_first_paint(self, widget, on_done=None):
+        """Registra el primer pintado de `widget` y luego llama a on_done()."""
+        from PyQt6.QtCore import QObject, QEvent, QTimer
+
+        profiler = self
+
+        class _PaintWatcher(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Type.Paint:
+                    widget.removeEventFilter(self)
+                    # Tras procesar el evento de pintado
+                    QTimer.singleShot(0, self._painted)
+                return False
+
+            def _painted(self):
+                profiler.first_paint_ms = (time.perf_counter() - profiler.t0) * 1000
+                profiler.heavy_loaded = [m for m in HEAVY_MODULES
+                                         if m in sys.modules and m not in profiler._preloaded]
+                profiler.remove_import_hook()
+                if on_done:
+                    on_done()
+
+        self._watcher = _PaintWatcher(widget)
+        widget.installEventFilter(self._watcher)
+
+    # ===== INFORME =====
+
+    def report(self, top=15):
+        imports = sorted(self.imports.items(), key=lambda kv: kv[1][0], reverse=True)
+        print("=== Perfil de arranque de ScreenPaint ===")
+        print(f"Imports (top {top} por tiempo propio):")
+        for name, (own, total) in imports[:top]:
+            print(f"  {name:<40} propio {own:8.2f} ms   inclusivo {total:8.2f} ms")
+        print("Construcción:")
+        for name, ms in self.sections:
+            print(f"  {name:<40} {ms:8.2f} ms")
+        if self.first_paint_ms is not None:
+            print(f"Primer pintado de FloatingMenu: {self.first_paint_ms:.1f} ms")
+        if self.heavy_loaded:
+            print(f"AVISO: dependencias pesadas cargadas en el arranque: {', '.join(self.heavy_loaded)}")
+
+        if self.json_path:
+            data = {
+                'first_paint_ms': self.first_paint_ms,
+                'heavy_loaded': self.heavy_loaded,
+                'sections': dict(self.sections),
+                'imports': {name: {'own_ms': own, 'total_ms': total}
+                            for name, (own, total) in imports},
+            }
+            with open(self.json_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
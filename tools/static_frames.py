@@ -0,0 +1,51 @@
+"""
+Detección barata de fotogramas sin cambios durante la grabación.
+
+Las grabaciones de diapositivas o de código son casi siempre estáticas. En
+lugar de comparar el fotograma entero, cada captura se resume con un crc32
+de una de cada PHASES filas; la fila de inicio rota en cada fotograma, así
+que un cambio en cualquier fila se detecta como mucho PHASES capturas
+después. Sólo cuando hay cambio se calculan las PHASES sumas completas
+(una pasada por el fotograma, como la copia que de todos modos se hace).
+"""
+
+import zlib
+
+
+class StaticFrameDetector:
+    """Dice si una captura BGRA difiere de la última que se dio por cambiada."""
+
+    PHASES = 8
+
+    def __init__(self, stride):
+        self.stride = stride        # Bytes por fila
+        self._hashes = None
+        self._phase = 0
+        self.static = 0             # Capturas iguales que no se copiaron
+        self._last_static = False
+
+    def changed(self, raw):
+        data = memoryview(raw).cast('B')
+        if self._hashes is not None:
+            phase = self._phase
+            self._phase = (phase + 1) % self.PHASES
+            if self._hash(data, phase) == self._hashes[phase]:
+                self.static += 1
+                self._last_static = True
+                return False
+        self._hashes = [self._hash(data, phase) for phase in range(self.PHASES)]
+        self._last_static = False
+        return True
+
+    def copied_anyway(self):
+        """La última captura era igual pero se copió (p. ej. se movió el cursor): no cuenta."""
+        if self._last_static:
+            self.static -= 1
+            self._last_static = False
+
+    def _hash(self, data, phase):
+        crc = 0
+        stride = self.stride
+        for start in range(phase * stride, len(data), stride * self.PHASES):
+            crc = zlib.crc32(data[start:start + stride], crc)
+        return crc
@@ -0,0 +1,334 @@
+"""
+Galería de capturas recientes.
+
+- El historial (`recent_captures`, rutas absolutas, la más reciente primero)
+  vive en el almacén de preferencias; además se listan los `screenshot_*`
+  del directorio de trabajo guardados antes de existir el historial.
+- La vista sólo pide las miniaturas de las filas que pinta: se cargan al
+  aparecer en pantalla, en hilos de trabajo, atendiendo primero a la última
+  pedida (la que el usuario está viendo al desplazarse).
+- `ThumbnailCache`: LRU en memoria (QPixmap) y caché en disco indexada por
+  ruta, fecha de modificación y tamaño del archivo.
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QLabel,
+                             QPushButton, QMenu, QApplication)
+from PyQt6.QtCore import (Qt, QObject, QSize, QUrl, QStandardPaths, QAbstractListModel,
+                          QModelIndex, pyqtSignal)
+from PyQt6.QtGui import QImage, QImageReader, QPixmap, QColor, QDesktopServices
+
+from config.preferences_manager import get_preferences_store
+
+MAX_RECENT_CAPTURES = 500
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def record_capture(path, store=None):
+    """Añade una captura al principio del historial (sin duplicados)."""
+    store = store or get_preferences_store()
+    path = os.path.abspath(path)
+    recent = [p for p in store.get('recent_captures') if p != path]
+    store.set('recent_captures', [path] + recent[:MAX_RECENT_CAPTURES - 1])
+
+
+def _list_captures(store):
+    """Historial + capturas sueltas del directorio de trabajo, de la más nueva a la más vieja."""
+    entries = {}
+    for path in store.get('recent_captures'):
+        try:
+            entries[path] = os.stat(path).st_mtime
+        except OSError:
+            continue
+    try:
+        with os.scandir(os.getcwd()) as it:
+            for entry in it:
+                if entry.name.startswith('screenshot_') and entry.name.lower().endswith(_IMAGE_EXTENSIONS):
+                    entries.setdefault(os.path.abspath(entry.path), entry.stat().st_mtime)
+    except OSError as e:
+        print(f"Error listing captures: {e}")
+    return sorted(entries, key=entries.get, reverse=True)
+
+
+class ThumbnailCache(QObject):
+    """Miniaturas con LRU en memoria y en disco; la decodificación va en hilos."""
+
+    ready = pyqtSignal(str)         # Ruta cuya miniatura ya está en memoria
+
+    _loaded = pyqtSignal(str, QImage)
+
+    MEMORY_ITEMS = 300
+    DISK_ITEMS = 2000
+    MAX_PENDING = 64        # Las filas que ya no se ven se vuelven a pedir al pintarse
+
+    def __init__(self, size=QSize(200, 120), cache_dir=None, workers=2, parent=None):
+        super().__init__(parent)
+        self.size = size
+        if cache_dir is None:
+            base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+            cache_dir = os.path.join(base, 'thumbnails')
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict()
+        self._pending = deque()
+        self._loading = set()
+        self._broken = set()    # No se reintentan hasta forget()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Thumbnail")
+        self._loaded.connect(self._on_loaded)
+        self._pool.submit(self._prune_disk)
+
+    def pixmap(self, path):
+        """Miniatura en memoria o None; si falta, se pide en segundo plano."""
+        pixmap = self._memory.get(path)
+        if pixmap is not None:
+            self._memory.move_to_end(path)
+            return pixmap
+        if path not in self._broken:
+            self._request(path)
+        return None
+
+    def forget(self):
+        """Permite reintentar las miniaturas que fallaron (p. ej. al actualizar)."""
+        self._broken.clear()
+
+    def shutdown(self):
+        with self._lock:
+            self._pending.clear()
+        self._pool.shutdown(wait=False)
+
+    def _request(self, path):
+        with self._lock:
+            if path in self._loading:
+                return
+            if path in self._pending:
+                # Vuelve a estar a la vista: al frente de la pila
+                self._pending.remove(path)
+                self._pending.append(path)
+                return
+            self._pending.append(path)
+            if len(self._pending) > self.MAX_PENDING:
+                self._pending.popleft()
+        self._pool.submit(self._work)
+
+    # ===== HILOS DE TRABAJO =====
+
+    def _work(self):
+        with self._lock:
+            if not self._pending:
+                return
+            path = self._pending.pop()      # La más reciente: la que se está viendo
+            self._loading.add(path)
+        image = QImage()
+        try:
+            image = self._load(path)
+        except Exception as e:
+            print(f"Error loading thumbnail {path}: {e}")
+        self._loaded.emit(path, image)
+
+    def _disk_path(self, path):
+        st = os.stat(path)
+        key = f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0{self.size.width()}x{self.size.height()}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+    def _load(self, path):
+        cached = self._disk_path(path)
+        if os.path.exists(cached):
+            image = QImage(cached)
+            if not image.isNull():
+                os.utime(cached)    # Uso reciente para la poda del disco
+                return image
+
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source = reader.size()
+        if source.isValid():
+            # Los decodificadores que lo admiten (JPEG) escalan al leer
+            reader.setScaledSize(source.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise RuntimeError(reader.errorString())
+        if image.width() > self.size.width() or image.height() > self.size.height():
+            image = image.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = cached + '.tmp'
+        if image.save(tmp, 'PNG'):
+            os.replace(tmp, cached)
+        return image
+
+    def _prune_disk(self):
+        """Deja en disco las DISK_ITEMS miniaturas usadas más recientemente."""
+        try:
+            with os.scandir(self.cache_dir) as it:
+                files = [(e.stat().st_mtime, e.path) for e in it if e.name.endswith('.png')]
+        except OSError:
+            return
+        files.sort(reverse=True)
+        for _, path in files[self.DISK_ITEMS:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ===== HILO DE LA UI =====
+
+    def _on_loaded(self, path, image):
+        with self._lock:
+            self._loading.discard(path)
+        if image.isNull():
+            self._broken.add(path)
+            return
+        self._memory[path] = QPixmap.fromImage(image)
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.MEMORY_ITEMS:
+            self._memory.popitem(last=False)
+        self.ready.emit(path)
+
+
+class _CaptureListModel(QAbstractListModel):
+    """Lista de rutas; la miniatura se pide sólo cuando la vista la necesita."""
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self._cache = cache
+        self._paths = []
+        self._rows = {}
+        self._placeholder = QPixmap(cache.size)
+        self._placeholder.fill(QColor(60, 60, 60))
+        cache.ready.connect(self._on_thumbnail_ready)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self.endResetModel()
+
+    def path(self, index):
+        return self._paths[index.row()] if index.isValid() else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self._paths[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._cache.pixmap(path) or self._placeholder
+        if role == Qt.ItemDataRole.ToolTipRole:
+            try:
+                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+            except OSError:
+                return path
+            return f"{path}\n{mtime:%Y-%m-%d %H:%M:%S}"
+        return None
+
+    def _on_thumbnail_ready(self, path):
+        row = self._rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class CaptureGallery(QWidget):
+    """Ventana con las capturas recientes."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowType.Window | Qt.WindowType.WindowStaysOnTopHint)
+        self.setWindowTitle("Galería de Capturas")
+        self.resize(760, 520)
+
+        self.store = get_preferences_store()
+        self.cache = ThumbnailCache(parent=self)
+        self.model = _CaptureListModel(self.cache, self)
+
+        self.view = QListView()
+        self.view.setViewMode(QListView.ViewMode.IconMode)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setIconSize(self.cache.size)
+        self.view.setGridSize(QSize(self.cache.size.width() + 20, self.cache.size.height() + 40))
+        # Tamaño uniforme y disposición por lotes: la vista sólo consulta las filas visibles
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.view.setWordWrap(True)
+        self.view.setModel(self.model)
+        self.view.doubleClicked.connect(self._open)
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self._show_context_menu)
+
+        self.lbl_count = QLabel()
+        btn_refresh = QPushButton("Actualizar")
+        btn_refresh.clicked.connect(self.refresh)
+
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.lbl_count)
+        bottom.addStretch()
+        bottom.addWidget(btn_refresh)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.view)
+        layout.addLayout(bottom)
+        self.setLayout(layout)
+
+        self.store.changed.connect(self._on_preferences_changed)
+
+    def show_gallery(self):
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def refresh(self):
+        paths = _list_captures(self.store)
+        self.cache.forget()
+        self.model.set_paths(paths)
+        self.lbl_count.setText(f"{len(paths)} capturas")
+
+    def _on_preferences_changed(self, keys):
+        if 'recent_captures' in keys and self.isVisible():
+            self.refresh()
+
+    # ===== ACCIONES =====
+
+    def _open(self, index):
+        path = self.model.path(index)
+        if path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+    def _show_context_menu(self, pos):
+        index = self.view.indexAt(pos)
+        path = self.model.path(index)
+        if not path:
+            return
+        menu = QMenu(self)
+        menu.addAction("Abrir", lambda: self._open(index))
+        menu.addAction("Copiar al Portapapeles", lambda: self._copy(path))
+        menu.addAction("Abrir Carpeta", lambda: QDesktopServices.openUrl(
+            QUrl.fromLocalFile(os.path.dirname(path))))
+        menu.addAction("Quitar de la Galería", lambda: self._forget(path))
+        menu.exec(self.view.viewport().mapToGlobal(pos))
+
+    def _copy(self, path):
+        image = QImage(path)
+        if image.isNull():
+            print(f"Error copying capture: {path}")
+            return
+        QApplication.clipboard().setImage(image)
+
+    def _forget(self, path):
+        """Sólo lo quita del historial; el archivo no se borra."""
+        recent = self.store.get('recent_captures')
+        if path in recent:
+            recent.remove(path)
+            self.store.set('recent_captures', recent)
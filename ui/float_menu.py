@@ -1,9 +1,67 @@
 from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QTimer, QEvent
 from PyQt6.QtWidgets import QWidget, QPushButton, QHBoxLayout, QVBoxLayout, QLabel, QBoxLayout, QMenu, QToolTip
-from PyQt6.QtGui import QAction, QCursor
+from PyQt6.QtGui import QAction, QActionGroup, QCursor
 from config.preferences_manager import PreferencesManager   # import actualizado
 
 
+# Estilos compartidos: se construyen una vez y se reutilizan en todos los botones
+_BUTTON_STYLE = """
+    QPushButton {
+        background-color: #333333;
+        color: white;
+        border: 1px solid #555555;
+        border-radius: 5px;
+        padding: 5px;
+        min-width: 30px;
+    }
+    QPushButton:hover {
+        background-color: #444444;
+    }
+"""
+
+_MENU_STYLE = """
+    QMenu {
+        background-color: #333333;
+        color: white;
+        border: 1px solid #555555;
+    }
+    QMenu::item {
+        padding: 5px 10px;
+    }
+    QMenu::item:selected {
+        background-color: #444444;
+    }
+"""
+
+_GRIP_STYLE = """
+    QLabel {
+        color: #aaaaaa;
+        font-size: 16px;
+        padding: 5px;
+        background-color: #222222;
+        border-radius: 5px;
+    }
+    QLabel:hover {
+        background-color: #333333;
+        color: white;
+    }
+"""
+
+_CLOSE_STYLE = """
+    QPushButton {
+        background-color: #ff4444;
+        color: white;
+        border: 1px solid #990000;
+        border-radius: 5px;
+        padding: 5px;
+        min-width: 30px;
+    }
+    QPushButton:hover {
+        background-color: #cc0000;
+    }
+"""
+
+
 class FloatingMenu(QWidget):
     clicked = pyqtSignal()
 
@@ -95,13 +153,20 @@ class Toolbar(QWidget):
     tool_text = pyqtSignal()
     tool_rectangle = pyqtSignal()
     tool_rectangle_filled = pyqtSignal()
+    tool_rectangle_redact = pyqtSignal()
     tool_capture_full = pyqtSignal()
     tool_capture_crop = pyqtSignal()
+    tool_clipboard_full = pyqtSignal()
+    tool_clipboard_crop = pyqtSignal()
+    tool_interval_capture = pyqtSignal()
+    tool_gallery = pyqtSignal()
     tool_record_full = pyqtSignal()
     tool_record_crop = pyqtSignal()
     tool_undo = pyqtSignal()
     tool_redo = pyqtSignal()
     tool_toggle_audio = pyqtSignal(bool)
+    tool_save_scene = pyqtSignal()
+    tool_load_scene = pyqtSignal()
     preferences_clicked = pyqtSignal()
 
     def __init__(self):
@@ -127,6 +192,7 @@ class Toolbar(QWidget):
         self.prefs_manager = PreferencesManager()
         self.button_order = self.prefs_manager.load_button_order()
         self.tool_visibility = self.prefs_manager.load_tool_visibility()
+        self.prefs_manager.store.changed.connect(self._on_preferences_changed)
         
         self.buttons = {}
         
@@ -137,110 +203,66 @@ class Toolbar(QWidget):
         self._create_all_buttons()
     
     def _create_all_buttons(self):
-        """Crea todos los botones en el orden configurado por el usuario"""
-        self.btn_line = None
-        self.btn_rect = None
-        self.btn_cam = None
-        
+        """Crea una sola vez todos los botones; el orden y la visibilidad se aplican después"""
+        self._add_grip_button()
+        self._add_pen_button()
+        self._add_line_button()
+        self._add_shapes_button()
+        self._add_camera_button()
+        self._add_clipboard_button()
+        self._add_hand_button()
+        self._add_paint_button()
+        self._add_text_button()
+        self._add_undo_button()
+        self._add_redo_button()
+        self._add_eraser_button()
+        self._add_clear_button()
+        self._add_file_button()
+        self._add_preferences_button()
+        self._add_close_button()
+        self._apply_layout()
+    
+    def _apply_layout(self):
+        """Reordena, muestra u oculta los botones existentes según las preferencias"""
         layout = self.layout()
-        
-        btn_style = """
-            QPushButton {
-                background-color: #333333;
-                color: white;
-                border: 1px solid #555555;
-                border-radius: 5px;
-                padding: 5px;
-                min-width: 30px;
-            }
-            QPushButton:hover {
-                background-color: #444444;
-            }
-        """
-        
-        menu_style = """
-            QMenu {
-                background-color: #333333;
-                color: white;
-                border: 1px solid #555555;
-            }
-            QMenu::item {
-                padding: 5px 10px;
-            }
-            QMenu::item:selected {
-                background-color: #444444;
-            }
-        """
-        
-        for button_id in self.button_order:
-            if not self.tool_visibility.get(button_id, True):
-                continue
-            
-            if button_id == 'grip':
-                self._add_grip_button(layout)
-            elif button_id == 'pen':
-                self._add_pen_button(layout, btn_style)
-            elif button_id == 'line':
-                self._add_line_button(layout, btn_style, menu_style)
-            elif button_id == 'shapes':
-                self._add_shapes_button(layout, btn_style, menu_style)
-            elif button_id == 'camera':
-                self._add_camera_button(layout, btn_style, menu_style)
-            elif button_id == 'hand':
-                self._add_hand_button(layout, btn_style)
-            elif button_id == 'paint':
-                self._add_paint_button(layout, btn_style)
-            elif button_id == 'text':
-                self._add_text_button(layout, btn_style)
-            elif button_id == 'undo':
-                self._add_undo_button(layout, btn_style)
-            elif button_id == 'redo':
-                self._add_redo_button(layout, btn_style)
-            elif button_id == 'eraser':
-                self._add_eraser_button(layout, btn_style)
-            elif button_id == 'clear':
-                self._add_clear_button(layout, btn_style)
-            elif button_id == 'preferences':
-                self._add_preferences_button(layout, btn_style)
-            elif button_id == 'close':
-                self._add_close_button(layout)
+        wanted = [self.buttons[b] for b in self.button_order if b in self.buttons]
+        wanted += [w for b, w in self.buttons.items() if b not in self.button_order]
+        
+        # Sin repintados intermedios: la barra cambia de una vez
+        self.setUpdatesEnabled(False)
+        try:
+            for index, widget in enumerate(wanted):
+                if layout.indexOf(widget) != index:
+                    layout.removeWidget(widget)
+                    layout.insertWidget(index, widget)
+            # setVisible no hace nada si el estado explícito ya coincide
+            for button_id, widget in self.buttons.items():
+                widget.setVisible(self.tool_visibility.get(button_id, True))
+        finally:
+            self.setUpdatesEnabled(True)
     
-    def _add_grip_button(self, layout):
+    def _add_grip_button(self):
         self.label_grip = QLabel("✥")
-        self.label_grip.setStyleSheet("""
-            QLabel {
-                color: #aaaaaa;
-                font-size: 16px;
-                padding: 5px;
-                background-color: #222222;
-                border-radius: 5px;
-            }
-            QLabel:hover {
-                background-color: #333333;
-                color: white;
-            }
-        """)
+        self.label_grip.setStyleSheet(_GRIP_STYLE)
         self.label_grip.setToolTip("Arrastrar para mover. Clic para ocultar.")
         self.label_grip.installEventFilter(self)
-        layout.addWidget(self.label_grip)
         self.buttons['grip'] = self.label_grip
     
-    def _add_pen_button(self, layout, btn_style):
+    def _add_pen_button(self):
         self.btn_pen = QPushButton("✏️")
         self.btn_pen.setToolTip("Lápiz")
-        self.btn_pen.setStyleSheet(btn_style)
+        self.btn_pen.setStyleSheet(_BUTTON_STYLE)
         self.btn_pen.clicked.connect(self.tool_pen.emit)
         self.btn_pen.installEventFilter(self)
-        layout.addWidget(self.btn_pen)
         self.buttons['pen'] = self.btn_pen
     
-    def _add_line_button(self, layout, btn_style, menu_style):
+    def _add_line_button(self):
         self.btn_line = QPushButton("📏")
         self.btn_line.setToolTip("Herramientas de Línea")
-        self.btn_line.setStyleSheet(btn_style)
+        self.btn_line.setStyleSheet(_BUTTON_STYLE)
         
         self.line_menu = QMenu(self)
-        self.line_menu.setStyleSheet(menu_style)
+        self.line_menu.setStyleSheet(_MENU_STYLE)
         
         action_point = QAction("Punto", self)
         action_point.triggered.connect(self.tool_point.emit)
@@ -280,16 +302,15 @@ class Toolbar(QWidget):
         self.btn_line.setMenu(self.line_menu)
         self.line_menu.installEventFilter(self)
         self.btn_line.installEventFilter(self)
-        layout.addWidget(self.btn_line)
         self.buttons['line'] = self.btn_line
     
-    def _add_shapes_button(self, layout, btn_style, menu_style):
+    def _add_shapes_button(self):
         self.btn_rect = QPushButton("🔳")
         self.btn_rect.setToolTip("Figuras Geométricas")
-        self.btn_rect.setStyleSheet(btn_style)
+        self.btn_rect.setStyleSheet(_BUTTON_STYLE)
         
         self.rect_menu = QMenu(self)
-        self.rect_menu.setStyleSheet(menu_style)
+        self.rect_menu.setStyleSheet(_MENU_STYLE)
         
         action_rect = QAction("Rectángulo", self)
         action_rect.triggered.connect(self.tool_rectangle.emit)
@@ -299,6 +320,11 @@ class Toolbar(QWidget):
         action_rect_filled.triggered.connect(self.tool_rectangle_filled.emit)
         self.rect_menu.addAction(action_rect_filled)
         
+        # Se pixela en capturas y grabaciones (ver tools/redaction.py)
+        action_rect_redact = QAction("Zona Privada", self)
+        action_rect_redact.triggered.connect(self.tool_rectangle_redact.emit)
+        self.rect_menu.addAction(action_rect_redact)
+        
         self.rect_menu.addSeparator()
         
         action_center_point = QAction("Círculo", self)
@@ -312,16 +338,15 @@ class Toolbar(QWidget):
         self.btn_rect.setMenu(self.rect_menu)
         self.rect_menu.installEventFilter(self)
         self.btn_rect.installEventFilter(self)
-        layout.addWidget(self.btn_rect)
         self.buttons['shapes'] = self.btn_rect
     
-    def _add_camera_button(self, layout, btn_style, menu_style):
+    def _add_camera_button(self):
         self.btn_cam = QPushButton("📷")
         self.btn_cam.setToolTip("Cámara")
-        self.btn_cam.setStyleSheet(btn_style)
+        self.btn_cam.setStyleSheet(_BUTTON_STYLE)
         
         self.cam_menu = QMenu(self)
-        self.cam_menu.setStyleSheet(menu_style)
+        self.cam_menu.setStyleSheet(_MENU_STYLE)
         
         act_cap_full = QAction("Capturar Pantalla", self)
         act_cap_full.triggered.connect(self.tool_capture_full.emit)
@@ -331,6 +356,35 @@ class Toolbar(QWidget):
         act_cap_crop.triggered.connect(self.tool_capture_crop.emit)
         self.cam_menu.addAction(act_cap_crop)
         
+        act_clip_full = QAction("Copiar Pantalla al Portapapeles", self)
+        act_clip_full.triggered.connect(self.tool_clipboard_full.emit)
+        self.cam_menu.addAction(act_clip_full)
+        
+        act_clip_crop = QAction("Copiar Recorte al Portapapeles", self)
+        act_clip_crop.triggered.connect(self.tool_clipboard_crop.emit)
+        self.cam_menu.addAction(act_clip_crop)
+        
+        self.act_clipboard_save = QAction("Guardar también en Disco al Copiar", self)
+        self.act_clipboard_save.setCheckable(True)
+        self.act_clipboard_save.setChecked(self.prefs_manager.store.get('clipboard_save_copy'))
+        self.act_clipboard_save.toggled.connect(
+            lambda checked: self.prefs_manager.store.set('clipboard_save_copy', checked))
+        self.cam_menu.addAction(self.act_clipboard_save)
+        
+        self.act_interval = QAction("Captura por Intervalos...", self)
+        self.act_interval.triggered.connect(self.tool_interval_capture.emit)
+        self.cam_menu.addAction(self.act_interval)
+        
+        self.act_interval_video = QAction("Montar Vídeo al Terminar Intervalos", self)
+        self.act_interval_video.setCheckable(True)
+        self.act_interval_video.setChecked(self.prefs_manager.store.get('interval_capture')['make_video'])
+        self.act_interval_video.toggled.connect(self._set_interval_video)
+        self.cam_menu.addAction(self.act_interval_video)
+        
+        act_gallery = QAction("Galería de Capturas", self)
+        act_gallery.triggered.connect(self.tool_gallery.emit)
+        self.cam_menu.addAction(act_gallery)
+        
         self.cam_menu.addSeparator()
         
         act_rec_full = QAction("Grabar Pantalla", self)
@@ -341,6 +395,38 @@ class Toolbar(QWidget):
         act_rec_crop.triggered.connect(self.tool_record_crop.emit)
         self.cam_menu.addAction(act_rec_crop)
         
+        # Anotaciones en las capturas (se guarda en preferencias)
+        self.annotations_menu = self.cam_menu.addMenu("Anotaciones en Capturas")
+        self.annotations_menu.setStyleSheet(_MENU_STYLE)
+        annotations_group = QActionGroup(self)
+        current_mode = self.prefs_manager.store.get('capture_annotations')
+        for mode, label in (('on', "Incluir"), ('off', "Excluir"), ('only', "Solo Anotaciones")):
+            act = QAction(label, self)
+            act.setCheckable(True)
+            act.setChecked(mode == current_mode)
+            act.triggered.connect(lambda checked, m=mode: self.prefs_manager.store.set('capture_annotations', m))
+            annotations_group.addAction(act)
+            self.annotations_menu.addAction(act)
+        
+        # Monitor a capturar: se rellena al abrirse (las pantallas pueden cambiar)
+        self.monitor_menu = self.cam_menu.addMenu("Monitor de Captura")
+        self.monitor_menu.setStyleSheet(_MENU_STYLE)
+        self.monitor_menu.aboutToShow.connect(self._populate_monitor_menu)
+        
+        # Formato de las capturas (nivel y calidad se ajustan en preferences.json)
+        self.format_menu = self.cam_menu.addMenu("Formato de Captura")
+        self.format_menu.setStyleSheet(_MENU_STYLE)
+        format_group = QActionGroup(self)
+        current_format = self.prefs_manager.store.get('screenshot_encoder')['format']
+        for fmt, label in (('png', "PNG"), ('png_fast', "PNG Rápido (ráfagas)"),
+                           ('jpeg', "JPEG"), ('webp', "WebP")):
+            act = QAction(label, self)
+            act.setCheckable(True)
+            act.setChecked(fmt == current_format)
+            act.triggered.connect(lambda checked, f=fmt: self._set_screenshot_format(f))
+            format_group.addAction(act)
+            self.format_menu.addAction(act)
+        
         self.cam_menu.addSeparator()
         
         self.act_audio = QAction("Grabar Audio", self)
@@ -349,118 +435,187 @@ class Toolbar(QWidget):
         self.act_audio.toggled.connect(self.tool_toggle_audio.emit)
         self.cam_menu.addAction(self.act_audio)
         
+        # Grabaciones de pantalla completa encuadradas siguiendo al cursor (ver tools/auto_zoom.py)
+        self.act_auto_zoom = QAction("Zoom Automático al Cursor", self)
+        self.act_auto_zoom.setCheckable(True)
+        self.act_auto_zoom.setChecked(self.prefs_manager.store.get('recording')['auto_zoom'])
+        self.act_auto_zoom.toggled.connect(self._set_auto_zoom)
+        self.cam_menu.addAction(self.act_auto_zoom)
+        
+        # mss no captura el puntero: se dibuja con sus clics en el vídeo (ver tools/cursor_overlay.py)
+        self.act_show_cursor = QAction("Mostrar Cursor y Clics", self)
+        self.act_show_cursor.setCheckable(True)
+        self.act_show_cursor.setChecked(self.prefs_manager.store.get('recording')['show_cursor'])
+        self.act_show_cursor.toggled.connect(self._set_show_cursor)
+        self.cam_menu.addAction(self.act_show_cursor)
+        
         self.btn_cam.setMenu(self.cam_menu)
         self.cam_menu.installEventFilter(self)
         self.btn_cam.installEventFilter(self)
-        layout.addWidget(self.btn_cam)
         self.buttons['camera'] = self.btn_cam
     
-    def _add_hand_button(self, layout, btn_style):
+    def _populate_monitor_menu(self):
+        from tools.capture_service import get_capture_service
+        self.monitor_menu.clear()
+        try:
+            monitors = get_capture_service().monitors()[1:]
+        except Exception as e:
+            print(f"Error listing monitors: {e}")
+            monitors = []
+        
+        current = self.prefs_manager.store.get('capture_monitor')
+        group = QActionGroup(self.monitor_menu)
+        options = [('primary', "Principal"), ('cursor', "Bajo el Cursor"), ('all', "Todos")]
+        options += [(i, f"Monitor {i} ({m['width']}x{m['height']})") for i, m in enumerate(monitors, 1)]
+        for value, label in options:
+            act = QAction(label, self.monitor_menu)
+            act.setCheckable(True)
+            act.setChecked(value == current)
+            act.triggered.connect(lambda checked, v=value: self.prefs_manager.store.set('capture_monitor', v))
+            group.addAction(act)
+            self.monitor_menu.addAction(act)
+            if value == 'all' and monitors:
+                self.monitor_menu.addSeparator()
+    
+    def _set_screenshot_format(self, fmt):
+        encoder = self.prefs_manager.store.get('screenshot_encoder')
+        encoder['format'] = fmt
+        self.prefs_manager.store.set('screenshot_encoder', encoder)
+    
+    def _set_interval_video(self, checked):
+        settings = self.prefs_manager.store.get('interval_capture')
+        settings['make_video'] = checked
+        self.prefs_manager.store.set('interval_capture', settings)
+    
+    def _set_auto_zoom(self, checked):
+        settings = self.prefs_manager.store.get('recording')
+        settings['auto_zoom'] = checked
+        self.prefs_manager.store.set('recording', settings)
+    
+    def _set_show_cursor(self, checked):
+        settings = self.prefs_manager.store.get('recording')
+        settings['show_cursor'] = checked
+        self.prefs_manager.store.set('recording', settings)
+    
+    def set_interval_capture_active(self, active):
+        """Refleja en el menú de la cámara si hay una captura por intervalos en curso"""
+        self.act_interval.setText("Detener Captura por Intervalos" if active else "Captura por Intervalos...")
+    
+    def _add_clipboard_button(self):
+        self.btn_clipboard = QPushButton("📋")
+        self.btn_clipboard.setToolTip("Copiar Captura al Portapapeles")
+        self.btn_clipboard.setStyleSheet(_BUTTON_STYLE)
+        self.btn_clipboard.clicked.connect(self.tool_clipboard_full.emit)
+        self.btn_clipboard.installEventFilter(self)
+        self.buttons['clipboard'] = self.btn_clipboard
+    
+    def _add_hand_button(self):
         self.btn_hand = QPushButton("✋")
         self.btn_hand.setToolTip("Mover Objetos")
-        self.btn_hand.setStyleSheet(btn_style)
+        self.btn_hand.setStyleSheet(_BUTTON_STYLE)
         self.btn_hand.clicked.connect(self.tool_hand.emit)
         self.btn_hand.installEventFilter(self)
-        layout.addWidget(self.btn_hand)
         self.buttons['hand'] = self.btn_hand
     
-    def _add_paint_button(self, layout, btn_style):
+    def _add_paint_button(self):
         self.btn_paint = QPushButton("🎨")
         self.btn_paint.setToolTip("Color")
-        self.btn_paint.setStyleSheet(btn_style)
+        self.btn_paint.setStyleSheet(_BUTTON_STYLE)
         self.btn_paint.clicked.connect(self.tool_paint.emit)
         self.btn_paint.installEventFilter(self)
-        layout.addWidget(self.btn_paint)
         self.buttons['paint'] = self.btn_paint
     
-    def _add_text_button(self, layout, btn_style):
+    def _add_text_button(self):
         self.btn_text = QPushButton("📝")
         self.btn_text.setToolTip("Texto")
-        self.btn_text.setStyleSheet(btn_style)
+        self.btn_text.setStyleSheet(_BUTTON_STYLE)
         self.btn_text.clicked.connect(self.tool_text.emit)
         self.btn_text.installEventFilter(self)
-        layout.addWidget(self.btn_text)
         self.buttons['text'] = self.btn_text
     
-    def _add_undo_button(self, layout, btn_style):
+    def _add_undo_button(self):
         self.btn_undo = QPushButton("↩️")
         self.btn_undo.setToolTip("Deshacer")
-        self.btn_undo.setStyleSheet(btn_style)
+        self.btn_undo.setStyleSheet(_BUTTON_STYLE)
         self.btn_undo.clicked.connect(self.tool_undo.emit)
         self.btn_undo.installEventFilter(self)
-        layout.addWidget(self.btn_undo)
         self.buttons['undo'] = self.btn_undo
     
-    def _add_redo_button(self, layout, btn_style):
+    def _add_redo_button(self):
         self.btn_redo = QPushButton("↪️")
         self.btn_redo.setToolTip("Rehacer")
-        self.btn_redo.setStyleSheet(btn_style)
+        self.btn_redo.setStyleSheet(_BUTTON_STYLE)
         self.btn_redo.clicked.connect(self.tool_redo.emit)
         self.btn_redo.installEventFilter(self)
-        layout.addWidget(self.btn_redo)
         self.buttons['redo'] = self.btn_redo
     
-    def _add_eraser_button(self, layout, btn_style):
+    def _add_eraser_button(self):
         self.btn_eraser = QPushButton("🧹")
         self.btn_eraser.setToolTip("Borrador")
-        self.btn_eraser.setStyleSheet(btn_style)
+        self.btn_eraser.setStyleSheet(_BUTTON_STYLE)
         self.btn_eraser.clicked.connect(self.tool_eraser.emit)
         self.btn_eraser.installEventFilter(self)
-        layout.addWidget(self.btn_eraser)
         self.buttons['eraser'] = self.btn_eraser
     
-    def _add_clear_button(self, layout, btn_style):
+    def _add_clear_button(self):
         self.btn_clear = QPushButton("🗑️")
         self.btn_clear.setToolTip("Limpiar Todo")
-        self.btn_clear.setStyleSheet(btn_style)
+        self.btn_clear.setStyleSheet(_BUTTON_STYLE)
         self.btn_clear.clicked.connect(self.tool_clear.emit)
         self.btn_clear.installEventFilter(self)
-        layout.addWidget(self.btn_clear)
         self.buttons['clear'] = self.btn_clear
     
-    def _add_preferences_button(self, layout, btn_style):
+    def _add_file_button(self):
+        self.btn_file = QPushButton("💾")
+        self.btn_file.setToolTip("Archivo")
+        self.btn_file.setStyleSheet(_BUTTON_STYLE)
+        
+        self.file_menu = QMenu(self)
+        self.file_menu.setStyleSheet(_MENU_STYLE)
+        
+        act_save = QAction("Guardar Pizarra", self)
+        act_save.triggered.connect(self.tool_save_scene.emit)
+        self.file_menu.addAction(act_save)
+        
+        act_load = QAction("Abrir Pizarra", self)
+        act_load.triggered.connect(self.tool_load_scene.emit)
+        self.file_menu.addAction(act_load)
+        
+        self.btn_file.setMenu(self.file_menu)
+        self.file_menu.installEventFilter(self)
+        self.btn_file.installEventFilter(self)
+        self.buttons['file'] = self.btn_file
+    
+    def _add_preferences_button(self):
         self.btn_preferences = QPushButton("⚙️")
         self.btn_preferences.setToolTip("Preferencias")
-        self.btn_preferences.setStyleSheet(btn_style)
+        self.btn_preferences.setStyleSheet(_BUTTON_STYLE)
         self.btn_preferences.clicked.connect(self.preferences_clicked.emit)
         self.btn_preferences.installEventFilter(self)
-        layout.addWidget(self.btn_preferences)
         self.buttons['preferences'] = self.btn_preferences
     
-    def _add_close_button(self, layout):
+    def _add_close_button(self):
         self.btn_close = QPushButton("❌")
         self.btn_close.setToolTip("Cerrar Programa")
-        self.btn_close.setStyleSheet("""
-            QPushButton {
-                background-color: #ff4444;
-                color: white;
-                border: 1px solid #990000;
-                border-radius: 5px;
-                padding: 5px;
-                min-width: 30px;
-            }
-            QPushButton:hover {
-                background-color: #cc0000;
-            }
-        """)
+        self.btn_close.setStyleSheet(_CLOSE_STYLE)
         self.btn_close.clicked.connect(self.close_app.emit)
         self.btn_close.installEventFilter(self)
-        layout.addWidget(self.btn_close)
         self.buttons['close'] = self.btn_close
     
+    def _on_preferences_changed(self, keys):
+        if keys & {'button_order', 'tool_visibility'}:
+            self.update_from_preferences()
+
     def update_from_preferences(self):
-        """Recarga preferencias y reconstruye la barra"""
-        self.button_order = self.prefs_manager.load_button_order()
-        self.tool_visibility = self.prefs_manager.load_tool_visibility()
-        
-        layout = self.layout()
-        while layout.count():
-            item = layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        """Relee preferencias (desde la caché) y ajusta la barra sin reconstruirla"""
+        button_order = self.prefs_manager.load_button_order()
+        tool_visibility = self.prefs_manager.load_tool_visibility()
+        if button_order == self.button_order and tool_visibility == self.tool_visibility:
+            return
         
-        self.buttons.clear()
-        self._create_all_buttons()
+        self.button_order = button_order
+        self.tool_visibility = tool_visibility
+        self._apply_layout()
         self.adjustSize()
 
     def hide_active_menu(self):
@@ -481,6 +636,8 @@ class Toolbar(QWidget):
             owner_button = self.btn_rect
         elif self.active_menu == self.cam_menu and self.btn_cam:
             owner_button = self.btn_cam
+        elif self.active_menu == self.file_menu and self.btn_file:
+            owner_button = self.btn_file
         
         if owner_button:
             if owner_button.rect().contains(owner_button.mapFromGlobal(global_pos)):
@@ -531,6 +688,10 @@ class Toolbar(QWidget):
                     if self.active_menu != self.cam_menu:
                         self.show_menu(self.btn_cam, self.cam_menu)
                         return True
+                elif self.btn_file and self.btn_file.isVisible() and self.btn_file.rect().contains(self.btn_file.mapFromGlobal(global_pos)):
+                    if self.active_menu != self.file_menu:
+                        self.show_menu(self.btn_file, self.file_menu)
+                        return True
 
         if event.type() == QEvent.Type.Enter:
             self.hide_timer.stop()
@@ -547,6 +708,9 @@ class Toolbar(QWidget):
             elif source == self.btn_cam:
                 self.show_menu(self.btn_cam, self.cam_menu)
                 return True
+            elif source == self.btn_file:
+                self.show_menu(self.btn_file, self.file_menu)
+                return True
             elif isinstance(source, QMenu):
                 return False
 
@@ -555,6 +719,7 @@ class Toolbar(QWidget):
             if self.btn_line: buttons_to_check.append(self.btn_line)
             if self.btn_rect: buttons_to_check.append(self.btn_rect)
             if self.btn_cam: buttons_to_check.append(self.btn_cam)
+            if self.btn_file: buttons_to_check.append(self.btn_file)
             
             if source in buttons_to_check or isinstance(source, QMenu):
                 QTimer.singleShot(50, self._check_and_hide_menu)
@@ -281,10 +281,8 @@ class PreferencesDialog(QDialog):
         self.tool_visibility = {button_id: cb.isChecked() 
                                 for button_id, cb in self.visibility_checkboxes.items()}
         
-        success = True
-        success = success and self.preferences_manager.save_shortcuts(self.current_shortcuts)
-        success = success and self.preferences_manager.save_button_order(self.button_order)
-        success = success and self.preferences_manager.save_tool_visibility(self.tool_visibility)
+        success = self.preferences_manager.save_all(self.current_shortcuts, self.button_order,
+                                                    self.tool_visibility)
         
         if success:
             self.accept()